@@ -1,12 +1,39 @@
-from flask import Flask, request, render_template, jsonify, session
+from flask import Flask, Response, request, render_template, jsonify, session, stream_with_context, url_for, g
+from flask import before_render_template, template_rendered
+from flask.sessions import SecureCookieSessionInterface
 import time
 import json
-from datetime import datetime
-import requests
+import queue
+import threading
+from datetime import datetime, timezone
 import os
+import re
+import atexit
+import secrets
 from dotenv import load_dotenv
 import anthropic
 import cohere  # Add this import
+from batch import BatchStore, get_batch_executor, iter_cells, parse_provider_limits
+from cassette import MODES as CASSETTE_MODES, Cassette
+from circuit_breaker import BreakerBoard
+from fanout import iter_completed
+from health import HealthMonitor, HealthStore
+from history_store import HistoryStore
+from hedging import Hedger
+from latency_stats import LatencyRecorder
+from keep_warm import KeepWarmScheduler
+from loading import LoadingScheduler
+from microbatch import MicroBatcher
+from http_pool import PooledSession
+import deadline
+import metrics
+from model_registry import MODEL_REGISTRY, build_model_info
+from provider_clients import ClientRegistry
+from rate_limit import AdmissionGate, RateLimited, SQLiteRateLimiter, parse_limits
+from providers import ProviderContext, build_models, get_fallback_response, get_rate_limited_response
+from response_cache import SQLiteResponseCache, create_cache, make_key, start_purger
+from singleflight import SingleFlight, SQLiteFlightClaims
+from vote_store import VOTE_TYPES, VoteStore
 
 # Remove debug prints
 load_dotenv()
@@ -15,6 +42,24 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'default_secret_key_for_development')
 
+class TimedSessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions that record how long writing the cookie takes and how large it gets"""
+
+    def save_session(self, app, session, response):
+        start_time = time.perf_counter()
+        super().save_session(app, session, response)
+        metrics.SESSION_SAVE_SECONDS.labels().observe(time.perf_counter() - start_time)
+        cookie_prefix = self.get_cookie_name(app) + "="
+        for cookie in response.headers.getlist("Set-Cookie"):
+            if cookie.startswith(cookie_prefix):
+                metrics.SESSION_COOKIE_BYTES.labels().observe(len(cookie))
+
+app.session_interface = TimedSessionInterface()
+
+# Directory for on-disk state shared by the worker processes on this node
+DATA_DIR = os.environ.get('DATA_DIR', app.instance_path)
+os.makedirs(DATA_DIR, exist_ok=True)
+
 # Verify API keys
 HUGGINGFACE_API_KEY = os.environ.get('HUGGINGFACE_API_KEY')
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY')
@@ -30,530 +75,529 @@ api_key_status = {
 # Request timeout in seconds
 REQUEST_TIMEOUT = 30
 
-# AI Model information
-ai_model_info = {
-    "Cohere-Command": {  # Add Cohere information
-        "description": "Cohere's Command model, excellent for understanding context and generating relevant responses.",
-        "avg_response_time": "2s",
-        "specialties": ["Text Generation", "Analysis", "Classification"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "Claude-2": {
-        "description": "Anthropic's Claude-2 model, known for thoughtful and nuanced responses.",
-        "avg_response_time": "3s",
-        "specialties": ["Analysis", "Writing", "Problem Solving"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "FLAN-T5": {
-        "description": "Google's FLAN-T5-Base model, great for various text generation tasks.",
-        "avg_response_time": "2s",
-        "specialties": ["Question Answering", "Text Generation", "Translation"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "GPT-2": {
-        "description": "OpenAI's GPT-2 model (free version), good for creative writing.",
-        "avg_response_time": "2s",
-        "specialties": ["Creative Writing", "Text Completion", "Story Generation"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "BLOOM": {
-        "description": "BigScience's BLOOM model, multilingual text generation.",
-        "avg_response_time": "3s",
-        "specialties": ["Multilingual Generation", "Code Generation", "Analysis"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "DialoGPT": {
-        "description": "Microsoft's DialoGPT, specialized in conversational responses.",
-        "avg_response_time": "2s",
-        "specialties": ["Conversation", "Chat", "Response Generation"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "OPT": {
-        "description": "Meta's OPT model, alternative to GPT-3 with similar capabilities.",
-        "avg_response_time": "2s",
-        "specialties": ["Text Generation", "Analysis", "Question Answering"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "BART": {
-        "description": "Facebook's BART model, excellent for summarization and generation.",
-        "avg_response_time": "2s",
-        "specialties": ["Summarization", "Text Generation", "Translation"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "T0pp": {
-        "description": "Hugging Face's T0++ model, trained on diverse tasks.",
-        "avg_response_time": "3s",
-        "specialties": ["Zero-shot Learning", "Task Understanding", "General Knowledge"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "GPT-Neo": {
-        "description": "EleutherAI's GPT-Neo, open-source alternative to GPT-3.",
-        "avg_response_time": "3s",
-        "specialties": ["Text Generation", "Code Completion", "Analysis"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "Dolly": {
-        "description": "Databricks' Dolly model, instruction-following specialist.",
-        "avg_response_time": "2s",
-        "specialties": ["Instruction Following", "Task Completion", "Explanation"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "Falcon": {
-        "description": "TII's Falcon model, powerful open-source language model.",
-        "avg_response_time": "3s",
-        "specialties": ["Text Generation", "Analysis", "Problem Solving"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "MPT": {
-        "description": "MosaicML's MPT model, efficient and powerful language model.",
-        "avg_response_time": "2s",
-        "specialties": ["Text Generation", "Chat", "Analysis"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "Pythia": {
-        "description": "EleutherAI's Pythia model, trained on code and text.",
-        "avg_response_time": "2s",
-        "specialties": ["Code Generation", "Technical Writing", "Analysis"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "Qwen3": {
-        "description": "Qwen3 8B model, excellent for reasoning, coding, and multilingual tasks.",
-        "avg_response_time": "2s",
-        "specialties": ["Reasoning", "Coding", "Multilingual Support"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "DeepSeek R1": {
-        "description": "DeepSeek R1 is a powerful open-source model with MIT license, excellent for complex reasoning and coding tasks.",
-        "avg_response_time": "2s",
-        "specialties": ["Complex Reasoning", "Coding", "Technical Analysis"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    },
-    "Qwen3 30B": {
-        "description": "Qwen3 30B A3B is a large model with 30.5B parameters, excellent for mathematics, coding, and creative tasks.",
-        "avg_response_time": "3s",
-        "specialties": ["Mathematics", "Advanced Coding", "Creative Writing"],
-        "max_tokens": int(os.environ.get('MAX_TOKENS', 512))
-    }
-}
-
-def get_cohere_response(question):
-    """Get response from Cohere Command"""
-    try:
-        if not COHERE_API_KEY:
-            return {
-                "response": "Error: Cohere API key is not configured. Please set up your API key in the .env file.",
-                "confidence": 0,
-                "response_time": 0
-            }
-
-        start_time = time.time()
-        
-        co = cohere.Client(COHERE_API_KEY)
-        
-        response = co.generate(
-            model='command',
-            prompt=question,
-            max_tokens=int(os.environ.get('MAX_TOKENS', 512)),
-            temperature=float(os.environ.get('TEMPERATURE', 0.7)),
-            k=0,
-            stop_sequences=[],
-            return_likelihoods='NONE'
-        )
-        
-        response_time = time.time() - start_time
-        
-        return {
-            "response": response.generations[0].text.strip(),
-            "confidence": 0.9,
-            "response_time": response_time
-        }
-            
-    except Exception as e:
-        return get_fallback_response("Cohere-Command", str(e))
-
-def get_huggingface_response(model_id, question):
-    """Generic function to get response from Hugging Face's inference API"""
-    try:
-        if not HUGGINGFACE_API_KEY:
-            return {
-                "response": "Error: Hugging Face API key is not configured. Please set up your API key in the .env file.",
-                "confidence": 0,
-                "response_time": 0
-            }
-
-        start_time = time.time()
-        API_URL = f"https://api-inference.huggingface.co/models/{model_id}"
-        headers = {
-            "Authorization": f"Bearer {HUGGINGFACE_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "inputs": question,
-            "parameters": {
-                "max_length": int(os.environ.get('MAX_TOKENS', 512)),
-                "temperature": float(os.environ.get('TEMPERATURE', 0.7)),
-                "num_return_sequences": 1,
-                "do_sample": True,
-                "top_p": 0.9,
-                "top_k": 50
-            }
-        }
-
-        response = requests.post(
-            API_URL,
-            headers=headers,
-            json=data,
-            timeout=REQUEST_TIMEOUT
-        )
-        response_time = time.time() - start_time
-
-        if response.status_code == 401:
-            return {
-                "response": "Error: Invalid or missing API key. Please check your Hugging Face API key configuration.",
-                "confidence": 0,
-                "response_time": response_time
-            }
-        elif response.status_code == 503:
-            return {
-                "response": "The model is currently loading. Please try again in a few minutes.",
-                "confidence": 0,
-                "response_time": response_time
-            }
-        elif response.status_code != 200:
-            return {
-                "response": f"API Error: {response.status_code}. {response.text}",
-                "confidence": 0,
-                "response_time": response_time
-            }
-
-        result = response.json()
-        # Handle different response formats
-        if isinstance(result, list) and len(result) > 0:
-            if isinstance(result[0], dict) and "generated_text" in result[0]:
-                text = result[0]["generated_text"]
-            else:
-                text = result[0]
-        else:
-            text = str(result)
-            
-        # Clean up the response
-        text = text.replace(question, "", 1).strip()  # Remove the input question if it's repeated
-        if len(text) == 0:
-            text = "I apologize, but I couldn't generate a meaningful response. Please try rephrasing your question."
-            
-        return {
-            "response": text,
-            "confidence": 0.85,
-            "response_time": response_time
-        }
-            
-    except requests.exceptions.Timeout:
-        return get_fallback_response(model_id, "Request timed out")
-    except Exception as e:
-        return get_fallback_response(model_id, str(e))
-
-def get_flan_response(question):
-    """Get response from FLAN-T5"""
-    return get_huggingface_response("google/flan-t5-base", question)
-
-def get_gpt2_response(question):
-    """Get response from GPT-2"""
-    return get_huggingface_response("gpt2", question)
-
-def get_bloom_response(question):
-    """Get response from BLOOM"""
-    return get_huggingface_response("bigscience/bloom", question)
-
-def get_dialogpt_response(question):
-    """Get response from DialoGPT"""
-    return get_huggingface_response("microsoft/DialoGPT-medium", question)
-
-def get_opt_response(question):
-    """Get response from OPT"""
-    return get_huggingface_response("facebook/opt-1.3b", question)
-
-def get_bart_response(question):
-    """Get response from BART"""
-    return get_huggingface_response("facebook/bart-large", question)
+# Generation settings sent with every model call
+MAX_TOKENS = int(os.environ.get('MAX_TOKENS', 512))
+TEMPERATURE = float(os.environ.get('TEMPERATURE', 0.7))
+
+# Deadline in seconds for a whole comparison, and how many model calls it may run at once
+COMPARISON_TIMEOUT = float(os.environ.get('COMPARISON_TIMEOUT', REQUEST_TIMEOUT))
+MAX_CONCURRENT_MODELS = int(os.environ.get('MAX_CONCURRENT_MODELS', 8))
+# Upper bound on model calls in flight across all requests handled by this worker
+FANOUT_MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', 32))
+# Seconds between keep-alive comments on an idle results stream, and how long a streamed
+# comparison waits for its results page to open the stream
+SSE_KEEPALIVE_INTERVAL = float(os.environ.get('SSE_KEEPALIVE_INTERVAL', 15))
+STREAM_TOKEN_TTL = float(os.environ.get('STREAM_TOKEN_TTL', 300))
+
+# Keep-alive connection pool shared by every Hugging Face model call in this worker
+HF_API_BASE = os.environ.get('HF_API_BASE', "https://api-inference.huggingface.co")
+hf_session = PooledSession(
+    HF_API_BASE,
+    pool_maxsize=int(os.environ.get('HF_POOL_MAXSIZE', FANOUT_MAX_WORKERS)),
+    max_retries=int(os.environ.get('HF_MAX_RETRIES', 2)),
+    backoff_factor=float(os.environ.get('HF_RETRY_BACKOFF', 0.3))
+)
+metrics.Gauge(
+    "huggingface_connections_opened",
+    "Connections this worker has opened to Hugging Face; a steady value means keep-alive is working",
+    callback=hf_session.connections_opened
+)
+
+# Each worker publishes its metrics to a file every worker on the node shares, so /metrics reports
+# their sum whichever worker serves the scrape; a worker silent for 4 intervals counts as gone
+METRICS_PUBLISH_INTERVAL = float(os.environ.get('METRICS_PUBLISH_INTERVAL', 15))
+metrics_store = metrics.SQLiteMetricsStore(os.path.join(DATA_DIR, 'metrics.sqlite3'),
+                                           stale_after=4 * METRICS_PUBLISH_INTERVAL)
+
+# Token buckets per provider and per model, shared by every worker on the node. A call
+# waits up to RATE_LIMIT_MAX_WAIT seconds for a token and is turned away after that.
+rate_limiter = SQLiteRateLimiter(os.path.join(DATA_DIR, 'rate_limits.sqlite3'))
+PROVIDER_RATE_LIMITS = parse_limits(os.environ.get('RATE_LIMITS', 'huggingface=10:20,anthropic=5:10,cohere=5:10'))
+MODEL_RATE_LIMITS = parse_limits(os.environ.get('MODEL_RATE_LIMITS', ''))
+RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', 2))
+
+def get_rate_buckets(model_name):
+    """Token buckets a call to ``model_name`` draws from, as ``(name, rate, burst)``"""
+    buckets = []
+    provider = MODEL_REGISTRY[model_name]["provider"]
+    if provider in PROVIDER_RATE_LIMITS:
+        buckets.append((f"provider:{provider}",) + PROVIDER_RATE_LIMITS[provider])
+    if model_name in MODEL_RATE_LIMITS:
+        buckets.append((f"model:{model_name}",) + MODEL_RATE_LIMITS[model_name])
+    return buckets
+
+def acquire_rate_limit(model_name):
+    """Take a token for one upstream request to ``model_name``; raises RateLimited when none comes in time.
+
+    The adapters call this for every request they send, so a micro-batch is charged once
+    and a hedged copy or a retry is charged like any other request.
+    """
+    rate_limiter.acquire(get_rate_buckets(model_name), deadline.bounded(RATE_LIMIT_MAX_WAIT, 0))
+
+# Comparisons one worker runs at once; more are answered with 503 instead of queueing threads
+comparison_gate = AdmissionGate(int(os.environ.get('MAX_IN_FLIGHT_COMPARISONS', 16)))
+
+# Comparison history lives on the server; the session cookie only carries the owner id
+history_store = HistoryStore(
+    os.path.join(DATA_DIR, 'history.sqlite3'),
+    max_entries=int(os.environ.get('HISTORY_MAX_ENTRIES', 100))
+)
+HISTORY_PAGE_SIZE = 20
+
+def get_owner_id():
+    """Opaque id for this browser's history, created on first use"""
+    owner_id = session.get('owner_id')
+    if owner_id is None:
+        owner_id = session['owner_id'] = secrets.token_urlsafe(16)
+    return owner_id
+
+def new_session_id():
+    """Id for a new history entry; the random suffix keeps comparisons started in the same second apart"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(4)}"
+
+# Concurrent questions for the same Hugging Face model are sent as one request; a window of 0 turns this off
+HF_BATCH_WINDOW_MS = float(os.environ.get('HF_BATCH_WINDOW_MS', 5))
+HF_BATCH_MAX_SIZE = int(os.environ.get('HF_BATCH_MAX_SIZE', 8))
+hf_batcher = MicroBatcher(
+    window=HF_BATCH_WINDOW_MS / 1000,
+    max_size=HF_BATCH_MAX_SIZE,
+    on_batch=lambda model_id, size: metrics.HF_BATCH_SIZE.labels(model_id=model_id).observe(size)
+) if HF_BATCH_WINDOW_MS > 0 else None
+
+# A Hugging Face model that answers 503 while loading is warmed up once; calls for it wait on that
+# warm-up (up to HF_LOADING_MAX_WAIT seconds) and are retried instead of each failing on their own
+HF_LOADING_MAX_WAIT = float(os.environ.get('HF_LOADING_MAX_WAIT', 20))
+hf_loading = LoadingScheduler(
+    max_wait=HF_LOADING_MAX_WAIT,
+    warm_timeout=float(os.environ.get('HF_WARM_TIMEOUT', 120)),
+    on_warm=lambda model_id, seconds, loaded: note_cold_start(model_id, seconds, loaded)
+) if HF_LOADING_MAX_WAIT > 0 else None
+
+# Successful responses are reused for repeated questions until they expire. The sqlite
+# backend is shared by every worker on the node; "memory" keeps a private cache per worker.
+response_cache = create_cache(
+    os.environ.get('RESPONSE_CACHE_BACKEND', 'sqlite'),
+    path=os.path.join(DATA_DIR, 'response_cache.sqlite3'),
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024)),
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 3600))
+)
+RESPONSE_CACHE_PURGE_INTERVAL = float(os.environ.get('RESPONSE_CACHE_PURGE_INTERVAL', 300))
+
+# Identical concurrent calls share one upstream request: threads in this worker wait on the
+# leader directly, and other workers wait for its result to land in the shared cache.
+model_calls = SingleFlight()
+flight_claims = None
+if isinstance(response_cache, SQLiteResponseCache):
+    flight_claims = SQLiteFlightClaims(response_cache.path, ttl=REQUEST_TIMEOUT + 5)
+
+# SDK clients are built once per worker and reused, instead of once per request
+provider_clients = ClientRegistry()
+provider_clients.register(
+    'anthropic',
+    lambda api_key: anthropic.Anthropic(api_key=api_key),
+    close=lambda client: client.close(),
+    warm=lambda client: client.models.list(limit=1)
+)
+# Building the Cohere client validates the key against the API, so that round trip now happens once
+provider_clients.register(
+    'cohere',
+    lambda api_key: cohere.Client(api_key, timeout=REQUEST_TIMEOUT),
+    close=lambda client: client._executor.shutdown(wait=False)
+)
+
+# CASSETTE_MODE=record appends every provider response, with its timing, to CASSETTE_PATH;
+# replay answers from those recordings instead of calling any provider, instantly or, with
+# CASSETTE_TIMING=original, as slowly as the recorded calls were
+CASSETTE_MODE = os.environ.get('CASSETTE_MODE', 'off').lower()
+if CASSETTE_MODE not in CASSETTE_MODES:
+    raise ValueError(f"CASSETTE_MODE must be one of {', '.join(CASSETTE_MODES)}, not {CASSETTE_MODE!r}")
+cassette = Cassette(
+    os.environ.get('CASSETTE_PATH', os.path.join(DATA_DIR, 'cassette.jsonl')),
+    timing=os.environ.get('CASSETTE_TIMING', 'fast').lower()
+) if CASSETTE_MODE != 'off' else None
+
+# Every model is described once in model_registry.MODEL_REGISTRY; the adapters built from it
+# share the static parts of their requests across calls
+provider_context = ProviderContext(
+    get_api_key=lambda provider: {
+        'huggingface': HUGGINGFACE_API_KEY,
+        'anthropic': ANTHROPIC_API_KEY,
+        'cohere': COHERE_API_KEY
+    }[provider],
+    hf_session=hf_session,
+    hf_api_base=HF_API_BASE,
+    clients=provider_clients,
+    timeout=REQUEST_TIMEOUT,
+    max_tokens=MAX_TOKENS,
+    temperature=TEMPERATURE,
+    hf_batcher=hf_batcher,
+    hf_loading=hf_loading,
+    cassette=cassette,
+    cassette_mode=CASSETTE_MODE,
+    acquire_rate_limit=acquire_rate_limit
+)
 
-def get_t0pp_response(question):
-    """Get response from T0++"""
-    return get_huggingface_response("bigscience/T0pp", question)
-
-def get_gpt_neo_response(question):
-    """Get response from GPT-Neo"""
-    return get_huggingface_response("EleutherAI/gpt-neo-1.3B", question)
+# AI Model information
+ai_model_info = build_model_info(MODEL_REGISTRY, MAX_TOKENS)
 
-def get_dolly_response(question):
-    """Get response from Dolly"""
-    return get_huggingface_response("databricks/dolly-v2-3b", question)
+# Map model names to their adapters
+ai_models = build_models(MODEL_REGISTRY, provider_context)
 
-def get_falcon_response(question):
-    """Get response from Falcon"""
-    return get_huggingface_response("tiiuae/falcon-7b", question)
+hf_model_names = {name for name, model in ai_models.items() if model.provider == "huggingface"}
 
-def get_mpt_response(question):
-    """Get response from MPT"""
-    return get_huggingface_response("mosaicml/mpt-7b", question)
+# Models whose provider can stream partial tokens; they accept an ``on_token`` callback
+token_streaming_models = {name for name, model in ai_models.items() if model.streams_tokens}
 
-def get_pythia_response(question):
-    """Get response from Pythia"""
-    return get_huggingface_response("EleutherAI/pythia-1.4b", question)
+# Hugging Face models that people use at this hour of day get keep-alive calls so they stay loaded,
+# within a budget of KEEP_WARM_BUDGET calls per hour shared by every worker
+KEEP_WARM_INTERVAL = float(os.environ.get('KEEP_WARM_INTERVAL', 300))
+KEEP_WARM_BUDGET = float(os.environ.get('KEEP_WARM_BUDGET', 60))
 
-def get_claude_response(question):
-    """Get response from Claude-2"""
+def spend_keep_warm_budget():
+    """Take one keep-alive from the shared hourly budget; False once it is used up"""
+    if KEEP_WARM_BUDGET <= 0:
+        return False
     try:
-        if not ANTHROPIC_API_KEY:
-            return {
-                "response": "Error: Anthropic API key is not configured. Please set up your API key in the .env file.",
-                "confidence": 0,
-                "response_time": 0
-            }
-
-        start_time = time.time()
-        
-        # Initialize the Anthropic client
-        client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-        
-        # Create a message using the latest format
-        message = client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=int(os.environ.get('MAX_TOKENS', 512)),
-            messages=[{"role": "user", "content": question}]
-        )
-        
-        response_time = time.time() - start_time
-        
-        # Extract the response text from the message
-        response_text = message.content[0].text if message.content else "No response generated"
-        
-        return {
-            "response": response_text,
-            "confidence": 0.95,
-            "response_time": response_time
-        }
-            
-    except Exception as e:
-        return get_fallback_response("Claude-2", str(e))
-
-def get_qwen3_response(question):
-    """Get response from Qwen3 8B"""
-    try:
-        if not HUGGINGFACE_API_KEY:
-            return {
-                "response": "Error: Hugging Face API key is not configured. Please set up your API key in the .env file.",
-                "confidence": 0,
-                "response_time": 0
-            }
-
-        start_time = time.time()
-        API_URL = "https://api-inference.huggingface.co/models/Qwen/Qwen1.5-7B-Chat"
-        headers = {
-            "Authorization": f"Bearer {HUGGINGFACE_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "inputs": question,
-            "parameters": {
-                "max_length": int(os.environ.get('MAX_TOKENS', 512)),
-                "temperature": float(os.environ.get('TEMPERATURE', 0.7)),
-                "num_return_sequences": 1,
-                "do_sample": True,
-                "top_p": 0.9,
-                "top_k": 50
-            }
-        }
+        rate_limiter.acquire([('keep-warm', KEEP_WARM_BUDGET / 3600, max(1.0, KEEP_WARM_BUDGET / 12))])
+    except RateLimited:
+        return False
+    return True
+
+KEEP_WARM_IDLE_TIMEOUT = float(os.environ.get('KEEP_WARM_IDLE_TIMEOUT', 900))
+
+def claim_keep_alive(model_name):
+    """Take this window's keep-alive for a model, so only one worker on the node sends it"""
+    window = max(KEEP_WARM_INTERVAL, KEEP_WARM_IDLE_TIMEOUT - KEEP_WARM_INTERVAL)
+    return rate_limiter.try_acquire([(f'keep-alive:{model_name}', 1 / window, 1.0)]) == 0
+
+keep_warm = KeepWarmScheduler(
+    idle_timeout=KEEP_WARM_IDLE_TIMEOUT,
+    interval=KEEP_WARM_INTERVAL,
+    min_demand=float(os.environ.get('KEEP_WARM_MIN_DEMAND', 2)),
+    top_n=int(os.environ.get('KEEP_WARM_TOP_N', 3)),
+    spend=spend_keep_warm_budget,
+    claim=claim_keep_alive
+)
+
+def send_keep_alive(model_name):
+    """Keep a Hugging Face model loaded; True if it is loaded or now loading.
+
+    A model that has already gone cold gets the shared warm-up, so calls arriving meanwhile
+    wait for it instead of failing; a loaded one gets a one-token call.
+    """
+    adapter = ai_models[model_name]
+    if not HUGGINGFACE_API_KEY or (hf_loading is not None and hf_loading.is_loading(adapter.model_id)):
+        return False
+    if hf_loading is not None and hf_loading.prewarm(adapter.model_id,
+                                                     lambda: adapter.is_loaded(HUGGINGFACE_API_KEY),
+                                                     lambda: adapter.warm_up(HUGGINGFACE_API_KEY)):
+        return True
+    return adapter.warm_up(HUGGINGFACE_API_KEY)[0]
+
+def note_cold_start(model_id, seconds, loaded):
+    """Teach the keep-warm scheduler how long a model took to load"""
+    if loaded:
+        for name in hf_model_names:
+            if MODEL_REGISTRY[name]["model_id"] == model_id:
+                keep_warm.record_cold_start(name, seconds)
+
+# Question sent when checking whether a model is reachable
+HEALTH_PROBE_QUESTION = "Hello, this is a test."
+
+def probe_model(model_name):
+    """Make one test call to a model and return ``(success, latency)``"""
+    start_time = time.monotonic()
+    response_data = ai_models[model_name](HEALTH_PROBE_QUESTION)
+    return response_data.get("confidence", 0) > 0, time.monotonic() - start_time
+
+# A model that keeps failing is skipped for a while instead of costing every request a timeout
+model_breakers = BreakerBoard(
+    MODEL_REGISTRY,
+    probe_model,
+    failure_threshold=int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 5)),
+    window=float(os.environ.get('BREAKER_WINDOW', 60)),
+    reset_timeout=float(os.environ.get('BREAKER_RESET_TIMEOUT', 30)),
+    slow_call_threshold=float(os.environ.get('BREAKER_SLOW_CALL', 20))
+)
+
+# Measured latency of every successful upstream call, over roughly the last LATENCY_WINDOW seconds
+model_latency = LatencyRecorder(ai_models, window=float(os.environ.get('LATENCY_WINDOW', 600)))
+
+# Hugging Face calls are safe to repeat, so one that runs past the model's usual p95 gets a backup copy
+HEDGE_ENABLED = os.environ.get('HEDGE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+model_hedger = Hedger(
+    model_latency,
+    budget_ratio=float(os.environ.get('HEDGE_BUDGET_RATIO', 0.1)),
+    percentile=float(os.environ.get('HEDGE_PERCENTILE', 95)),
+    min_samples=int(os.environ.get('HEDGE_MIN_SAMPLES', 20)),
+    max_workers=FANOUT_MAX_WORKERS,
+    is_success=lambda response_data: response_data.get("confidence", 0) > 0
+)
+hedged_models = set(hf_model_names) if HEDGE_ENABLED else set()
+
+# Once a model has ADAPTIVE_TIMEOUT_MIN_SAMPLES recent successful calls, its calls time out at
+# ADAPTIVE_TIMEOUT_MULTIPLIER times its p99 latency instead of the full REQUEST_TIMEOUT
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.environ.get('ADAPTIVE_TIMEOUT_MULTIPLIER', 2))
+ADAPTIVE_TIMEOUT_MIN = float(os.environ.get('ADAPTIVE_TIMEOUT_MIN', 5))
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.environ.get('ADAPTIVE_TIMEOUT_MIN_SAMPLES', 20))
+
+def model_timeout(model_name):
+    """Seconds a call to ``model_name`` may take, from its recent latency"""
+    if ADAPTIVE_TIMEOUT_MULTIPLIER <= 0 or model_latency.count(model_name) < ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+        return REQUEST_TIMEOUT
+    # A model that is loading answers much slower than usual, and is waited for up to HF_LOADING_MAX_WAIT
+    if hf_loading is not None and model_name in hf_model_names and hf_loading.is_loading(MODEL_REGISTRY[model_name]["model_id"]):
+        return REQUEST_TIMEOUT
+    p99 = model_latency.percentile(model_name, 99)
+    return min(REQUEST_TIMEOUT, max(ADAPTIVE_TIMEOUT_MIN, p99 * ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+def check_model_connection(model_name):
+    """Status string shown for a model by /test-connections"""
+    success, _ = probe_model(model_name)
+    return "Connected successfully" if success else "Connection failed"
+
+# Seconds each model gets during a health check, how often the checks repeat (0 turns the schedule off)
+# and how many run at once. The results are shared through DATA_DIR/health.sqlite3, so one worker
+# makes the test calls for every worker on the node
+HEALTH_PROBE_TIMEOUT = float(os.environ.get('HEALTH_PROBE_TIMEOUT', 10))
+HEALTH_CHECK_INTERVAL = float(os.environ.get('HEALTH_CHECK_INTERVAL', 600))
+HEALTH_MAX_CONCURRENCY = int(os.environ.get('HEALTH_MAX_CONCURRENCY', 4))
+model_health = HealthMonitor(
+    ai_models,
+    check_model_connection,
+    probe_timeout=HEALTH_PROBE_TIMEOUT,
+    max_concurrency=HEALTH_MAX_CONCURRENCY,
+    store=HealthStore(os.path.join(DATA_DIR, 'health.sqlite3'))
+)
+
+def format_latency(stats):
+    return f"p50 {stats['p50']:.1f}s · p95 {stats['p95']:.1f}s · p99 {stats['p99']:.1f}s ({stats['count']} calls)"
+
+def get_model_info():
+    """Card details with each model's measured latency in place of the registry's estimate"""
+    latency = model_latency.snapshot()
+    model_info = {}
+    for model_name, details in ai_model_info.items():
+        stats = latency.get(model_name)
+        if stats and stats["count"]:
+            details = dict(details, avg_response_time=format_latency(stats), latency=stats)
+        model_info[model_name] = details
+    return model_info
+
+def get_timeout_response(model_name, elapsed):
+    """Response used for a model that missed the comparison deadline"""
+    return {
+        "response": f"{model_name} did not respond within {COMPARISON_TIMEOUT:g} seconds.",
+        "confidence": 0,
+        "response_time": elapsed,
+        "timed_out": True
+    }
 
-        response = requests.post(
-            API_URL,
-            headers=headers,
-            json=data,
-            timeout=REQUEST_TIMEOUT
-        )
-        response_time = time.time() - start_time
-
-        if response.status_code == 200:
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                if isinstance(result[0], dict) and "generated_text" in result[0]:
-                    text = result[0]["generated_text"]
-                else:
-                    text = result[0]
-            else:
-                text = str(result)
-                
-            # Clean up the response
-            text = text.replace(question, "", 1).strip()
-            if len(text) == 0:
-                text = "I apologize, but I couldn't generate a meaningful response. Please try rephrasing your question."
-                
-            return {
-                "response": text,
-                "confidence": 0.9,
-                "response_time": response_time
-            }
-        else:
-            return get_fallback_response("Qwen3", f"API Error: {response.status_code}. {response.text}")
-            
-    except Exception as e:
-        return get_fallback_response("Qwen3", str(e))
+def get_overloaded_response(retry_after=5):
+    """503 page for a comparison this worker has no capacity to run"""
+    response = app.make_response((render_template("index.html",
+                                                  error="The service is busy right now. Please try again in a few seconds.",
+                                                  ai_models=ai_models,
+                                                  model_info=get_model_info(),
+                                                  api_key_status=api_key_status,
+                                                  model_health=model_breakers.snapshot()), 503))
+    response.headers["Retry-After"] = str(max(1, round(retry_after)))
+    return response
+
+def get_circuit_open_response(model_name, retry_in):
+    """Response used while a model's circuit breaker is refusing calls"""
+    return {
+        "response": f"{model_name} is temporarily unavailable after repeated failures. It will be tried again in about {max(1, round(retry_in))} seconds.",
+        "confidence": 0,
+        "response_time": 0,
+        "circuit_open": True
+    }
 
-def get_deepseek_response(question):
-    """Get response from DeepSeek R1"""
+def fetch_model_response(model_name, question, key, fresh=False, on_token=None):
+    """Call the model upstream, unless another worker is already fetching the same answer"""
+    breaker = model_breakers[model_name]
+    if not breaker.allow_request():
+        return get_circuit_open_response(model_name, breaker.retry_in())
+    claimed = False
+    # A forced fresh call must not be answered with whatever is already in the shared cache
+    if flight_claims is not None and not fresh:
+        claimed = flight_claims.claim(key)
+        if not claimed:
+            shared = flight_claims.wait(key, lambda: response_cache.get(key), deadline.bounded(REQUEST_TIMEOUT))
+            if shared is not None:
+                return shared
+    if model_name in hf_model_names:
+        keep_warm.record_use(model_name)
     try:
-        if not HUGGINGFACE_API_KEY:
-            return {
-                "response": "Error: Hugging Face API key is not configured. Please set up your API key in the .env file.",
-                "confidence": 0,
-                "response_time": 0
-            }
-
-        start_time = time.time()
-        API_URL = "https://api-inference.huggingface.co/models/deepseek-ai/deepseek-coder-6.7b-base"
-        headers = {
-            "Authorization": f"Bearer {HUGGINGFACE_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "inputs": question,
-            "parameters": {
-                "max_length": int(os.environ.get('MAX_TOKENS', 512)),
-                "temperature": float(os.environ.get('TEMPERATURE', 0.7)),
-                "num_return_sequences": 1,
-                "do_sample": True,
-                "top_p": 0.9,
-                "top_k": 50
-            }
-        }
-
-        response = requests.post(
-            API_URL,
-            headers=headers,
-            json=data,
-            timeout=REQUEST_TIMEOUT
-        )
-        response_time = time.time() - start_time
-
-        if response.status_code == 200:
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                if isinstance(result[0], dict) and "generated_text" in result[0]:
-                    text = result[0]["generated_text"]
-                else:
-                    text = result[0]
+        start_time = time.monotonic()
+        with deadline.deadline_after(model_timeout(model_name)):
+            if on_token is not None and model_name in token_streaming_models:
+                response_data = ai_models[model_name](question, on_token=on_token)
+            elif model_name in hedged_models:
+                # The hedger runs the call on its own threads, which need the deadline handed over
+                response_data = model_hedger.call(model_name, deadline.propagate(lambda: ai_models[model_name](question)))
             else:
-                text = str(result)
-                
-            # Clean up the response
-            text = text.replace(question, "", 1).strip()
-            if len(text) == 0:
-                text = "I apologize, but I couldn't generate a meaningful response. Please try rephrasing your question."
-                
-            return {
-                "response": text,
-                "confidence": 0.95,
-                "response_time": response_time
-            }
-        else:
-            return get_fallback_response("DeepSeek R1", f"API Error: {response.status_code}. {response.text}")
-            
-    except Exception as e:
-        return get_fallback_response("DeepSeek R1", str(e))
-
-def get_qwen30b_response(question):
-    """Get response from Qwen3 30B A3B"""
-    try:
-        if not HUGGINGFACE_API_KEY:
-            return {
-                "response": "Error: Hugging Face API key is not configured. Please set up your API key in the .env file.",
-                "confidence": 0,
-                "response_time": 0
-            }
-
-        start_time = time.time()
-        API_URL = "https://api-inference.huggingface.co/models/Qwen/Qwen1.5-14B-Chat"
-        headers = {
-            "Authorization": f"Bearer {HUGGINGFACE_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "inputs": question,
-            "parameters": {
-                "max_length": int(os.environ.get('MAX_TOKENS', 512)),
-                "temperature": float(os.environ.get('TEMPERATURE', 0.7)),
-                "num_return_sequences": 1,
-                "do_sample": True,
-                "top_p": 0.9,
-                "top_k": 50
-            }
-        }
-
-        response = requests.post(
-            API_URL,
-            headers=headers,
-            json=data,
-            timeout=REQUEST_TIMEOUT
-        )
-        response_time = time.time() - start_time
-
-        if response.status_code == 200:
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                if isinstance(result[0], dict) and "generated_text" in result[0]:
-                    text = result[0]["generated_text"]
-                else:
-                    text = result[0]
+                response_data = ai_models[model_name](question)
+        elapsed = time.monotonic() - start_time
+        if response_data.get("confidence", 0) == 0 and deadline.expired():
+            # Cut short by the comparison deadline rather than its own timeout, e.g. after queueing
+            # behind other models, so the time it got says nothing about its health
+            response_data = dict(response_data, deadline_exceeded=True)
+        # A model that is still loading, was held back by its rate limit or ran out of the
+        # comparison's time is not broken, and the breaker must not shut it out
+        if not any(response_data.get(flag) for flag in ("loading", "rate_limited", "deadline_exceeded")):
+            breaker.record(response_data.get("confidence", 0) > 0, elapsed)
+        if response_data.get("confidence", 0) > 0:
+            model_latency.record(model_name, elapsed)
+        # Fallback and error payloads all carry zero confidence and must never be replayed
+        if response_data.get("confidence", 0) > 0:
+            response_cache.set(key, dict(response_data))
+        return response_data
+    finally:
+        if claimed:
+            flight_claims.release(key)
+
+def call_model(model_name, question, fresh=False, on_token=None):
+    """Get a model's response, served from the response cache unless ``fresh`` is set.
+
+    ``on_token`` receives partial text as it is generated, for models that can stream it.
+    """
+    key = make_key(model_name, question, MAX_TOKENS, TEMPERATURE)
+    if not fresh:
+        cached = response_cache.get(key)
+        metrics.CACHE_LOOKUPS.labels(result="miss" if cached is None else "hit").inc()
+        if cached is not None:
+            return dict(cached, cached=True)
+
+    response_data, coalesced = model_calls.do(
+        key,
+        lambda: fetch_model_response(model_name, question, key, fresh, on_token)
+    )
+    return dict(response_data, cached=False, coalesced=coalesced)
+
+def check_model_keys(selected_models):
+    """Split the selected models into those that can run and errors for those missing an API key"""
+    runnable = []
+    errors = []
+    provider_names = {'huggingface': 'Hugging Face', 'anthropic': 'Anthropic', 'cohere': 'Cohere'}
+    for model_name in selected_models:
+        if model_name in ai_models:
+            # Check if required API key is available
+            provider = MODEL_REGISTRY[model_name]['provider']
+            # Replayed responses need no provider, so no key either
+            if not provider_context.get_api_key(provider) and CASSETTE_MODE != 'replay':
+                errors.append(f"{model_name} requires {provider_names[provider]} API key")
             else:
-                text = str(result)
-                
-            # Clean up the response
-            text = text.replace(question, "", 1).strip()
-            if len(text) == 0:
-                text = "I apologize, but I couldn't generate a meaningful response. Please try rephrasing your question."
-                
-            return {
-                "response": text,
-                "confidence": 0.92,
-                "response_time": response_time
-            }
-        else:
-            return get_fallback_response("Qwen3 30B", f"API Error: {response.status_code}. {response.text}")
-            
-    except Exception as e:
-        return get_fallback_response("Qwen3 30B", str(e))
+                runnable.append(model_name)
+    return runnable, errors
 
-def get_fallback_response(model_name, error_message=None):
-    """Enhanced fallback response with optional error message"""
-    message = error_message or f"I apologize, but {model_name} is currently unavailable. Please try again later or select a different AI model."
+def get_pending_response():
+    """Placeholder card shown while a streamed comparison waits for a model"""
     return {
-        "response": message,
+        "response": "Waiting for a response...",
         "confidence": 0,
-        "response_time": 0
+        "response_time": 0,
+        "pending": True
     }
 
-# Map model names to their functions
-ai_models = {
-    "Cohere-Command": get_cohere_response,  # Add Cohere to the models
-    "Claude-2": get_claude_response,
-    "FLAN-T5": get_flan_response,
-    "GPT-2": get_gpt2_response,
-    "BLOOM": get_bloom_response,
-    "DialoGPT": get_dialogpt_response,
-    "OPT": get_opt_response,
-    "BART": get_bart_response,
-    "T0pp": get_t0pp_response,
-    "GPT-Neo": get_gpt_neo_response,
-    "Dolly": get_dolly_response,
-    "Falcon": get_falcon_response,
-    "MPT": get_mpt_response,
-    "Pythia": get_pythia_response,
-    "Qwen3": get_qwen3_response,
-    "DeepSeek R1": get_deepseek_response,
-    "Qwen3 30B": get_qwen30b_response
-}
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-# Store votes (in-memory storage - replace with database in production)
-model_votes = {}
+def warm_up_clients():
+    """Build the provider clients and open their connections before the first request"""
+    results = provider_clients.warm_up({
+        'anthropic': ANTHROPIC_API_KEY,
+        'cohere': COHERE_API_KEY
+    })
+    if HUGGINGFACE_API_KEY:
+        try:
+            hf_session.get().head(HF_API_BASE, timeout=5)
+            results['huggingface'] = None
+        except Exception as e:
+            results['huggingface'] = str(e)
+    return results
+
+_background_tasks_pid = None
+
+def start_background_tasks():
+    """Start this worker's housekeeping threads; safe to call more than once"""
+    global _background_tasks_pid
+    if _background_tasks_pid == os.getpid():
+        return
+    _background_tasks_pid = os.getpid()
+    start_purger(response_cache, RESPONSE_CACHE_PURGE_INTERVAL)
+    start_purger(batch_store, RESPONSE_CACHE_PURGE_INTERVAL)
+    vote_store.start(VOTE_FLUSH_INTERVAL, LEADERBOARD_REFRESH_INTERVAL)
+    atexit.register(vote_store.flush)
+    if HEALTH_CHECK_INTERVAL > 0:
+        model_health.start(HEALTH_CHECK_INTERVAL)
+    if KEEP_WARM_INTERVAL > 0:
+        keep_warm.start(send_keep_alive)
+    metrics_store.start(metrics.REGISTRY, METRICS_PUBLISH_INTERVAL)
+    atexit.register(lambda: metrics_store.publish(metrics.REGISTRY))
+
+# Batch comparisons run on their own pool, with a cap on concurrent calls per provider
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 8))
+BATCH_PROVIDER_CONCURRENCY = parse_provider_limits(os.environ.get('BATCH_PROVIDER_CONCURRENCY', 'huggingface=4,anthropic=2,cohere=2'), default=2)
+BATCH_MAX_CELLS = int(os.environ.get('BATCH_MAX_CELLS', 5000))
+batch_store = BatchStore(
+    os.path.join(DATA_DIR, 'batches.sqlite3'),
+    ttl=float(os.environ.get('BATCH_RESULT_TTL', 7 * 24 * 3600))
+)
+BATCH_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Votes are counted in memory and flushed in batches to a SQLite file every worker shares
+vote_store = VoteStore(
+    os.path.join(DATA_DIR, 'votes.sqlite3'),
+    batch_size=int(os.environ.get('VOTE_FLUSH_BATCH', 100))
+)
+VOTE_FLUSH_INTERVAL = float(os.environ.get('VOTE_FLUSH_INTERVAL', 5))
+LEADERBOARD_REFRESH_INTERVAL = float(os.environ.get('LEADERBOARD_REFRESH_INTERVAL', 30))
+
+def queued(model_name, func):
+    """Wrap ``func`` so it runs under the current deadline and the time it waits for a fan-out thread is recorded"""
+    queued_at = time.perf_counter()
+    func = deadline.propagate(func)
+
+    def run():
+        metrics.MODEL_QUEUE_SECONDS.labels(model=model_name).observe(time.perf_counter() - queued_at)
+        return func()
+    return run
+
+_render_starts = threading.local()
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    _render_starts.__dict__.setdefault("stack", []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def stop_render_timer(sender, template, context, **extra):
+    stack = getattr(_render_starts, "stack", None)
+    if stack:
+        metrics.TEMPLATE_RENDER_SECONDS.labels(template=template.name).observe(time.perf_counter() - stack.pop())
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.response_status = 500
+    metrics.HTTP_REQUESTS_IN_FLIGHT.labels().inc()
+
+@app.after_request
+def note_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def stop_request_timer(exc):
+    started = g.pop("request_started", None)
+    if started is None:
+        return
+    metrics.HTTP_REQUESTS_IN_FLIGHT.labels().dec()
+    metrics.HTTP_REQUEST_SECONDS.labels(
+        endpoint=request.endpoint or "unknown",
+        method=request.method,
+        status=g.pop("response_status", 500)
+    ).observe(time.perf_counter() - started)
 
 @app.context_processor
 def utility_processor():
@@ -566,68 +610,258 @@ def index():
     if request.method == "POST":
         user_question = request.form["question"]
         selected_models = request.form.getlist("ai_models")
+        fresh = bool(request.form.get("fresh") or request.args.get("fresh"))
         
         if not selected_models:
             return render_template("index.html", 
                                 error="Please select at least one AI model",
                                 ai_models=ai_models,
-                                model_info=ai_model_info,
-                                api_key_status=api_key_status)
+                                model_info=get_model_info(),
+                                api_key_status=api_key_status,
+                                model_health=model_breakers.snapshot())
         
         # Get responses only from selected models
         ai_responses = {}
-        errors = []
+        runnable_models, errors = check_model_keys(selected_models)
+        
+        if request.form.get("stream") and runnable_models:
+            # Render the page straight away; results.html fills the cards in from /api/stream.
+            # The question stays on the server, so the stream URL is short and can only start the calls once
+            session_id = new_session_id()
+            token = history_store.save_pending(get_owner_id(), session_id, user_question, runnable_models, fresh,
+                                               ttl=STREAM_TOKEN_TTL)
+            return render_template("results.html",
+                                 question=user_question,
+                                 responses={name: get_pending_response() for name in runnable_models},
+                                 model_info=get_model_info(),
+                                 session_id=session_id,
+                                 stream_url=url_for("stream_comparison", session_id=session_id, token=token),
+                                 errors=errors if errors else None)
         
-        for model_name in selected_models:
-            if model_name in ai_models:
-                # Check if required API key is available
-                if model_name.startswith("Cohere") and not COHERE_API_KEY:
-                    errors.append(f"{model_name} requires Cohere API key")
-                    continue
-                elif model_name == "Claude-2" and not ANTHROPIC_API_KEY:
-                    errors.append(f"{model_name} requires Anthropic API key")
-                    continue
-                elif not model_name.startswith("Cohere") and model_name != "Claude-2" and not HUGGINGFACE_API_KEY:
-                    errors.append(f"{model_name} requires Hugging Face API key")
-                    continue
+        if not comparison_gate.try_enter():
+            return get_overloaded_response()
+        try:
+            # Provider calls still running when the page gives up are cut off at the same deadline
+            with deadline.deadline_after(COMPARISON_TIMEOUT):
+                tasks = {
+                    model_name: queued(model_name, lambda model_name=model_name: call_model(model_name, user_question, fresh))
+                    for model_name in runnable_models
+                }
                 
-                try:
-                    response_data = ai_models[model_name](user_question)
-                    ai_responses[model_name] = response_data
-                except Exception as e:
-                    errors.append(f"Error with {model_name}: {str(e)}")
+                # Call every selected model at once; the page waits for the slowest one, up to the deadline
+                start_time = time.time()
+                completed = {}
+                for model_name, future in iter_completed(tasks, COMPARISON_TIMEOUT, MAX_CONCURRENT_MODELS, FANOUT_MAX_WORKERS):
+                    if future is None:
+                        completed[model_name] = get_timeout_response(model_name, time.time() - start_time)
+                        continue
+                    try:
+                        completed[model_name] = future.result()
+                    except Exception as e:
+                        errors.append(f"Error with {model_name}: {str(e)}")
+        finally:
+            comparison_gate.leave()
+        
+        # Every model was over its rate limit; say so instead of showing a page of refusals
+        if completed and all(response_data.get("rate_limited") for response_data in completed.values()):
+            return get_overloaded_response(min(response_data["retry_after"] for response_data in completed.values()))
         
-        session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        session['last_question'] = user_question
-        session['last_responses'] = ai_responses
+        # Keep the cards in the order the models were selected
+        for model_name in tasks:
+            if model_name in completed:
+                ai_responses[model_name] = completed[model_name]
+        
+        session_id = new_session_id()
+        history_store.save(get_owner_id(), session_id, user_question, ai_responses)
         
         return render_template("results.html", 
                              question=user_question, 
                              responses=ai_responses,
-                             model_info=ai_model_info,
+                             model_info=get_model_info(),
                              session_id=session_id,
                              errors=errors if errors else None)
     
     return render_template("index.html", 
                          ai_models=ai_models, 
-                         model_info=ai_model_info,
-                         api_key_status=api_key_status)
+                         model_info=get_model_info(),
+                         api_key_status=api_key_status,
+                         model_health=model_breakers.snapshot())
+
+@app.route("/api/stream")
+def stream_comparison():
+    """Server-Sent Events stream of a comparison, one event per model as soon as it answers.
+
+    Emits ``token`` events with partial text for models that support token streaming,
+    a ``result`` event per model, ``error`` events and a final ``done`` event. The comparison
+    is the one the results page saved under ``session_id``; its one-time ``token`` starts it.
+    """
+    session_id = request.args.get("session_id")
+    owner_id = get_owner_id()
+    pending = history_store.take_pending(owner_id, session_id, request.args.get("token", ""))
+    if pending is None:
+        return jsonify({"error": "This comparison has already started or has expired."}), 404
+    user_question = pending["question"]
+    runnable_models, errors = check_model_keys(pending["models"])
+    fresh = pending["fresh"]
+    events = queue.Queue()
+
+    def task(model_name):
+        on_token = lambda text: events.put(("token", {"model": model_name, "text": text}))
+        return call_model(model_name, user_question, fresh, on_token=on_token)
+
+    def run_comparison():
+        with deadline.deadline_after(COMPARISON_TIMEOUT):
+            run_until_deadline()
+
+    def run_until_deadline():
+        start_time = time.time()
+        tasks = {model_name: queued(model_name, lambda model_name=model_name: task(model_name)) for model_name in runnable_models}
+        completed = {}
+        try:
+            for model_name, future in iter_completed(tasks, COMPARISON_TIMEOUT, MAX_CONCURRENT_MODELS, FANOUT_MAX_WORKERS):
+                if future is None:
+                    result = get_timeout_response(model_name, time.time() - start_time)
+                else:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        events.put(("error", {"model": model_name, "error": f"Error with {model_name}: {str(e)}"}))
+                        continue
+                completed[model_name] = result
+                events.put(("result", dict(result, model=model_name)))
+            if session_id and completed:
+                history_store.save(owner_id, session_id, user_question,
+                                   {model_name: completed[model_name] for model_name in tasks if model_name in completed})
+        finally:
+            comparison_gate.leave()
+            events.put(("done", {}))
+
+    def generate():
+        if not comparison_gate.try_enter():
+            yield format_sse("error", {"error": "The service is busy right now. Please try again in a few seconds."})
+            yield format_sse("done", {})
+            return
+        threading.Thread(target=run_comparison, name="sse-comparison", daemon=True).start()
+        for error in errors:
+            yield format_sse("error", {"error": error})
+        while True:
+            try:
+                event, data = events.get(timeout=SSE_KEEPALIVE_INTERVAL)
+            except queue.Empty:
+                # Comment lines keep proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event, data)
+            if event == "done":
+                break
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/batch", methods=["POST"])
+def run_batch():
+    """Run every prompt against every model and stream the results back as NDJSON.
+
+    Takes ``{"prompts": [...], "models": [...], "batch_id": ..., "fresh": false}``.
+    The first line names the batch; then one ``cell`` line per prompt and model
+    in the order they finish, and a final ``done`` line. Posting again with the
+    same ``batch_id`` replays the cells that already succeeded and only runs
+    the rest.
+    """
+    data = request.get_json(silent=True) or {}
+    prompts = data.get("prompts")
+    selected_models = data.get("models")
+    fresh = bool(data.get("fresh"))
+    batch_id = data.get("batch_id") or secrets.token_hex(8)
+
+    if (not isinstance(prompts, list) or not prompts or not all(isinstance(prompt, str) and prompt.strip() for prompt in prompts)
+            or not isinstance(selected_models, list) or not selected_models
+            or not all(isinstance(model_name, str) for model_name in selected_models)):
+        return jsonify({"error": "prompts and models must be non-empty lists of strings"}), 400
+    unknown = [model_name for model_name in selected_models if model_name not in ai_models]
+    if unknown:
+        return jsonify({"error": f"Unknown models: {', '.join(map(str, unknown))}"}), 400
+    if len(prompts) * len(selected_models) > BATCH_MAX_CELLS:
+        return jsonify({"error": f"A batch may have at most {BATCH_MAX_CELLS} prompt and model pairs"}), 400
+    if not isinstance(batch_id, str) or not BATCH_ID_PATTERN.match(batch_id):
+        return jsonify({"error": "batch_id may only contain letters, digits, '-' and '_'"}), 400
+
+    runnable_models, errors = check_model_keys(list(dict.fromkeys(selected_models)))
+    finished = batch_store.finished(batch_id)
+
+    def run(cell):
+        prompt_index, model_name = cell
+        return call_model(model_name, prompts[prompt_index], fresh)
+
+    def generate():
+        yield json.dumps({"type": "batch", "batch_id": batch_id, "prompts": len(prompts), "models": runnable_models}) + "\n"
+        for error in errors:
+            yield json.dumps({"type": "error", "error": error}) + "\n"
+
+        pending = []
+        resumed = 0
+        for prompt_index, prompt in enumerate(prompts):
+            for model_name in runnable_models:
+                stored = finished.get((prompt_index, model_name))
+                if stored is not None and stored[0] == prompt:
+                    resumed += 1
+                    yield json.dumps(dict(stored[1], type="cell", prompt_index=prompt_index, model=model_name, resumed=True)) + "\n"
+                else:
+                    pending.append((prompt_index, model_name))
+
+        failed = 0
+        for (prompt_index, model_name), future in iter_cells(
+            pending, run, lambda cell: MODEL_REGISTRY[cell[1]]["provider"],
+            BATCH_PROVIDER_CONCURRENCY, BATCH_MAX_WORKERS, get_batch_executor(BATCH_MAX_WORKERS)
+        ):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = get_fallback_response(model_name, str(e))
+            if result.get("confidence", 0) > 0:
+                batch_store.save(batch_id, prompt_index, model_name, prompts[prompt_index], result)
+            else:
+                failed += 1
+            yield json.dumps(dict(result, type="cell", prompt_index=prompt_index, model=model_name, resumed=False)) + "\n"
+
+        yield json.dumps({"type": "done", "batch_id": batch_id, "cells": resumed + len(pending),
+                          "resumed": resumed, "failed": failed}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson",
+                    headers={"X-Batch-Id": batch_id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/metrics")
+def get_metrics():
+    """Metrics of every worker on the node, summed, in the Prometheus text format"""
+    return Response(metrics_store.render(metrics.REGISTRY), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/stats")
+def get_stats():
+    """Measured latency percentiles per model, with the settings they inform"""
+    return jsonify({
+        "window": model_latency.window,
+        "models": model_latency.snapshot(),
+        "hedging": dict(model_hedger.stats(), enabled=HEDGE_ENABLED, percentile=model_hedger.percentile),
+        "loading": hf_loading.stats() if hf_loading is not None else None,
+        "keep_warm": dict(keep_warm.stats(), budget_per_hour=KEEP_WARM_BUDGET),
+        "cassette": dict(cassette.stats(), mode=CASSETTE_MODE) if cassette is not None else None,
+        "settings": {
+            "request_timeout": REQUEST_TIMEOUT,
+            "model_timeouts": {model_name: round(model_timeout(model_name), 1) for model_name in ai_models},
+            "comparison_timeout": COMPARISON_TIMEOUT,
+            "max_concurrent_models": MAX_CONCURRENT_MODELS
+        }
+    })
 
 @app.route("/test-connections")
 def test_connections():
-    results = {}
-    
-    for model_name, model_func in ai_models.items():
-        try:
-            response = model_func("Hello, this is a test.")
-            if response.get("confidence", 0) > 0:
-                results[model_name] = "Connected successfully"
-            else:
-                results[model_name] = "Connection failed"
-        except Exception as e:
-            results[model_name] = f"Error: {str(e)}"
-    
-    return jsonify(results)
+    """Latest health check results; pass ``refresh=1`` to check every model again first"""
+    refresh = request.args.get("refresh", "").lower() in ("1", "true", "yes")
+    snapshot = model_health.snapshot(refresh=refresh)
+    response = jsonify(snapshot["results"])
+    response.headers["X-Checked-At"] = datetime.fromtimestamp(snapshot["checked_at"], timezone.utc).isoformat()
+    response.headers["Age"] = str(int(time.time() - snapshot["checked_at"]))
+    return response
 
 @app.route("/vote", methods=["POST"])
 def vote():
@@ -639,14 +873,19 @@ def vote():
         if not model_name or not vote_type:
             return jsonify({"error": "Missing required data"}), 400
         
-        if model_name not in model_votes:
-            model_votes[model_name] = {"up": 0, "down": 0}
+        if model_name not in ai_models or vote_type not in VOTE_TYPES:
+            return jsonify({"error": "Unknown model or vote type"}), 400
         
-        model_votes[model_name][vote_type] += 1
-        return jsonify(model_votes[model_name])
+        vote_store.record(model_name, vote_type)
+        return jsonify(vote_store.totals(model_name).get(model_name, dict.fromkeys(VOTE_TYPES, 0)))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/leaderboard")
+def leaderboard():
+    """Models ranked by votes, from a snapshot refreshed every LEADERBOARD_REFRESH_INTERVAL seconds"""
+    return jsonify(vote_store.leaderboard(max_age=LEADERBOARD_REFRESH_INTERVAL))
+
 @app.route("/export", methods=["POST"])
 def export():
     try:
@@ -682,17 +921,7 @@ def save_history():
                 'error': 'Missing required data'
             }), 400
             
-        # Here you would typically save to a database
-        # For now, we'll store in session
-        if 'history' not in session:
-            session['history'] = []
-            
-        session['history'].append({
-            'session_id': session_id,
-            'question': question,
-            'responses': responses,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        })
+        history_store.save(get_owner_id(), session_id, question, responses)
         
         return jsonify({
             'success': True,
@@ -714,12 +943,7 @@ def get_response_data(session_id):
                 'error': 'Session ID required'
             }), 400
             
-        # Get data from session
-        history = session.get('history', [])
-        response_data = next(
-            (item for item in history if item['session_id'] == session_id),
-            None
-        )
+        response_data = history_store.get(get_owner_id(), session_id)
         
         if not response_data:
             return jsonify({
@@ -739,12 +963,30 @@ def get_response_data(session_id):
 
 @app.route("/api/get-history")
 def get_history():
-    """API endpoint to get all history items"""
+    """API endpoint to get history items a page at a time, newest first.
+
+    ``limit`` sets the page size and ``before`` takes the ``next_before``
+    value of the previous page. ``since`` and ``until`` take ISO 8601 times
+    and keep only the entries saved in that range.
+    """
     try:
-        history = session.get('history', [])
+        limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), 100)
+        before = request.args.get('before', type=int)
+        try:
+            since, until = (
+                datetime.fromisoformat(request.args[name]).timestamp() if request.args.get(name) else None
+                for name in ('since', 'until')
+            )
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'since and until must be ISO 8601 times'
+            }), 400
+        history, next_before = history_store.page(get_owner_id(), limit=limit, before=before, since=since, until=until)
         return jsonify({
             'success': True,
-            'history': history
+            'history': history,
+            'next_before': next_before
         })
     except Exception as e:
         return jsonify({
@@ -754,13 +996,25 @@ def get_history():
 
 @app.route("/view-responses/<session_id>")
 def view_responses(session_id):
-    """Route to view previous responses"""
+    """Route to view previous responses, loaded from this browser's history"""
+    entry = history_store.get(get_owner_id(), session_id)
+    if entry is None:
+        return render_template("results.html",
+                             from_history=True,
+                             question="",
+                             responses={},
+                             session_id=session_id,
+                             model_info=get_model_info(),
+                             errors=["These responses are no longer in your history."]), 404
     return render_template("results.html", 
                          from_history=True,
+                         question=entry['question'],
+                         responses={name: data for name, data in entry['responses'].items() if name in ai_model_info},
                          session_id=session_id,
-                         model_info=ai_model_info)
+                         model_info=get_model_info())
 
 if __name__ == "__main__":
     # Only use debug mode in development
     debug_mode = os.environ.get('FLASK_ENV') == 'development'
+    start_background_tasks()
     app.run(host='0.0.0.0', debug=debug_mode)
\ No newline at end of file
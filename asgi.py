@@ -0,0 +1,77 @@
+"""ASGI entry point.
+
+POST /api/compare runs comparisons on the event loop through async_providers, so
+a single worker can hold hundreds of upstream calls open at once. Every other
+route is served by the Flask app from app.py. Run with for example:
+
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+"""
+import json
+
+from asgiref.wsgi import WsgiToAsgi
+
+import async_providers
+from app import app, start_background_tasks
+
+flask_application = WsgiToAsgi(app)
+
+
+async def read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return json.loads(body or b"{}")
+
+
+async def send_json(send, status, data):
+    body = json.dumps(data).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def compare_endpoint(scope, receive, send):
+    """Compare models for a JSON body of ``{"question", "models", "fresh"}``"""
+    try:
+        data = await read_json(receive)
+    except ValueError:
+        return await send_json(send, 400, {"success": False, "error": "Invalid JSON body"})
+
+    question = data.get("question")
+    models = data.get("models")
+    if not question or not models:
+        return await send_json(send, 400, {"success": False, "error": "Missing required data"})
+
+    responses, errors = await async_providers.compare(question, models, bool(data.get("fresh")))
+    await send_json(send, 200, {
+        "success": True,
+        "question": question,
+        "responses": responses,
+        "errors": errors
+    })
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_background_tasks()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_providers.close_clients()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(scope, receive, send)
+    if scope["type"] == "http" and scope["path"] == "/api/compare" and scope["method"] == "POST":
+        return await compare_endpoint(scope, receive, send)
+    return await flask_application(scope, receive, send)
@@ -0,0 +1,309 @@
+"""asyncio versions of the provider calls, used by the ASGI entry point in asgi.py.
+
+Each upstream call is a coroutine, so one worker can keep hundreds of model
+calls open without a thread per call. Responses share the response cache and
+payload format of the synchronous functions in app.py.
+"""
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+import anthropic
+import cohere
+
+import app as sync_app
+from loading import parse_estimated_time
+from model_registry import MODEL_REGISTRY
+from providers import get_fallback_response, get_loading_response, get_missing_key_response, get_rate_limited_response
+from rate_limit import RateLimited
+from response_cache import make_key
+
+# The sync adapters already hold each model's URL, headers and encoded parameters; reuse them
+HF_ADAPTERS = {name: model for name, model in sync_app.ai_models.items() if model.provider == "huggingface"}
+
+# Connections kept open to each provider host by this worker's event loop
+ASYNC_POOL_LIMIT = int(os.environ.get('ASYNC_POOL_LIMIT', 256))
+
+_clients = {"loop": None}
+_inflight = {}
+
+
+def _loop_clients():
+    """Clients bound to the running event loop, built on first use and rebuilt for a new loop"""
+    loop = asyncio.get_running_loop()
+    if _clients["loop"] is not loop:
+        _clients.clear()
+        _inflight.clear()
+        _clients["loop"] = loop
+    return _clients
+
+
+def get_hf_session():
+    clients = _loop_clients()
+    if clients.get("huggingface") is None:
+        clients["huggingface"] = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=ASYNC_POOL_LIMIT, limit_per_host=ASYNC_POOL_LIMIT),
+            timeout=aiohttp.ClientTimeout(total=sync_app.REQUEST_TIMEOUT)
+        )
+    return clients["huggingface"]
+
+
+def get_anthropic_client():
+    clients = _loop_clients()
+    if clients.get("anthropic") is None:
+        clients["anthropic"] = anthropic.AsyncAnthropic(api_key=sync_app.ANTHROPIC_API_KEY)
+    return clients["anthropic"]
+
+
+def get_cohere_client():
+    clients = _loop_clients()
+    if clients.get("cohere") is None:
+        clients["cohere"] = cohere.AsyncClient(sync_app.COHERE_API_KEY, check_api_key=False)
+    return clients["cohere"]
+
+
+async def close_clients():
+    """Close the connection pools of the running loop"""
+    clients = _loop_clients()
+    if clients.get("huggingface") is not None:
+        await clients["huggingface"].close()
+    if clients.get("anthropic") is not None:
+        await clients["anthropic"].close()
+    if clients.get("cohere") is not None:
+        await clients["cohere"].close()
+    clients.clear()
+
+
+async def take_rate_limit_token(model_name):
+    """Charge one upstream request to the model's rate limits, like the sync adapters do.
+
+    Waiting for a token sleeps, so it runs off the event loop; raises RateLimited when none comes in time.
+    """
+    await asyncio.to_thread(sync_app.rate_limiter.acquire, sync_app.get_rate_buckets(model_name), sync_app.RATE_LIMIT_MAX_WAIT)
+
+
+async def post_huggingface(adapter, question):
+    """Send one question to a Hugging Face model; return ``(status, body, response_time)``.
+
+    The request is limited to the model's adaptive timeout, which ``call_model`` leaves to
+    this function for Hugging Face so that waiting for a loading model is not cut short by it.
+    Each request, including the retry after a loading wait, takes its own rate-limit token.
+    """
+    await take_rate_limit_token(adapter.name)
+    start_time = time.time()
+    async with get_hf_session().post(
+        adapter.url,
+        headers=adapter.headers(sync_app.HUGGINGFACE_API_KEY),
+        data=adapter.build_body(question),
+        timeout=aiohttp.ClientTimeout(total=sync_app.model_timeout(adapter.name))
+    ) as response:
+        body = await response.text()
+    return response.status, body, time.time() - start_time
+
+
+async def get_huggingface_response(model_name, question):
+    """Get a response from Hugging Face's inference API without blocking the event loop"""
+    adapter = HF_ADAPTERS[model_name]
+    try:
+        if not sync_app.HUGGINGFACE_API_KEY:
+            return get_missing_key_response("huggingface")
+
+        loading = sync_app.hf_loading
+        # A loading model's warm-up is shared; waiting for it parks this coroutine, not a thread
+        if loading is not None and loading.is_loading(adapter.model_id):
+            if not await loading.wait_until_warm_async(adapter.model_id, loading.max_wait):
+                return get_loading_response(loading.ready_in(adapter.model_id) or None, 0)
+
+        status, body, response_time = await post_huggingface(adapter, question)
+        if status == 503 and loading is not None:
+            api_key = sync_app.HUGGINGFACE_API_KEY
+            loading.note_loading(adapter.model_id, parse_estimated_time(body), lambda: adapter.warm_up(api_key))
+            if await loading.wait_until_warm_async(adapter.model_id, loading.max_wait):
+                status, body, response_time = await post_huggingface(adapter, question)
+        return adapter.parse_response(status, body, lambda: json.loads(body), question, response_time)
+
+    except RateLimited as e:
+        return get_rate_limited_response(model_name, e.retry_after)
+    except asyncio.TimeoutError:
+        return get_fallback_response(model_name, "Request timed out")
+    except Exception as e:
+        return get_fallback_response(model_name, str(e))
+
+
+async def get_claude_response(question):
+    """Get response from Claude-2 through the async Anthropic client"""
+    try:
+        if not sync_app.ANTHROPIC_API_KEY:
+            return get_missing_key_response("anthropic")
+
+        await take_rate_limit_token("Claude-2")
+        start_time = time.time()
+        message = await get_anthropic_client().messages.create(
+            model=MODEL_REGISTRY["Claude-2"]["model_id"],
+            max_tokens=sync_app.MAX_TOKENS,
+            messages=[{"role": "user", "content": question}],
+            timeout=sync_app.REQUEST_TIMEOUT
+        )
+        response_time = time.time() - start_time
+
+        return {
+            "response": message.content[0].text if message.content else "No response generated",
+            "confidence": MODEL_REGISTRY["Claude-2"]["confidence"],
+            "response_time": response_time
+        }
+
+    except RateLimited as e:
+        return get_rate_limited_response("Claude-2", e.retry_after)
+    except Exception as e:
+        return get_fallback_response("Claude-2", str(e))
+
+
+async def get_cohere_response(question):
+    """Get response from Cohere Command through the async Cohere client"""
+    try:
+        if not sync_app.COHERE_API_KEY:
+            return get_missing_key_response("cohere")
+
+        await take_rate_limit_token("Cohere-Command")
+        start_time = time.time()
+        response = await get_cohere_client().generate(
+            model=MODEL_REGISTRY["Cohere-Command"]["model_id"],
+            prompt=question,
+            max_tokens=sync_app.MAX_TOKENS,
+            temperature=sync_app.TEMPERATURE,
+            k=0,
+            stop_sequences=[],
+            return_likelihoods='NONE'
+        )
+        response_time = time.time() - start_time
+
+        return {
+            "response": response.generations[0].text.strip(),
+            "confidence": MODEL_REGISTRY["Cohere-Command"]["confidence"],
+            "response_time": response_time
+        }
+
+    except RateLimited as e:
+        return get_rate_limited_response("Cohere-Command", e.retry_after)
+    except Exception as e:
+        return get_fallback_response("Cohere-Command", str(e))
+
+
+async_models = {
+    "Cohere-Command": get_cohere_response,
+    "Claude-2": get_claude_response
+}
+for _model_name in HF_ADAPTERS:
+    async_models[_model_name] = lambda question, model_name=_model_name: get_huggingface_response(model_name, question)
+
+
+async def call_upstream(model_name, question):
+    """Call the model, or in cassette replay mode answer from its recordings; record mode records the answer"""
+    cassette = sync_app.cassette
+    if cassette is not None and sync_app.CASSETTE_MODE == "replay":
+        found = cassette.lookup(model_name, question)
+        if found is None:
+            return get_fallback_response(model_name, f"No recorded response from {model_name} for this question.")
+        response_data, elapsed = found
+        if cassette.timing == "original":
+            await asyncio.sleep(elapsed)
+        return response_data
+    start_time = time.monotonic()
+    response_data = await async_models[model_name](question)
+    if cassette is not None and sync_app.CASSETTE_MODE == "record":
+        await asyncio.to_thread(cassette.record, model_name, question, response_data, time.monotonic() - start_time)
+    return response_data
+
+
+async def call_model(model_name, question, fresh=False):
+    """Async counterpart of app.call_model: cached, and coalesced with identical calls on this loop"""
+    key = make_key(model_name, question, sync_app.MAX_TOKENS, sync_app.TEMPERATURE)
+    # The cache may be SQLite-backed, so keep its disk access off the event loop
+    if not fresh:
+        cached = await asyncio.to_thread(sync_app.response_cache.get, key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+    _loop_clients()
+    while key in _inflight:
+        pending = _inflight[key]
+        try:
+            return dict(await asyncio.shield(pending), cached=False, coalesced=True)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # The caller that started the shared call hit its own deadline and took the call with it;
+            # this caller still wants the answer, so it makes the call itself
+
+    breaker = sync_app.model_breakers[model_name]
+    if not breaker.allow_request():
+        return dict(sync_app.get_circuit_open_response(model_name, breaker.retry_in()), cached=False)
+
+    if model_name in sync_app.hf_model_names:
+        sync_app.keep_warm.record_use(model_name)
+    pending = _inflight[key] = asyncio.get_running_loop().create_future()
+    try:
+        start_time = time.monotonic()
+        try:
+            # Cancelled once the model runs past its usual latency, instead of after the full REQUEST_TIMEOUT.
+            # Hugging Face requests get that timeout one by one, so a wait for a loading model is only
+            # held to the comparison deadline
+            timeout = None if model_name in sync_app.hf_model_names else sync_app.model_timeout(model_name)
+            response_data = await asyncio.wait_for(call_upstream(model_name, question), timeout)
+        except asyncio.TimeoutError:
+            response_data = get_fallback_response(model_name, "Request timed out")
+        elapsed = time.monotonic() - start_time
+        # Loading and rate-limited models are not broken, as in app.fetch_model_response
+        if not response_data.get("loading") and not response_data.get("rate_limited"):
+            breaker.record(response_data.get("confidence", 0) > 0, elapsed)
+        if response_data.get("confidence", 0) > 0:
+            sync_app.model_latency.record(model_name, elapsed)
+        if response_data.get("confidence", 0) > 0:
+            await asyncio.to_thread(sync_app.response_cache.set, key, dict(response_data))
+        pending.set_result(response_data)
+    except asyncio.CancelledError:
+        pending.cancel()
+        raise
+    except Exception as e:
+        pending.set_exception(e)
+        # Nobody else may be waiting; mark the exception as retrieved
+        pending.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+    return dict(response_data, cached=False, coalesced=False)
+
+
+async def compare(question, selected_models, fresh=False):
+    """Run a comparison on the event loop and return ``(responses, errors)``.
+
+    Models run at most ``MAX_CONCURRENT_MODELS`` at a time under one
+    ``COMPARISON_TIMEOUT`` deadline; calls still open at the deadline are
+    cancelled and reported as timed out.
+    """
+    runnable_models, errors = sync_app.check_model_keys(selected_models)
+    semaphore = asyncio.Semaphore(sync_app.MAX_CONCURRENT_MODELS)
+    start_time = time.time()
+
+    async def run(model_name):
+        async with semaphore:
+            return await call_model(model_name, question, fresh)
+
+    tasks = {model_name: asyncio.ensure_future(run(model_name)) for model_name in runnable_models}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=sync_app.COMPARISON_TIMEOUT)
+
+    responses = {}
+    for model_name, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            responses[model_name] = sync_app.get_timeout_response(model_name, time.time() - start_time)
+        elif task.cancelled():
+            responses[model_name] = sync_app.get_timeout_response(model_name, time.time() - start_time)
+        elif task.exception() is not None:
+            errors.append(f"Error with {model_name}: {str(task.exception())}")
+        else:
+            responses[model_name] = task.result()
+    return responses, errors
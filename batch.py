@@ -0,0 +1,123 @@
+"""Batch comparisons: many prompts across many models, scheduled per provider and resumable"""
+import json
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from sqlite_store import SQLiteStore
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_batch_executor(max_workers):
+    """Pool for batch cells, kept apart from the fan-out pool so batches never starve page requests"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch")
+        return _executor
+
+
+def parse_provider_limits(value, default):
+    """Parse ``"huggingface=4,anthropic=2"`` into ``{provider: limit}``"""
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            provider, limit = item.split("=", 1)
+            limits[provider.strip()] = max(1, int(limit))
+    limits.setdefault("default", default)
+    return limits
+
+
+def iter_cells(cells, run, provider_of, limits, max_workers, executor):
+    """Run every cell and yield ``(cell, future)`` as each one finishes.
+
+    At most ``max_workers`` cells run at once and at most ``limits[provider]``
+    (or ``limits["default"]``) of them for any one provider. Cells waiting on a
+    busy provider never hold a worker, so a slow provider cannot block the
+    others. Closing the generator drops the cells that have not started.
+    """
+    queues = {}
+    for cell in cells:
+        queues.setdefault(provider_of(cell), deque()).append(cell)
+    running = {}
+    active = dict.fromkeys(queues, 0)
+
+    def submit_ready():
+        # Take one cell per provider in turn so every provider makes progress
+        progress = True
+        while progress and len(running) < max_workers:
+            progress = False
+            for provider, queued in queues.items():
+                if queued and active[provider] < limits.get(provider, limits["default"]) and len(running) < max_workers:
+                    cell = queued.popleft()
+                    running[executor.submit(run, cell)] = (provider, cell)
+                    active[provider] += 1
+                    progress = True
+
+    try:
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider, cell = running.pop(future)
+                active[provider] -= 1
+                yield cell, future
+            submit_ready()
+    finally:
+        for future in running:
+            future.cancel()
+
+
+class BatchStore(SQLiteStore):
+    """Finished cells of every batch, so an interrupted batch can resume where it stopped.
+
+    A cell is ``(batch_id, prompt_index, model)``; its prompt is stored with
+    it and a stored result is only reused for the same prompt. Batches older
+    than ``ttl`` seconds are dropped by ``purge_expired``.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS batch_cells (
+            batch_id TEXT NOT NULL,
+            prompt_index INTEGER NOT NULL,
+            model TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            result BLOB NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (batch_id, prompt_index, model)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS batch_cells_created ON batch_cells (created_at)"
+    )
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        super().__init__(path)
+        self.ttl = ttl
+
+    def finished(self, batch_id):
+        """``{(prompt_index, model): (prompt, result)}`` for every stored cell of ``batch_id``"""
+        rows = self._connect().execute(
+            "SELECT prompt_index, model, prompt, result FROM batch_cells WHERE batch_id = ?", (batch_id,)
+        ).fetchall()
+        return {(index, model): (prompt, json.loads(zlib.decompress(result))) for index, model, prompt, result in rows}
+
+    def save(self, batch_id, prompt_index, model, prompt, result):
+        blob = zlib.compress(json.dumps(result, separators=(",", ":")).encode("utf-8"))
+        self._connect().execute(
+            "INSERT OR REPLACE INTO batch_cells (batch_id, prompt_index, model, prompt, result, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (batch_id, prompt_index, model, prompt, blob, time.time())
+        )
+
+    def purge_expired(self):
+        return self._connect().execute(
+            "DELETE FROM batch_cells WHERE created_at <= ?", (time.time() - self.ttl,)
+        ).rowcount
+
+    def clear(self):
+        self._connect().execute("DELETE FROM batch_cells")
@@ -0,0 +1,197 @@
+"""Local stand-ins for the Hugging Face, Anthropic and Cohere APIs.
+
+Each provider answers in the format the app's adapters expect, after a
+latency drawn from a log-normal distribution. It can also fail with a 500
+at ``error_rate``. Hugging Face models can answer 503 "currently loading"
+at ``loading_rate``, or for ``cold_seconds`` after their first call. Point
+the app at a running server with::
+
+    HF_API_BASE=http://127.0.0.1:8700 ANTHROPIC_BASE_URL=http://127.0.0.1:8700 CO_API_URL=http://127.0.0.1:8700
+
+Run ``python benchmarks/fake_providers.py --port 8700`` to use it on its own.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PROFILES = {
+    "huggingface": {"median": 0.3, "sigma": 0.5, "error_rate": 0.0, "loading_rate": 0.0, "cold_seconds": 0},
+    "anthropic": {"median": 1.0, "sigma": 0.4, "error_rate": 0.0},
+    "cohere": {"median": 0.5, "sigma": 0.4, "error_rate": 0.0}
+}
+
+
+def parse_profile(value, profiles=None):
+    """Apply ``"huggingface:median=0.3,error_rate=0.01"`` on top of ``profiles`` (the defaults if omitted)"""
+    profiles = {provider: dict(profile) for provider, profile in (profiles or DEFAULT_PROFILES).items()}
+    provider, _, settings = value.partition(":")
+    if provider not in profiles:
+        raise ValueError(f"Unknown provider {provider!r}; expected one of {', '.join(profiles)}")
+    for item in settings.split(","):
+        if "=" in item:
+            name, number = item.split("=", 1)
+            profiles[provider][name.strip()] = float(number)
+    return profiles
+
+
+class FakeProviders:
+    """A threaded HTTP server that plays all three providers on one port"""
+
+    def __init__(self, profiles=None, host="127.0.0.1", port=0, seed=None):
+        self.profiles = profiles or DEFAULT_PROFILES
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self._first_call = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-providers", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def latency(self, provider):
+        profile = self.profiles[provider]
+        with self._lock:
+            return profile["median"] * math.exp(profile.get("sigma", 0) * self.random.gauss(0, 1))
+
+    def chance(self, rate):
+        with self._lock:
+            return self.random.random() < rate
+
+    def cold_for(self, model_id):
+        """Seconds the model has left to load, or 0 once it is warm"""
+        cold_seconds = self.profiles["huggingface"].get("cold_seconds", 0)
+        with self._lock:
+            first_call = self._first_call.setdefault(model_id, time.monotonic())
+        return max(0.0, cold_seconds - (time.monotonic() - first_call))
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_json(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                if self.path.startswith("/status/"):
+                    self.send_json(200, {"loaded": fake.cold_for(self.path[len("/status/"):]) == 0})
+                elif self.path.startswith("/v1/models"):
+                    self.send_json(200, {"data": [], "has_more": False, "first_id": None, "last_id": None})
+                else:
+                    self.send_json(200, {})
+
+            def do_POST(self):
+                body = self.read_json()
+                if self.path.startswith("/models/"):
+                    self.huggingface(self.path[len("/models/"):], body)
+                elif self.path.startswith("/v1/messages"):
+                    self.answer("anthropic", lambda: {
+                        "id": "msg_fake",
+                        "type": "message",
+                        "role": "assistant",
+                        "model": body.get("model"),
+                        "content": [{"type": "text", "text": f"Fake Anthropic answer to: {body['messages'][-1]['content']}"}],
+                        "stop_reason": "end_turn",
+                        "stop_sequence": None,
+                        "usage": {"input_tokens": 10, "output_tokens": 10}
+                    })
+                elif self.path.startswith("/v1/generate"):
+                    self.answer("cohere", lambda: {
+                        "id": "gen_fake",
+                        "prompt": body.get("prompt"),
+                        "generations": [{"id": "gen_fake_0", "text": f" Fake Cohere answer to: {body.get('prompt')}"}],
+                        "meta": {}
+                    })
+                else:
+                    self.send_json(404, {"error": "Not found"})
+
+            def answer(self, provider, build):
+                with fake._lock:
+                    fake.requests[provider] += 1
+                time.sleep(fake.latency(provider))
+                if fake.chance(fake.profiles[provider].get("error_rate", 0)):
+                    self.send_json(500, {"error": "Injected failure"})
+                else:
+                    self.send_json(200, build())
+
+            def huggingface(self, model_id, body):
+                options = body.get("options") or {}
+                cold = fake.cold_for(model_id)
+                if cold and options.get("wait_for_model"):
+                    time.sleep(cold)
+                    cold = 0
+                if cold or fake.chance(fake.profiles["huggingface"].get("loading_rate", 0)):
+                    with fake._lock:
+                        fake.requests["huggingface_loading"] += 1
+                    self.send_json(503, {"error": f"Model {model_id} is currently loading",
+                                         "estimated_time": round(cold or 20.0, 1)})
+                    return
+                inputs = body.get("inputs")
+
+                def build():
+                    if isinstance(inputs, list):
+                        return [[{"generated_text": f"{question} Fake answer from {model_id}."}] for question in inputs]
+                    return [{"generated_text": f"{inputs} Fake answer from {model_id}."}]
+                self.answer("huggingface", build)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--profile", action="append", default=[],
+                        help="Provider settings, e.g. huggingface:median=0.3,sigma=0.5,error_rate=0.01,loading_rate=0.05")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    profiles = DEFAULT_PROFILES
+    for value in args.profile:
+        profiles = parse_profile(value, profiles)
+    fake = FakeProviders(profiles, args.host, args.port, args.seed)
+    print(f"Fake providers listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
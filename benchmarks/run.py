@@ -0,0 +1,314 @@
+"""Load test the app against local fake providers and compare the numbers with a saved baseline.
+
+Starts the fake providers in benchmarks/fake_providers.py and the app under
+gunicorn, pointed at them. Then it drives each scenario at the given
+concurrency and reports, per scenario:
+- throughput
+- p50 and p99 latency
+- errors
+- the memory of every gunicorn worker
+
+No API quota is spent. Examples::
+
+    python benchmarks/run.py --requests 300 --concurrency 16 --save-baseline
+    python benchmarks/run.py --requests 300 --concurrency 16 --fail-on-regression
+    python benchmarks/run.py --profile huggingface:loading_rate=0.05 --baseline loading
+    python benchmarks/run.py --cassette instance/cassette.jsonl --baseline replay
+
+With ``--cassette`` the app replays a recorded cassette (see cassette.py)
+instead of calling the stand-ins. The compare scenario then asks the
+recorded questions.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.fake_providers import DEFAULT_PROFILES, FakeProviders, parse_profile  # noqa: E402
+from cassette import Cassette  # noqa: E402
+
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+DEFAULT_MODELS = ["GPT-2", "BLOOM", "Claude-2", "Cohere-Command"]
+
+
+def compare_request(i, args):
+    if args.prompts:
+        question = args.prompts[i % min(len(args.prompts), args.distinct_questions)]
+    else:
+        question = f"Benchmark question {i % args.distinct_questions}"
+    return "POST", "/", {"data": {"question": question, "ai_models": args.models}}
+
+
+def vote_request(i, args):
+    return "POST", "/vote", {"json": {"model": args.models[i % len(args.models)], "vote": "down" if i % 3 == 0 else "up"}}
+
+
+def save_history_request(i, args):
+    responses = {name: {"response": f"Saved answer {i}", "confidence": 0.8, "response_time": 0.2} for name in args.models}
+    return "POST", "/api/save-history", {"json": {"session_id": f"bench_{i}", "question": f"Benchmark question {i}",
+                                                  "responses": responses}}
+
+
+def test_connections_request(i, args):
+    return "GET", "/test-connections", {}
+
+
+SCENARIOS = {
+    "compare": compare_request,
+    "vote": vote_request,
+    "save-history": save_history_request,
+    "test-connections": test_connections_request
+}
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(base_url, build, args):
+    """Send ``args.requests`` requests from ``args.concurrency`` threads and summarise them"""
+    local = threading.local()
+
+    def send(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, kwargs = build(i, args)
+        start = time.perf_counter()
+        try:
+            status = session.request(method, base_url + path, timeout=args.timeout, **kwargs).status_code
+        except requests.exceptions.RequestException:
+            status = None
+        return time.perf_counter() - start, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(send, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, status in results if status is None or status >= 400),
+        "statuses": statuses,
+        "throughput": round(len(results) / elapsed, 2),
+        "p50": round(percentile(latencies, 50), 4),
+        "p99": round(percentile(latencies, 99), 4),
+        "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0
+    }
+
+
+def worker_pids(master_pid):
+    """Pids of the processes forked by ``master_pid``, from /proc"""
+    pids = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the parent pid is the second field after it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def worker_memory(master_pid):
+    """``{pid: {"rss_mb", "peak_rss_mb"}}`` for every gunicorn worker"""
+    memory = {}
+    for pid in worker_pids(master_pid):
+        fields = {}
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    name, _, value = line.partition(":")
+                    if name in ("VmRSS", "VmHWM"):
+                        fields[name] = int(value.split()[0]) / 1024
+        except OSError:
+            continue
+        memory[str(pid)] = {"rss_mb": round(fields.get("VmRSS", 0), 1), "peak_rss_mb": round(fields.get("VmHWM", 0), 1)}
+    return memory
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(args, fake_url, data_dir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        HF_API_BASE=fake_url,
+        ANTHROPIC_BASE_URL=fake_url,
+        CO_API_URL=fake_url,
+        HUGGINGFACE_API_KEY="hf_benchmark",
+        ANTHROPIC_API_KEY="sk-ant-benchmark",
+        COHERE_API_KEY="co-benchmark",
+        FLASK_SECRET_KEY="benchmark-secret",
+        DATA_DIR=data_dir,
+        # Background passes would add traffic the scenarios do not account for
+        KEEP_WARM_INTERVAL="0",
+        HEALTH_CHECK_INTERVAL="0"
+    )
+    if args.cassette:
+        env.update(CASSETTE_MODE="replay", CASSETTE_PATH=os.path.abspath(args.cassette), CASSETTE_TIMING=args.cassette_timing)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "wsgi:app", "--workers", str(args.workers), "--threads", str(args.threads),
+         "--worker-class", "gthread", "--bind", f"127.0.0.1:{port}", "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The app exited before it started serving")
+        try:
+            requests.get(base_url + "/", timeout=2)
+            return process, base_url
+        except requests.exceptions.RequestException:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("The app did not start serving within 60 seconds")
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Lines describing every scenario that got slower or bigger than ``tolerance`` allows"""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {current['throughput']}/s, was {previous['throughput']}/s")
+        if current["p99"] > previous["p99"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {current['p99'] * 1000:.0f}ms, was {previous['p99'] * 1000:.0f}ms")
+        # More than one extra failed request in a hundred
+        if current["errors"] / current["requests"] > previous["errors"] / previous["requests"] + 0.01:
+            regressions.append(f"{name}: {current['errors']} errors in {current['requests']}, was {previous['errors']} in {previous['requests']}")
+    current_peak = max((worker["peak_rss_mb"] for worker in results["memory"].values()), default=0)
+    previous_peak = max((worker["peak_rss_mb"] for worker in baseline.get("memory", {}).values()), default=0)
+    if previous_peak and current_peak > previous_peak * (1 + tolerance):
+        regressions.append(f"memory: peak worker RSS {current_peak}MB, was {previous_peak}MB")
+    return regressions
+
+
+def print_report(results):
+    print(f"{'scenario':<18}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, stats in results["scenarios"].items():
+        print(f"{name:<18}{stats['requests']:>9}{stats['errors']:>8}{stats['throughput']:>9.1f}"
+              f"{stats['p50'] * 1000:>9.0f}{stats['p99'] * 1000:>9.0f}")
+    for pid, memory in results["memory"].items():
+        print(f"worker {pid}: {memory['rss_mb']}MB RSS, {memory['peak_rss_mb']}MB peak")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the app against local fake providers")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="Models every comparison asks")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--distinct-questions", type=int, default=10 ** 9,
+                        help="Different questions the compare scenario cycles through; lower it to measure cache hits")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=16, help="Threads per gunicorn worker")
+    parser.add_argument("--timeout", type=float, default=60, help="Client timeout per request in seconds")
+    parser.add_argument("--profile", action="append", default=[],
+                        help="Fake provider settings, e.g. huggingface:median=0.3,sigma=0.5,error_rate=0.01")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cassette", help="Replay this recorded cassette instead of calling the stand-ins")
+    parser.add_argument("--cassette-timing", choices=("original", "fast"), default="original",
+                        help="Replay at the recorded speed or as fast as possible")
+    parser.add_argument("--baseline", default="default", help="Name of the baseline file in benchmarks/baselines")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed change against the baseline, as a fraction")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when a regression is found")
+    parser.add_argument("--output", help="Also write the results as JSON to this path")
+    args = parser.parse_args(argv)
+    args.models = [name for name in args.models.split(",") if name]
+    args.prompts = Cassette(args.cassette).prompts() if args.cassette else []
+    if args.cassette and not args.prompts:
+        parser.error(f"{args.cassette} has no recordings")
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    profiles = DEFAULT_PROFILES
+    for value in args.profile:
+        profiles = parse_profile(value, profiles)
+
+    fake = FakeProviders(profiles, seed=args.seed).start()
+    with tempfile.TemporaryDirectory(prefix="benchmark-data-") as data_dir:
+        process, base_url = start_app(args, fake.url, data_dir)
+        try:
+            results = {
+                "settings": {
+                    "workers": args.workers,
+                    "threads": args.threads,
+                    "concurrency": args.concurrency,
+                    "requests": args.requests,
+                    "models": args.models,
+                    "profiles": profiles,
+                    "cassette": args.cassette
+                },
+                "scenarios": {}
+            }
+            for name in scenarios:
+                results["scenarios"][name] = run_scenario(base_url, SCENARIOS[name], args)
+            results["memory"] = worker_memory(process.pid)
+            results["upstream_requests"] = dict(fake.requests)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+            fake.stop()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.baseline}.json")
+    regressions = []
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != results["settings"]:
+            print(f"Note: {baseline_path} was recorded with different settings")
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if not regressions:
+            print(f"No regressions against {baseline_path}")
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {baseline_path}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
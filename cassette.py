@@ -0,0 +1,92 @@
+"""Recorded provider responses, for load tests and offline demos without upstream calls"""
+import json
+import os
+import threading
+import time
+
+MODES = ("off", "record", "replay")
+
+
+class Cassette:
+    """Provider responses kept in an append-only JSON Lines file.
+
+    Each line is ``{"model", "prompt", "elapsed", "response"}``, where
+    ``elapsed`` is how long the real call took in seconds. ``record`` appends
+    a line with a single write, so every worker can record into the same
+    file, and keeps nothing in memory. ``replay`` answers from the
+    recordings loaded when the cassette was opened. It uses the recordings
+    for a model and prompt in turn, and with ``timing="original"`` it takes
+    as long as the recorded call did.
+    """
+
+    def __init__(self, path, timing="fast"):
+        self.path = path
+        self.timing = timing
+        self.hits = 0
+        self.misses = 0
+        self._recordings = {}
+        self._turns = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        key = (entry["model"], entry["prompt"])
+                        self._recordings.setdefault(key, []).append((entry["response"], float(entry["elapsed"])))
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut short by a crash while recording
+                        continue
+
+    def __len__(self):
+        return sum(len(recordings) for recordings in self._recordings.values())
+
+    def prompts(self):
+        """Every recorded prompt, in the order first recorded"""
+        return list(dict.fromkeys(prompt for _, prompt in self._recordings))
+
+    def record(self, model, prompt, response_data, elapsed):
+        line = json.dumps({"model": model, "prompt": prompt, "elapsed": round(elapsed, 4), "response": response_data},
+                          separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def lookup(self, model, prompt):
+        """``(response, elapsed)`` for the next recording of ``model`` and ``prompt``, or None"""
+        key = (model, prompt)
+        with self._lock:
+            recordings = self._recordings.get(key)
+            if not recordings:
+                self.misses += 1
+                return None
+            turn = self._turns.get(key, 0)
+            self._turns[key] = turn + 1
+            self.hits += 1
+        response_data, elapsed = recordings[turn % len(recordings)]
+        return dict(response_data), elapsed
+
+    def replay(self, model, prompt, sleep=time.sleep):
+        """The recorded response, after the recorded delay when timing is ``original``; None if never recorded"""
+        found = self.lookup(model, prompt)
+        if found is None:
+            return None
+        response_data, elapsed = found
+        if self.timing == "original":
+            sleep(elapsed)
+        return response_data
+
+    def stats(self):
+        return {"recordings": len(self), "hits": self.hits, "misses": self.misses, "timing": self.timing}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,136 @@
+"""Per-model circuit breakers that stop calling models which keep failing"""
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Tracks recent outcomes of one model's calls.
+
+    The breaker opens when a window of ``window`` seconds holds at least
+    ``failure_threshold`` failures and they make up at least half of the calls
+    in it. Calls slower than ``slow_call_threshold`` seconds count as failures.
+    While open every call is refused; once ``reset_timeout`` seconds have
+    passed the breaker goes half-open and ``on_half_open`` is called so a
+    single probe can decide whether to close it again or re-open it. Calls
+    are still refused while the probe runs.
+    """
+
+    def __init__(self, name, failure_threshold=5, window=60, reset_timeout=30,
+                 slow_call_threshold=20, on_half_open=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.slow_call_threshold = slow_call_threshold
+        self.on_half_open = on_half_open
+        self.state = CLOSED
+        self.opened_at = None
+        self.avg_latency = None
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def allow_request(self):
+        """Return True if a call may go upstream now"""
+        start_probe = False
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                start_probe = True
+        if start_probe and self.on_half_open:
+            self.on_half_open(self.name)
+        return False
+
+    def record(self, success, latency):
+        """Record the outcome of a call that went upstream"""
+        now = time.monotonic()
+        failed = not success or latency >= self.slow_call_threshold
+        with self._lock:
+            self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+            if self.state == HALF_OPEN:
+                # Only the probe runs while half-open, so its outcome decides the state
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._calls.clear()
+                return
+            self._calls.append((now, failed))
+            self._trim(now)
+            failures = sum(1 for _, call_failed in self._calls if call_failed)
+            if self.state == CLOSED and failures >= self.failure_threshold and failures * 2 >= len(self._calls):
+                self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self._calls.clear()
+
+    def retry_in(self):
+        """Seconds until the breaker will try the model again, or 0 if it is closed"""
+        if self.state != OPEN:
+            return 0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def snapshot(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "state": self.state,
+                "recent_calls": len(self._calls),
+                "recent_failures": sum(1 for _, failed in self._calls if failed),
+                "avg_latency": self.avg_latency,
+                "retry_in": self.retry_in()
+            }
+
+
+class BreakerBoard:
+    """One breaker per model, with background probes for breakers that go half-open.
+
+    ``probe(name)`` makes a test call and returns ``(success, latency)``; it
+    runs on a daemon thread so a request never waits for it.
+    """
+
+    def __init__(self, names, probe, **breaker_settings):
+        self.probe = probe
+        self.breakers = {
+            name: CircuitBreaker(name, on_half_open=self._start_probe, **breaker_settings)
+            for name in names
+        }
+
+    def __getitem__(self, name):
+        return self.breakers[name]
+
+    def _start_probe(self, name):
+        threading.Thread(target=self._run_probe, args=(name,), name=f"breaker-probe-{name}", daemon=True).start()
+
+    def _run_probe(self, name):
+        try:
+            success, latency = self.probe(name)
+        except Exception:
+            success, latency = False, 0
+        self.breakers[name].record(success, latency)
+
+    def snapshot(self):
+        """State of every breaker; also starts probes for breakers whose reset timeout has passed"""
+        for breaker in self.breakers.values():
+            breaker.allow_request()
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+    def reset(self):
+        for breaker in self.breakers.values():
+            with breaker._lock:
+                breaker.state = CLOSED
+                breaker.opened_at = None
+                breaker.avg_latency = None
+                breaker._calls.clear()
@@ -0,0 +1,64 @@
+"""A deadline carried from the incoming request down to each provider call"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+# ``(deadline, enclosing)``, where ``enclosing`` is the same pair for the block outside, or None
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline_after(seconds):
+    """Run the block under a deadline ``seconds`` from now, or the enclosing one if that is sooner"""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set((deadline if current is None else min(current[0], deadline), current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def enclosing():
+    """Run the block under the deadline that was in force outside the innermost ``deadline_after``"""
+    current = _deadline.get()
+    token = _deadline.set(None if current is None else current[1])
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one"""
+    current = _deadline.get()
+    return None if current is None else current[0] - time.monotonic()
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def bounded(timeout, minimum=0.1):
+    """``timeout`` cut down to the time left before the deadline, but never below ``minimum``"""
+    left = remaining()
+    return timeout if left is None else max(minimum, min(timeout, left))
+
+
+def propagate(func):
+    """Wrap ``func`` so it runs under the caller's deadline on whichever thread calls it.
+
+    Context variables do not follow work into a thread pool, so the deadline
+    is captured here and restored around each call.
+    """
+    deadline = _deadline.get()
+
+    def run(*args, **kwargs):
+        token = _deadline.set(deadline)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _deadline.reset(token)
+    return run
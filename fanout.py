@@ -0,0 +1,70 @@
+"""Concurrent fan-out of model calls with a shared comparison deadline"""
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+_executor = None
+
+
+def get_executor(max_workers):
+    """Return the process-wide executor used for model calls, creating it lazily"""
+    global _executor
+    if _executor is None:
+        # Created on first use so gunicorn workers never inherit pool threads from the master
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fanout")
+    return _executor
+
+
+def iter_completed(tasks, timeout, max_concurrency, max_workers=None, executor=None):
+    """Run the callables in ``tasks`` concurrently and yield them as they finish.
+
+    ``tasks`` maps a name to a zero-argument callable. At most ``max_concurrency``
+    of them run at the same time and all of them share a single ``timeout``
+    measured from the moment this generator starts. Yields ``(name, future)`` for
+    every task that finished in time, then ``(name, None)`` for every task that
+    missed the deadline. Tasks run on the shared fan-out pool unless another
+    ``executor`` is given.
+    """
+    if executor is None:
+        executor = get_executor(max_workers or max_concurrency)
+    deadline = time.monotonic() + timeout
+    queued = list(tasks.items())
+    running = {}
+
+    def submit_next():
+        while queued and len(running) < max_concurrency:
+            name, func = queued.pop(0)
+            running[executor.submit(func)] = name
+
+    submit_next()
+    while running:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield running.pop(future), future
+        submit_next()
+
+    # Whatever is left missed the deadline; queued calls are dropped and running
+    # ones are left to finish in the background without holding up the page.
+    for future, name in running.items():
+        future.cancel()
+        yield name, None
+    for name, _ in queued:
+        yield name, None
+
+
+def fan_out(tasks, timeout, max_concurrency, max_workers=None, executor=None):
+    """Run ``tasks`` concurrently and return ``(results, timed_out)``.
+
+    ``results`` maps each finished task name to its completed future and
+    ``timed_out`` lists the names that missed the deadline, in submission order.
+    """
+    results = {}
+    timed_out = []
+    for name, future in iter_completed(tasks, timeout, max_concurrency, max_workers, executor):
+        if future is None:
+            timed_out.append(name)
+        else:
+            results[name] = future
+    return results, timed_out
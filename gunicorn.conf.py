@@ -0,0 +1,14 @@
+"""Gunicorn settings, loaded automatically by `gunicorn wsgi:app`"""
+import os
+
+
+def post_worker_init(worker):
+    """Open provider connections in each worker before it takes traffic"""
+    if os.environ.get('WARM_CLIENTS_ON_BOOT', 'true').lower() != 'true':
+        return
+    from app import warm_up_clients
+    for provider, error in warm_up_clients().items():
+        if error:
+            worker.log.warning("Could not warm %s client: %s", provider, error)
+        else:
+            worker.log.info("Warmed %s client", provider)
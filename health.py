@@ -0,0 +1,202 @@
+"""Cached model health checks, refreshed in parallel in the background"""
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import deadline
+from fanout import fan_out
+from sqlite_store import SQLiteStore
+
+
+class HealthStore(SQLiteStore):
+    """The latest health snapshot, shared by every worker on the node.
+
+    A worker that wins ``claim_refresh`` runs the checks and ``save``s the
+    results; the others ``load`` them instead of making the same test calls.
+    A claim expires after its ``ttl`` so a crashed worker cannot hold it.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS health_snapshot (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            checked_at REAL NOT NULL,
+            results TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS health_refresh (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            pid INTEGER NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """
+    )
+
+    def load(self):
+        row = self._connect().execute("SELECT checked_at, results FROM health_snapshot WHERE id = 0").fetchone()
+        if row is None:
+            return None
+        return {"checked_at": row[0], "results": json.loads(row[1])}
+
+    def save(self, snapshot):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO health_snapshot (id, checked_at, results) VALUES (0, ?, ?)",
+            (snapshot["checked_at"], json.dumps(snapshot["results"], separators=(",", ":")))
+        )
+
+    def claim_refresh(self, ttl):
+        """Return True if this worker should run the next refresh"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("DELETE FROM health_refresh WHERE expires_at <= ?", (now,))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO health_refresh (id, pid, expires_at) VALUES (0, ?, ?)",
+            (os.getpid(), now + ttl)
+        )
+        return cursor.rowcount == 1
+
+    def release_refresh(self):
+        self._connect().execute("DELETE FROM health_refresh WHERE pid = ?", (os.getpid(),))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM health_snapshot")
+        conn.execute("DELETE FROM health_refresh")
+
+
+class HealthMonitor:
+    """Checks every model concurrently and keeps the latest results.
+
+    ``check(name)`` returns a short status string for one model. A refresh
+    runs up to ``max_concurrency`` checks at a time on the monitor's own
+    small pool, so test calls never take threads from comparisons, and each
+    check runs under a ``probe_timeout`` deadline; models that miss it are
+    reported as timed out. Readers get the cached snapshot unless they ask
+    for a refresh, and only one refresh runs at a time, so concurrent callers
+    share it. With a ``HealthStore`` the snapshot and that rule are shared by
+    every worker, so one worker makes the test calls for all of them.
+    """
+
+    def __init__(self, names, check, probe_timeout=10, max_concurrency=8, max_workers=None, store=None,
+                 poll_interval=0.2):
+        self.names = list(names)
+        self.check = check
+        self.probe_timeout = probe_timeout
+        self.max_concurrency = max_concurrency
+        self.max_workers = max_workers or max_concurrency
+        self.store = store
+        self.poll_interval = poll_interval
+        self._snapshot = None
+        self._refreshes = 0
+        self._refresh_lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # Created on first use so gunicorn workers never inherit pool threads from the master
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="health")
+            return self._executor
+
+    def refresh_timeout(self):
+        """Longest a full refresh can take: one ``probe_timeout`` per round of checks"""
+        return self.probe_timeout * math.ceil(len(self.names) / max(1, min(self.max_concurrency, self.max_workers)))
+
+    def _run_check(self, name):
+        with deadline.deadline_after(self.probe_timeout):
+            try:
+                return self.check(name)
+            except Exception as e:
+                return f"Error: {str(e)}"
+
+    def _check_all(self):
+        tasks = {name: (lambda name=name: self._run_check(name)) for name in self.names}
+        finished, timed_out = fan_out(tasks, self.refresh_timeout(), self.max_concurrency,
+                                      executor=self._get_executor())
+        results = {}
+        for name in self.names:
+            if name in timed_out:
+                results[name] = f"Error: Health check timed out after {self.probe_timeout}s"
+            else:
+                results[name] = finished[name].result()
+        return {"checked_at": time.time(), "results": results}
+
+    def _wait_for_shared(self, after):
+        """Wait for the worker holding the refresh claim to save newer results than ``after``"""
+        give_up = time.monotonic() + self.refresh_timeout()
+        while time.monotonic() < give_up:
+            shared = self.store.load()
+            if shared is not None and shared["checked_at"] > after:
+                return shared
+            time.sleep(self.poll_interval)
+        return self.store.load()
+
+    def refresh(self):
+        """Check every model now and return the new snapshot"""
+        started = self._refreshes
+        with self._refresh_lock:
+            # Someone else refreshed while we waited for the lock; use theirs
+            if self._refreshes != started:
+                return self._snapshot
+            if self.store is not None and not self.store.claim_refresh(self.refresh_timeout() + self.probe_timeout):
+                # Another worker is checking right now; wait for its results instead of repeating its calls
+                snapshot = self._wait_for_shared(time.time() - self.refresh_timeout())
+                if snapshot is None:
+                    snapshot = self._check_all()
+            else:
+                try:
+                    snapshot = self._check_all()
+                    if self.store is not None:
+                        self.store.save(snapshot)
+                finally:
+                    if self.store is not None:
+                        self.store.release_refresh()
+            self._snapshot = snapshot
+            self._refreshes += 1
+            return snapshot
+
+    def snapshot(self, refresh=False):
+        """Latest results as ``{"checked_at": ..., "results": {model: status}}``, checking first if needed"""
+        if refresh:
+            return self.refresh()
+        if self.store is not None:
+            shared = self.store.load()
+            if shared is not None:
+                self._snapshot = shared
+        if self._snapshot is None:
+            return self.refresh()
+        return self._snapshot
+
+    def refresh_if_older_than(self, max_age):
+        """Refresh unless the latest snapshot, from any worker, is under ``max_age`` seconds old"""
+        current = self.store.load() if self.store is not None else self._snapshot
+        if current is None or time.time() - current["checked_at"] >= max_age:
+            return self.refresh()
+        return current
+
+    def start(self, interval):
+        """Keep the snapshot no older than ``interval`` seconds from a daemon thread"""
+        def run():
+            while True:
+                wait = interval
+                try:
+                    snapshot = self.refresh_if_older_than(interval)
+                    # Wake when the snapshot goes stale, whichever worker took it
+                    wait = max(1.0, interval - (time.time() - snapshot["checked_at"]))
+                except Exception:
+                    pass
+                time.sleep(wait)
+
+        thread = threading.Thread(target=run, name="health-monitor", daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        self._snapshot = None
+        if self.store is not None:
+            self.store.clear()
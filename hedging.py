@@ -0,0 +1,101 @@
+"""Hedged requests: send a second copy of a slow call and use whichever answers first"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class HedgeBudget:
+    """Caps hedges at ``ratio`` extra calls per primary call.
+
+    Every primary call earns ``ratio`` of a token, up to ``burst`` tokens, and
+    every hedge spends a whole one. ``ratio`` is clamped to 1, so hedging can
+    at most double the upstream volume.
+    """
+
+    def __init__(self, ratio, burst=10):
+        self.ratio = min(max(ratio, 0.0), 1.0)
+        self.burst = burst
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Hedger:
+    """Runs calls so that one that outlives its model's usual latency gets a backup.
+
+    ``call(name, func)`` runs ``func`` and, if it has not finished after the
+    model's observed ``percentile`` latency, runs it again and returns whichever
+    copy gives a successful answer first. Latencies are read from
+    ``latencies``, a ``latency_stats.LatencyRecorder`` the caller keeps up to
+    date; models with fewer than ``min_samples`` recorded calls are never
+    hedged. Only use it for calls that are safe to repeat.
+    """
+
+    def __init__(self, latencies, budget_ratio=0.1, percentile=95, min_samples=20, max_workers=32, is_success=None):
+        self.latencies = latencies
+        self.budget = HedgeBudget(budget_ratio)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self.is_success = is_success or (lambda result: True)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Separate from the fan-out pool so calls waiting on it can never starve it
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hedge")
+            return self._executor
+
+    def hedge_delay(self, name):
+        """Seconds to wait before hedging a call to ``name``, or None if it should not be hedged"""
+        histogram = self.latencies.histogram(name)
+        if histogram.total < self.min_samples:
+            return None
+        return histogram.percentile(self.percentile)
+
+    def call(self, name, func):
+        self.budget.deposit()
+        delay = self.hedge_delay(name)
+        if delay is None:
+            return func()
+
+        executor = self._get_executor()
+        primary = executor.submit(func)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.budget.try_spend():
+            return primary.result()
+
+        self.hedges_sent += 1
+        hedge = executor.submit(func)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                winner, result = future, future.result()
+                if self.is_success(result):
+                    break
+            if self.is_success(result) or not pending:
+                if winner is hedge:
+                    self.hedges_won += 1
+                return result
+
+    def stats(self):
+        return {"hedges_sent": self.hedges_sent, "hedges_won": self.hedges_won, "budget_tokens": self.budget.tokens}
+
+    def reset(self):
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.budget.tokens = 0.0
@@ -0,0 +1,159 @@
+"""Comparison history kept on the server, keyed by an opaque per-browser owner id"""
+import json
+import secrets
+import sqlite3
+import time
+import zlib
+
+from sqlite_store import SQLiteStore
+
+
+class HistoryStore(SQLiteStore):
+    """History entries stored in a SQLite file shared by the workers on a node.
+
+    Each browser's session cookie only carries its ``owner_id``. Entries are
+    looked up by ``(owner_id, session_id)`` and listed newest first a page at
+    a time, optionally within a time range, all through indexes, so no
+    request has to load or send the whole history. Responses are stored as
+    zlib-compressed compact JSON and each owner keeps at most
+    ``max_entries`` entries.
+
+    A streamed comparison is kept as a pending entry until its stream starts:
+    ``save_pending`` returns a one-time token and ``take_pending`` hands the
+    comparison over once for that token, so the stream URL carries only the
+    session id and the token.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            responses BLOB NOT NULL,
+            created_at REAL NOT NULL,
+            UNIQUE (owner_id, session_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS history_owner_recent ON history (owner_id, id)",
+        "CREATE INDEX IF NOT EXISTS history_owner_created ON history (owner_id, created_at)",
+        """
+        CREATE TABLE IF NOT EXISTS pending_comparisons (
+            owner_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            token TEXT NOT NULL,
+            question TEXT NOT NULL,
+            models TEXT NOT NULL,
+            fresh INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (owner_id, session_id)
+        )
+        """
+    )
+
+    def __init__(self, path, max_entries=100):
+        super().__init__(path)
+        self.max_entries = max_entries
+
+    def _row_to_entry(self, row):
+        entry_id, session_id, question, responses, created_at = row
+        return {
+            "id": entry_id,
+            "session_id": session_id,
+            "question": question,
+            "responses": json.loads(zlib.decompress(responses)),
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at))
+        }
+
+    def save(self, owner_id, session_id, question, responses):
+        """Add an entry, replacing any earlier one with the same ``session_id``"""
+        blob = zlib.compress(json.dumps(responses, separators=(",", ":")).encode("utf-8"))
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO history (owner_id, session_id, question, responses, created_at) VALUES (?, ?, ?, ?, ?)",
+            (owner_id, str(session_id), question, blob, time.time())
+        )
+        try:
+            conn.execute("""
+                DELETE FROM history WHERE owner_id = ? AND id IN (
+                    SELECT id FROM history WHERE owner_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?
+                )
+            """, (owner_id, owner_id, max(self.max_entries, 0)))
+        except sqlite3.OperationalError:
+            # Another worker holds the write lock; the next save trims instead
+            pass
+
+    def get(self, owner_id, session_id):
+        row = self._connect().execute(
+            "SELECT id, session_id, question, responses, created_at FROM history WHERE owner_id = ? AND session_id = ?",
+            (owner_id, str(session_id))
+        ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def page(self, owner_id, limit=20, before=None, since=None, until=None):
+        """Up to ``limit`` entries newest first, and the cursor for the next page.
+
+        ``before`` is the cursor returned with the previous page; ``since`` and
+        ``until`` limit the entries to those saved in that range of Unix times.
+        """
+        conditions = ["owner_id = ?"]
+        params = [owner_id]
+        if before is not None:
+            conditions.append("id < ?")
+            params.append(before)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        rows = self._connect().execute(
+            "SELECT id, session_id, question, responses, created_at FROM history "
+            f"WHERE {' AND '.join(conditions)} ORDER BY id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        entries = [self._row_to_entry(row) for row in rows[:limit]]
+        next_before = entries[-1]["id"] if len(rows) > limit else None
+        return entries, next_before
+
+    def save_pending(self, owner_id, session_id, question, models, fresh, ttl=300):
+        """Keep a comparison until its stream starts; return the token that starts it"""
+        token = secrets.token_urlsafe(16)
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM pending_comparisons WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "INSERT OR REPLACE INTO pending_comparisons (owner_id, session_id, token, question, models, fresh, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (owner_id, str(session_id), token, question, json.dumps(list(models)), int(bool(fresh)), now + ttl)
+        )
+        return token
+
+    def take_pending(self, owner_id, session_id, token):
+        """Remove and return the pending comparison for ``token``; None if it is unknown, used or expired"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT question, models, fresh FROM pending_comparisons "
+                "WHERE owner_id = ? AND session_id = ? AND token = ? AND expires_at > ?",
+                (owner_id, str(session_id), token, time.time())
+            ).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM pending_comparisons WHERE owner_id = ? AND session_id = ?", (owner_id, str(session_id)))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {"question": row[0], "models": json.loads(row[1]), "fresh": bool(row[2])}
+
+    def clear(self):
+        self._connect().execute("DELETE FROM history")
+        self._connect().execute("DELETE FROM pending_comparisons")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM history").fetchone()[0]
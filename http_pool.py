@@ -0,0 +1,83 @@
+"""Shared, keep-alive HTTP sessions for provider APIs"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class PooledSession:
+    """Lazily built ``requests.Session`` shared by every thread of a worker process.
+
+    Connections to ``base_url`` are kept alive in a pool of ``pool_maxsize``
+    sockets, so repeated calls to the same host skip the TCP and TLS handshake.
+    Gateway errors and failed connects are retried with exponential backoff;
+    read errors are not, because the upstream may already have run the request.
+    """
+
+    def __init__(self, base_url, pool_maxsize=10, max_retries=2, backoff_factor=0.3,
+                 retry_statuses=(502, 504)):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.retry_statuses = tuple(retry_statuses)
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+
+    def _build(self):
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.retry_statuses,
+            allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+            raise_on_status=False,
+            respect_retry_after_header=True
+        )
+        session = requests.Session()
+        # One pool for the provider host, sized for the fan-out, and a small default for anything else
+        session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry))
+        session.mount("https://", HTTPAdapter(max_retries=retry))
+        return session
+
+    def get(self):
+        """Return this process's session, rebuilding it after a fork"""
+        session = self._session
+        if session is not None and self._pid == os.getpid():
+            return session
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                # Sockets inherited from a parent process must not be shared, so start a fresh pool
+                self._session = self._build()
+                self._pid = os.getpid()
+            return self._session
+
+    def post(self, url, **kwargs):
+        return self.get().post(url, **kwargs)
+
+    def connections_opened(self):
+        """Connections this process's session has opened so far, across every host"""
+        session = self._session
+        if session is None or self._pid != os.getpid():
+            return 0
+        opened = 0
+        for adapter in session.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+        return opened
+
+    def close(self):
+        """Close pooled connections; the next call opens a new session"""
+        with self._lock:
+            if self._session is not None and self._pid == os.getpid():
+                self._session.close()
+            self._session = None
+            self._pid = None
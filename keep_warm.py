@@ -0,0 +1,169 @@
+"""Keep-alive calls for the Hugging Face models people use, at the hours they use them"""
+import threading
+import time
+
+import metrics
+
+
+class KeepWarmScheduler:
+    """Learns when each model is used and keeps the busy ones loaded.
+
+    ``record_use`` counts a call in its model's bucket for the hour of day;
+    old counts fade with a half-life of ``half_life`` seconds. Every
+    ``interval`` seconds the ``top_n`` models with at least ``min_demand``
+    calls in the current hour are sent a keep-alive, unless a call in the
+    last ``idle_timeout - interval`` seconds already keeps them loaded.
+    Before a keep-alive, ``claim(name)`` is asked whether this worker should
+    send it; it returns False when another worker already has within that
+    window, so a model gets one keep-alive per window however many workers
+    run the scheduler. Each keep-alive then calls ``spend()``, which returns
+    False once the budget is used up.
+
+    A model is assumed to unload after ``idle_timeout`` quiet seconds. When
+    a call arrives after such a gap and a keep-alive was sent during it,
+    the model's usual cold-start time counts as saved. The cold-start time
+    is learned from ``record_cold_start``.
+    """
+
+    def __init__(self, idle_timeout=900, interval=300, min_demand=2, top_n=3, half_life=7 * 24 * 3600,
+                 default_cold_start=20, spend=None, claim=None):
+        self.idle_timeout = idle_timeout
+        self.interval = interval
+        self.min_demand = min_demand
+        self.top_n = top_n
+        self.half_life = half_life
+        self.default_cold_start = default_cold_start
+        self.spend = spend
+        self.claim = claim
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _decayed(self, cell, now):
+        value, updated_at = cell
+        return value * 0.5 ** (max(0.0, now - updated_at) / self.half_life)
+
+    def record_use(self, name, now=None):
+        now = time.time() if now is None else now
+        hour = time.localtime(now).tm_hour
+        with self._lock:
+            hours = self._usage.setdefault(name, [(0.0, now)] * 24)
+            hours[hour] = (self._decayed(hours[hour], now) + 1, now)
+            last_used = self._last_used.get(name)
+            last_keep_alive = self._last_keep_alive.get(name)
+            self._last_used[name] = now
+            if last_used is None or now - last_used <= self.idle_timeout:
+                return
+            if last_keep_alive is None or now - last_keep_alive > self.idle_timeout:
+                return
+            # The model would have unloaded since the last call; a keep-alive held it
+            saved = self._cold_start.get(name, self.default_cold_start)
+            self.warm_hits += 1
+            self.seconds_saved += saved
+        metrics.COLD_START_SECONDS_SAVED.labels(model=name).inc(saved)
+
+    def record_cold_start(self, name, seconds):
+        """Note how long the model took to load, as a moving average"""
+        with self._lock:
+            previous = self._cold_start.get(name)
+            self._cold_start[name] = seconds if previous is None else 0.7 * previous + 0.3 * seconds
+            self.cold_starts += 1
+
+    def demand(self, name, now=None):
+        """Decayed call count for ``name`` in the current hour of day"""
+        now = time.time() if now is None else now
+        hours = self._usage.get(name)
+        return self._decayed(hours[time.localtime(now).tm_hour], now) if hours else 0.0
+
+    def due(self, now=None):
+        """Names that need a keep-alive now, busiest first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            names = list(self._usage)
+        busy = sorted(
+            ((self.demand(name, now), name) for name in names),
+            key=lambda item: (-item[0], item[1])
+        )
+        due = []
+        for demand, name in busy[:self.top_n]:
+            if demand < self.min_demand:
+                break
+            last_active = max(self._last_used.get(name, 0), self._last_keep_alive.get(name, 0))
+            if now - last_active >= self.idle_timeout - self.interval:
+                due.append(name)
+        return due
+
+    def run_once(self, keep_alive, now=None):
+        """Send a keep-alive to every model that is due; return the names kept warm"""
+        now = time.time() if now is None else now
+        kept = []
+        for name in self.due(now):
+            if self.claim is not None and not self.claim(name):
+                # Another worker kept this model warm during the current window
+                with self._lock:
+                    self._last_keep_alive[name] = now
+                continue
+            if self.spend is not None and not self.spend():
+                self.over_budget += 1
+                metrics.KEEP_WARM_REQUESTS.labels(model=name, result="over_budget").inc()
+                break
+            try:
+                loaded = keep_alive(name)
+            except Exception:
+                loaded = False
+            with self._lock:
+                self.keep_alives += 1
+                if loaded:
+                    self._last_keep_alive[name] = now
+            metrics.KEEP_WARM_REQUESTS.labels(model=name, result="ok" if loaded else "failed").inc()
+            if loaded:
+                kept.append(name)
+        return kept
+
+    def start(self, keep_alive):
+        """Run ``run_once(keep_alive)`` every ``interval`` seconds on a daemon thread"""
+        def run():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.run_once(keep_alive)
+                except Exception:
+                    # A failed pass is retried on the next interval
+                    pass
+
+        thread = threading.Thread(target=run, name="keep-warm", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            names = sorted(self._usage)
+            models = {
+                name: {
+                    "demand_this_hour": round(self.demand(name, now), 2),
+                    "cold_start_seconds": round(self._cold_start.get(name, self.default_cold_start), 1),
+                    "last_keep_alive_age": round(now - self._last_keep_alive[name], 1)
+                    if name in self._last_keep_alive else None
+                }
+                for name in names
+            }
+            return {
+                "models": models,
+                "keep_alives": self.keep_alives,
+                "over_budget": self.over_budget,
+                "cold_starts": self.cold_starts,
+                "warm_hits": self.warm_hits,
+                "cold_start_seconds_saved": round(self.seconds_saved, 1)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._usage = {}
+            self._last_used = {}
+            self._last_keep_alive = {}
+            self._cold_start = {}
+            self.keep_alives = 0
+            self.over_budget = 0
+            self.cold_starts = 0
+            self.warm_hits = 0
+            self.seconds_saved = 0.0
@@ -0,0 +1,118 @@
+"""Per-model latency percentiles kept in fixed-size histograms"""
+import math
+import threading
+import time
+
+
+class LatencyHistogram:
+    """Log-scaled histogram of latencies in seconds.
+
+    Bucket ``i`` holds values up to ``min_value * growth ** i``, so every
+    percentile it reports is within ``growth - 1`` (5% by default) of the true
+    value, and memory stays the same however many values are recorded.
+    """
+
+    def __init__(self, min_value=0.001, max_value=600, growth=1.05):
+        self.min_value = min_value
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.counts = [0] * (int(math.ceil(math.log(max_value / min_value) / self._log_growth)) + 2)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def _index(self, value):
+        if value <= self.min_value:
+            return 0
+        return min(len(self.counts) - 1, int(math.ceil(math.log(value / self.min_value) / self._log_growth)))
+
+    def record(self, value):
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the ``q``th percentile, or None when empty"""
+        if not self.total:
+            return None
+        rank = max(1, int(math.ceil(self.total * q / 100)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.max, self.min_value * self.growth ** index)
+        return self.max
+
+
+class LatencyRecorder:
+    """Latency histograms for every model, covering roughly the last ``window`` seconds.
+
+    Each model keeps a current and a previous histogram. The current one is
+    retired once it is ``window`` seconds old, so percentiles follow
+    changes in upstream latency without keeping every sample.
+    """
+
+    def __init__(self, names, window=600):
+        self.window = window
+        self._lock = threading.Lock()
+        self._models = {name: self._new_slot() for name in names}
+
+    def _new_slot(self):
+        return {"started": time.monotonic(), "current": LatencyHistogram(), "previous": LatencyHistogram()}
+
+    def _rotate(self, slot, now):
+        if now - slot["started"] >= self.window:
+            slot["previous"] = slot["current"] if now - slot["started"] < 2 * self.window else LatencyHistogram()
+            slot["current"] = LatencyHistogram()
+            slot["started"] = now
+
+    def record(self, name, latency):
+        now = time.monotonic()
+        with self._lock:
+            slot = self._models.setdefault(name, self._new_slot())
+            self._rotate(slot, now)
+            slot["current"].record(latency)
+
+    def histogram(self, name):
+        """Merged histogram of the current and previous windows for ``name``"""
+        merged = LatencyHistogram()
+        with self._lock:
+            slot = self._models.get(name)
+            if slot is not None:
+                self._rotate(slot, time.monotonic())
+                merged.merge(slot["previous"])
+                merged.merge(slot["current"])
+        return merged
+
+    def count(self, name):
+        return self.histogram(name).total
+
+    def percentile(self, name, q):
+        return self.histogram(name).percentile(q)
+
+    def stats(self, name):
+        histogram = self.histogram(name)
+        return {
+            "count": histogram.total,
+            "mean": histogram.sum / histogram.total if histogram.total else None,
+            "p50": histogram.percentile(50),
+            "p95": histogram.percentile(95),
+            "p99": histogram.percentile(99),
+            "max": histogram.max if histogram.total else None
+        }
+
+    def snapshot(self):
+        return {name: self.stats(name) for name in list(self._models)}
+
+    def reset(self):
+        with self._lock:
+            for name in self._models:
+                self._models[name] = self._new_slot()
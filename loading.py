@@ -0,0 +1,127 @@
+"""Shared waits for Hugging Face models that answer 503 while they load"""
+import asyncio
+import json
+import threading
+import time
+
+
+def parse_estimated_time(body):
+    """Seconds Hugging Face expects a loading model to need, from a 503 body, or None"""
+    try:
+        estimated_time = json.loads(body).get("estimated_time")
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return float(estimated_time) if isinstance(estimated_time, (int, float)) else None
+
+
+class LoadingScheduler:
+    """Tracks models that are loading and warms each one up once.
+
+    ``note_loading(model_id, estimated_time, warm)`` marks a model as loading
+    and, unless a warm-up is already running for it, starts one on a daemon
+    thread. ``warm()`` makes a single blocking call that waits for the model
+    (Hugging Face's ``wait_for_model`` option) and returns
+    ``(loaded, estimated_time)`` and should give up after ``warm_timeout``
+    seconds. It is retried up to ``max_attempts`` times.
+    Every request for a loading model waits on the same warm-up instead of
+    sending its own doomed call. ``on_warm(model_id, seconds, loaded)`` is
+    told how long each warm-up took. ``wait_until_warm`` blocks the calling
+    thread; only the event loop's ``wait_until_warm_async`` parks without one.
+    """
+
+    def __init__(self, max_wait=20, warm_timeout=120, default_estimate=20, max_attempts=3, on_warm=None):
+        self.max_wait = max_wait
+        self.warm_timeout = warm_timeout
+        self.on_warm = on_warm
+        self.default_estimate = default_estimate
+        self.max_attempts = max_attempts
+        self.waits = 0
+        self.warmups = 0
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def note_loading(self, model_id, estimated_time, warm):
+        ready_at = time.time() + (estimated_time if estimated_time is not None else self.default_estimate)
+        with self._lock:
+            state = self._models.get(model_id)
+            if state is not None:
+                state["ready_at"] = ready_at
+                return
+            state = self._models[model_id] = {"ready_at": ready_at, "event": threading.Event(), "warm": False}
+            self.warmups += 1
+        threading.Thread(target=self._warm_up, args=(model_id, state, warm),
+                         name=f"hf-warmup-{model_id}", daemon=True).start()
+
+    def _warm_up(self, model_id, state, warm):
+        started = time.time()
+        loaded = False
+        try:
+            for _ in range(self.max_attempts):
+                loaded, estimated_time = warm()
+                if loaded:
+                    break
+                with self._lock:
+                    state["ready_at"] = time.time() + (estimated_time or self.default_estimate)
+                time.sleep(min(estimated_time or self.default_estimate, 60))
+        except Exception:
+            loaded = False
+        finally:
+            with self._lock:
+                if self._models.get(model_id) is state:
+                    del self._models[model_id]
+            state["warm"] = loaded
+            state["event"].set()
+            if self.on_warm is not None:
+                self.on_warm(model_id, time.time() - started, loaded)
+
+    def is_loading(self, model_id):
+        return model_id in self._models
+
+    def ready_in(self, model_id):
+        """Seconds until a loading model is expected to be ready, or 0"""
+        state = self._models.get(model_id)
+        return max(0.0, state["ready_at"] - time.time()) if state else 0.0
+
+    def wait_until_warm(self, model_id, timeout):
+        """Block until the model's warm-up finishes; True if it is ready to use"""
+        state = self._models.get(model_id)
+        if state is None:
+            return True
+        self.waits += 1
+        return state["event"].wait(timeout) and state["warm"]
+
+    async def wait_until_warm_async(self, model_id, timeout, poll_interval=0.25):
+        """Like ``wait_until_warm`` but parks the coroutine instead of a thread"""
+        state = self._models.get(model_id)
+        if state is None:
+            return True
+        self.waits += 1
+        deadline = time.monotonic() + timeout
+        while not state["event"].is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(poll_interval)
+        return state["event"].is_set() and state["warm"]
+
+    def prewarm(self, model_id, is_loaded, warm):
+        """Start warming ``model_id`` if ``is_loaded()`` says it is cold; True if a warm-up started"""
+        if self.is_loading(model_id):
+            return False
+        try:
+            if is_loaded():
+                return False
+        except Exception:
+            return False
+        self.note_loading(model_id, None, warm)
+        return True
+
+    def stats(self):
+        return {
+            "loading": {model_id: round(self.ready_in(model_id), 1) for model_id in list(self._models)},
+            "waits": self.waits,
+            "warmups": self.warmups
+        }
+
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+        self.waits = 0
+        self.warmups = 0
@@ -0,0 +1,362 @@
+"""In-process counters, gauges and histograms exposed in the Prometheus text format.
+
+Every metric is created once at import time and updated from the request
+path, so an update is a dict lookup, a lock and an addition. Values are kept
+per worker process; ``SQLiteMetricsStore`` publishes each worker's values to
+a file shared by the node, so a scrape of any worker reports the sum over all
+of them.
+"""
+import bisect
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlite_store import SQLiteStore
+
+# Upper bounds in seconds, from a cache hit to a request that runs into the timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """Yield ``(suffix, label values, extra label, value)`` for every child"""
+        raise NotImplementedError
+
+    def render(self, samples=None):
+        """This metric in the text format, from ``samples`` if given or else this worker's values"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra, value in (self.samples() if samples is None else samples):
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._children.clear()
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield "_total", values, None, child.value
+
+
+class Gauge(Metric):
+    """A value that goes up and down; ``callback`` computes an unlabelled value at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, callback=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.callback = callback
+
+    def _new_child(self):
+        return _Value()
+
+    def samples(self):
+        if self.callback is not None:
+            yield "", (), None, self.callback()
+            return
+        for values, child in list(self._children.items()):
+            yield "", values, None, child.value
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", values, ("le", _format_value(float(bound))), cumulative
+            yield "_count", values, None, cumulative
+            yield "_sum", values, None, total
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+class SQLiteMetricsStore(SQLiteStore):
+    """Every worker's metric values in a SQLite file, summed when scraped.
+
+    ``publish`` replaces this worker's rows with its current samples, and
+    ``render`` publishes and then renders the sum over every worker that has
+    published in the last ``stale_after`` seconds. Counters and histograms
+    of a worker that stopped publishing are folded into a ``retired`` row,
+    so totals never go down when gunicorn replaces a worker; its gauges are
+    dropped.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS metric_workers (
+            worker TEXT PRIMARY KEY,
+            updated_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS metric_samples (
+            worker TEXT NOT NULL,
+            name TEXT NOT NULL,
+            suffix TEXT NOT NULL,
+            labels TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            value NUMERIC NOT NULL,
+            PRIMARY KEY (worker, name, suffix, labels)
+        )
+        """
+    )
+
+    RETIRED = "retired"
+
+    def __init__(self, path, stale_after=60):
+        super().__init__(path)
+        self.stale_after = stale_after
+        self._worker = None
+        self._worker_pid = None
+
+    def worker_id(self):
+        """Id of this worker; a new one after a fork, so a reused pid never inherits old rows"""
+        if self._worker_pid != os.getpid():
+            self._worker = f"{os.getpid()}-{secrets.token_hex(4)}"
+            self._worker_pid = os.getpid()
+        return self._worker
+
+    def publish(self, registry):
+        worker = self.worker_id()
+        now = time.time()
+        rows = [
+            (worker, metric.name, suffix, json.dumps([list(values), extra]), metric.kind, value)
+            for metric in registry.metrics
+            for suffix, values, extra, value in metric.samples()
+        ]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stale = [row[0] for row in conn.execute(
+                "SELECT worker FROM metric_workers WHERE updated_at < ? AND worker != ?", (now - self.stale_after, worker)
+            )]
+            for gone in stale:
+                conn.execute("""
+                    INSERT INTO metric_samples (worker, name, suffix, labels, kind, value)
+                    SELECT ?, name, suffix, labels, kind, value FROM metric_samples WHERE worker = ? AND kind != 'gauge'
+                    ON CONFLICT (worker, name, suffix, labels) DO UPDATE SET value = value + excluded.value
+                """, (self.RETIRED, gone))
+                conn.execute("DELETE FROM metric_samples WHERE worker = ?", (gone,))
+                conn.execute("DELETE FROM metric_workers WHERE worker = ?", (gone,))
+            conn.execute("DELETE FROM metric_samples WHERE worker = ?", (worker,))
+            conn.executemany(
+                "INSERT INTO metric_samples (worker, name, suffix, labels, kind, value) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.execute("INSERT OR REPLACE INTO metric_workers (worker, updated_at) VALUES (?, ?)", (worker, now))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def render(self, registry):
+        """Every live worker's metrics, summed, in the Prometheus text format"""
+        try:
+            self.publish(registry)
+            rows = self._connect().execute("""
+                SELECT name, suffix, labels, SUM(value) FROM metric_samples
+                WHERE worker = ? OR worker IN (SELECT worker FROM metric_workers WHERE updated_at >= ?)
+                GROUP BY name, suffix, labels
+            """, (self.RETIRED, time.time() - self.stale_after)).fetchall()
+        except sqlite3.OperationalError:
+            # The shared file is busy; this worker's own values are better than no scrape
+            return registry.render()
+        samples = {}
+        for name, suffix, labels, value in rows:
+            values, extra = json.loads(labels)
+            samples.setdefault(name, []).append((suffix, tuple(values), tuple(extra) if extra else None, value))
+        order = {"_bucket": 0, "": 0, "_total": 0, "_count": 1, "_sum": 2}
+        for lines in samples.values():
+            lines.sort(key=lambda sample: (sample[1], order[sample[0]], float(sample[2][1]) if sample[2] else 0))
+        return "\n".join(metric.render(samples.get(metric.name, [])) for metric in registry.metrics) + "\n"
+
+    def start(self, registry, interval):
+        """Publish this worker's values every ``interval`` seconds on a daemon thread"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.publish(registry)
+                except sqlite3.Error:
+                    # Another worker holds the write lock; the next pass catches up
+                    pass
+
+        thread = threading.Thread(target=run, name="metrics-publisher", daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM metric_samples")
+        conn.execute("DELETE FROM metric_workers")
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request, by endpoint, method and status",
+    ("endpoint", "method", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled by this worker")
+MODEL_QUEUE_SECONDS = Histogram(
+    "model_call_queue_seconds", "Time a model call waited for a fan-out thread", ("model",)
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "upstream_request_duration_seconds", "Time spent calling a model's provider, by outcome",
+    ("model", "provider", "outcome")
+)
+UPSTREAM_REQUESTS_IN_FLIGHT = Gauge(
+    "upstream_requests_in_flight", "Provider calls currently open", ("provider",)
+)
+UPSTREAM_PHASE_SECONDS = Histogram(
+    "upstream_phase_seconds", "Time spent in one phase of a provider call: the HTTP request itself or parsing its body",
+    ("provider", "phase")
+)
+UPSTREAM_FIRST_TOKEN_SECONDS = Histogram(
+    "upstream_first_token_seconds", "Time until a streaming model produced its first token", ("model", "provider")
+)
+HF_BATCH_SIZE = Histogram(
+    "huggingface_batch_size", "Questions sent together in one Hugging Face request", ("model_id",),
+    buckets=(1, 2, 4, 8, 16, 32)
+)
+KEEP_WARM_REQUESTS = Counter(
+    "huggingface_keep_warm_requests", "Keep-alive calls sent to Hugging Face models, by result", ("model", "result")
+)
+COLD_START_SECONDS_SAVED = Counter(
+    "huggingface_cold_start_seconds_saved", "Estimated cold-start seconds avoided by keep-alive calls", ("model",)
+)
+CACHE_LOOKUPS = Counter("response_cache_lookups", "Response cache lookups, by result", ("result",))
+TEMPLATE_RENDER_SECONDS = Histogram(
+    "template_render_seconds", "Time spent rendering a template", ("template",)
+)
+SESSION_SAVE_SECONDS = Histogram(
+    "session_save_seconds", "Time spent serializing and signing the session cookie"
+)
+SESSION_COOKIE_BYTES = Histogram(
+    "session_cookie_bytes", "Size of the session cookie written with a response",
+    buckets=(256, 512, 1024, 2048, 3072, 4096, 8192)
+)
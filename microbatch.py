@@ -0,0 +1,62 @@
+"""Micro-batching: concurrent calls for the same key share one upstream request"""
+import threading
+
+
+class _Batch:
+    def __init__(self):
+        self.items = []
+        self.results = None
+        self.error = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Gathers items submitted for the same key within ``window`` seconds.
+
+    The first caller for a key opens a batch, waits up to ``window`` seconds
+    (less if ``max_size`` items arrive first) and then runs the whole batch
+    with its own ``run`` callable on its own thread; ``run`` takes the list of
+    items and returns one result per item. Every caller gets the result for
+    its item, or the exception ``run`` raised.
+    """
+
+    def __init__(self, window=0.005, max_size=8, on_batch=None):
+        self.window = window
+        self.max_size = max_size
+        self.on_batch = on_batch
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, item, run):
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            index = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_size:
+                # Full: later callers start a new batch
+                del self._open[key]
+                batch.full.set()
+
+        if not leader:
+            batch.done.wait()
+        else:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            try:
+                if self.on_batch is not None:
+                    self.on_batch(key, len(batch.items))
+                batch.results = run(list(batch.items))
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
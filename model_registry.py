@@ -0,0 +1,165 @@
+"""Declarative table of every model the app can compare.
+
+Each entry names the provider that serves the model, the upstream model id,
+the confidence reported with its answers and the details shown on the model
+cards. ``providers.build_models`` turns the table into callable adapters and
+``build_model_info`` into the card details used by the templates, so adding a
+model is a one-entry change here.
+
+Hugging Face entries may set ``parameters`` to override the generation
+parameters sent with every request and ``parser`` to replace
+``providers.parse_huggingface_text``.
+"""
+
+MODEL_REGISTRY = {
+    "Cohere-Command": {
+        "provider": "cohere",
+        "model_id": "command",
+        "confidence": 0.9,
+        "description": "Cohere's Command model, excellent for understanding context and generating relevant responses.",
+        "avg_response_time": "2s",
+        "specialties": ["Text Generation", "Analysis", "Classification"]
+    },
+    "Claude-2": {
+        "provider": "anthropic",
+        "model_id": "claude-3-opus-20240229",
+        "confidence": 0.95,
+        "description": "Anthropic's Claude-2 model, known for thoughtful and nuanced responses.",
+        "avg_response_time": "3s",
+        "specialties": ["Analysis", "Writing", "Problem Solving"]
+    },
+    "FLAN-T5": {
+        "provider": "huggingface",
+        "model_id": "google/flan-t5-base",
+        "confidence": 0.85,
+        "description": "Google's FLAN-T5-Base model, great for various text generation tasks.",
+        "avg_response_time": "2s",
+        "specialties": ["Question Answering", "Text Generation", "Translation"]
+    },
+    "GPT-2": {
+        "provider": "huggingface",
+        "model_id": "gpt2",
+        "confidence": 0.85,
+        "description": "OpenAI's GPT-2 model (free version), good for creative writing.",
+        "avg_response_time": "2s",
+        "specialties": ["Creative Writing", "Text Completion", "Story Generation"]
+    },
+    "BLOOM": {
+        "provider": "huggingface",
+        "model_id": "bigscience/bloom",
+        "confidence": 0.85,
+        "description": "BigScience's BLOOM model, multilingual text generation.",
+        "avg_response_time": "3s",
+        "specialties": ["Multilingual Generation", "Code Generation", "Analysis"]
+    },
+    "DialoGPT": {
+        "provider": "huggingface",
+        "model_id": "microsoft/DialoGPT-medium",
+        "confidence": 0.85,
+        "description": "Microsoft's DialoGPT, specialized in conversational responses.",
+        "avg_response_time": "2s",
+        "specialties": ["Conversation", "Chat", "Response Generation"]
+    },
+    "OPT": {
+        "provider": "huggingface",
+        "model_id": "facebook/opt-1.3b",
+        "confidence": 0.85,
+        "description": "Meta's OPT model, alternative to GPT-3 with similar capabilities.",
+        "avg_response_time": "2s",
+        "specialties": ["Text Generation", "Analysis", "Question Answering"]
+    },
+    "BART": {
+        "provider": "huggingface",
+        "model_id": "facebook/bart-large",
+        "confidence": 0.85,
+        "description": "Facebook's BART model, excellent for summarization and generation.",
+        "avg_response_time": "2s",
+        "specialties": ["Summarization", "Text Generation", "Translation"]
+    },
+    "T0pp": {
+        "provider": "huggingface",
+        "model_id": "bigscience/T0pp",
+        "confidence": 0.85,
+        "description": "Hugging Face's T0++ model, trained on diverse tasks.",
+        "avg_response_time": "3s",
+        "specialties": ["Zero-shot Learning", "Task Understanding", "General Knowledge"]
+    },
+    "GPT-Neo": {
+        "provider": "huggingface",
+        "model_id": "EleutherAI/gpt-neo-1.3B",
+        "confidence": 0.85,
+        "description": "EleutherAI's GPT-Neo, open-source alternative to GPT-3.",
+        "avg_response_time": "3s",
+        "specialties": ["Text Generation", "Code Completion", "Analysis"]
+    },
+    "Dolly": {
+        "provider": "huggingface",
+        "model_id": "databricks/dolly-v2-3b",
+        "confidence": 0.85,
+        "description": "Databricks' Dolly model, instruction-following specialist.",
+        "avg_response_time": "2s",
+        "specialties": ["Instruction Following", "Task Completion", "Explanation"]
+    },
+    "Falcon": {
+        "provider": "huggingface",
+        "model_id": "tiiuae/falcon-7b",
+        "confidence": 0.85,
+        "description": "TII's Falcon model, powerful open-source language model.",
+        "avg_response_time": "3s",
+        "specialties": ["Text Generation", "Analysis", "Problem Solving"]
+    },
+    "MPT": {
+        "provider": "huggingface",
+        "model_id": "mosaicml/mpt-7b",
+        "confidence": 0.85,
+        "description": "MosaicML's MPT model, efficient and powerful language model.",
+        "avg_response_time": "2s",
+        "specialties": ["Text Generation", "Chat", "Analysis"]
+    },
+    "Pythia": {
+        "provider": "huggingface",
+        "model_id": "EleutherAI/pythia-1.4b",
+        "confidence": 0.85,
+        "description": "EleutherAI's Pythia model, trained on code and text.",
+        "avg_response_time": "2s",
+        "specialties": ["Code Generation", "Technical Writing", "Analysis"]
+    },
+    "Qwen3": {
+        "provider": "huggingface",
+        "model_id": "Qwen/Qwen1.5-7B-Chat",
+        "confidence": 0.9,
+        "description": "Qwen3 8B model, excellent for reasoning, coding, and multilingual tasks.",
+        "avg_response_time": "2s",
+        "specialties": ["Reasoning", "Coding", "Multilingual Support"]
+    },
+    "DeepSeek R1": {
+        "provider": "huggingface",
+        "model_id": "deepseek-ai/deepseek-coder-6.7b-base",
+        "confidence": 0.95,
+        "description": "DeepSeek R1 is a powerful open-source model with MIT license, excellent for complex reasoning and coding tasks.",
+        "avg_response_time": "2s",
+        "specialties": ["Complex Reasoning", "Coding", "Technical Analysis"]
+    },
+    "Qwen3 30B": {
+        "provider": "huggingface",
+        "model_id": "Qwen/Qwen1.5-14B-Chat",
+        "confidence": 0.92,
+        "description": "Qwen3 30B A3B is a large model with 30.5B parameters, excellent for mathematics, coding, and creative tasks.",
+        "avg_response_time": "3s",
+        "specialties": ["Mathematics", "Advanced Coding", "Creative Writing"]
+    }
+}
+
+
+def build_model_info(registry, max_tokens):
+    """Card details for every model, in the shape the templates expect"""
+    return {
+        name: {
+            "description": spec["description"],
+            "avg_response_time": spec["avg_response_time"],
+            "specialties": spec["specialties"],
+            "provider": spec["provider"],
+            "max_tokens": max_tokens
+        }
+        for name, spec in registry.items()
+    }
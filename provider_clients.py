@@ -0,0 +1,75 @@
+"""Per-process registry of long-lived provider SDK clients"""
+import os
+import threading
+
+
+class ClientRegistry:
+    """Builds each provider's SDK client once per worker process and hands out the same instance.
+
+    Providers are registered with a ``factory(api_key)`` that builds the client,
+    an optional ``close(client)`` that releases it and an optional
+    ``warm(client)`` that opens its connections ahead of the first request.
+    A client is rebuilt, and the old one closed, when it is requested with a
+    different API key or from a different process than the one that built it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers = {}
+        self._clients = {}
+
+    def register(self, name, factory, close=None, warm=None):
+        self._providers[name] = {"factory": factory, "close": close, "warm": warm}
+
+    def get(self, name, api_key):
+        """Return the client for ``name`` built with ``api_key``"""
+        entry = self._clients.get(name)
+        if entry and entry["api_key"] == api_key and entry["pid"] == os.getpid():
+            return entry["client"]
+        with self._lock:
+            entry = self._clients.get(name)
+            if entry and entry["api_key"] == api_key and entry["pid"] == os.getpid():
+                return entry["client"]
+            if entry:
+                self._close(name, entry)
+            client = self._providers[name]["factory"](api_key)
+            self._clients[name] = {"client": client, "api_key": api_key, "pid": os.getpid()}
+            return client
+
+    def warm_up(self, api_keys):
+        """Build and warm the clients for every provider with a key in ``api_keys``.
+
+        Returns a dict of provider name to ``None`` on success or the error message.
+        Warm-up failures are reported, never raised, so a bad key cannot stop a worker booting.
+        """
+        results = {}
+        for name, provider in self._providers.items():
+            api_key = api_keys.get(name)
+            if not api_key:
+                continue
+            try:
+                client = self.get(name, api_key)
+                if provider["warm"]:
+                    provider["warm"](client)
+                results[name] = None
+            except Exception as e:
+                results[name] = str(e)
+        return results
+
+    def reset(self, name=None):
+        """Close and forget one client, or all of them"""
+        with self._lock:
+            names = [name] if name else list(self._clients)
+            for client_name in names:
+                entry = self._clients.pop(client_name, None)
+                if entry:
+                    self._close(client_name, entry)
+
+    def _close(self, name, entry):
+        close = self._providers[name]["close"]
+        # A client inherited across fork shares sockets with the parent, so drop it without closing them
+        if close and entry["pid"] == os.getpid():
+            try:
+                close(entry["client"])
+            except Exception:
+                pass
@@ -0,0 +1,448 @@
+"""Adapters that turn entries of model_registry.MODEL_REGISTRY into callable models.
+
+Every adapter is called as ``adapter(question, on_token=None)`` and returns the
+response payload used throughout the app: ``response``, ``confidence`` and
+``response_time``. The parts of a request that do not depend on the question
+(URL, headers, encoded generation parameters) are built once when the adapter
+is created and reused for every call.
+"""
+import json
+import time
+
+import requests
+
+import deadline
+import metrics
+from loading import parse_estimated_time
+from rate_limit import RateLimited
+
+MISSING_KEY_MESSAGES = {
+    "huggingface": "Error: Hugging Face API key is not configured. Please set up your API key in the .env file.",
+    "anthropic": "Error: Anthropic API key is not configured. Please set up your API key in the .env file.",
+    "cohere": "Error: Cohere API key is not configured. Please set up your API key in the .env file."
+}
+
+# Generation parameters sent with every Hugging Face request unless an entry overrides them
+HF_DEFAULT_PARAMETERS = {
+    "num_return_sequences": 1,
+    "do_sample": True,
+    "top_p": 0.9,
+    "top_k": 50
+}
+
+
+def get_fallback_response(model_name, error_message=None):
+    """Enhanced fallback response with optional error message"""
+    message = error_message or f"I apologize, but {model_name} is currently unavailable. Please try again later or select a different AI model."
+    return {
+        "response": message,
+        "confidence": 0,
+        "response_time": 0
+    }
+
+
+def get_missing_key_response(provider):
+    return {
+        "response": MISSING_KEY_MESSAGES[provider],
+        "confidence": 0,
+        "response_time": 0
+    }
+
+
+def get_loading_response(estimated_time, response_time):
+    """Response for a Hugging Face model that is still loading"""
+    if estimated_time:
+        message = f"The model is currently loading. It should be ready in about {estimated_time:.0f} seconds."
+    else:
+        message = "The model is currently loading. Please try again in a few minutes."
+    return {
+        "response": message,
+        "confidence": 0,
+        "response_time": response_time,
+        "loading": True,
+        "estimated_time": estimated_time
+    }
+
+
+def get_rate_limited_response(model_name, retry_after):
+    """Response used when a model's rate limit turned the call away"""
+    return {
+        "response": f"{model_name} is handling too many requests right now. Please try again in about {max(1, round(retry_after))} seconds.",
+        "confidence": 0,
+        "response_time": 0,
+        "rate_limited": True,
+        "retry_after": retry_after
+    }
+
+
+def get_huggingface_status_error(status_code, body, response_time):
+    """Response for a failed Hugging Face call, or None if ``status_code`` is a success"""
+    if status_code == 401:
+        return {
+            "response": "Error: Invalid or missing API key. Please check your Hugging Face API key configuration.",
+            "confidence": 0,
+            "response_time": response_time
+        }
+    elif status_code == 429:
+        return {
+            "response": "Hugging Face is rate limiting requests right now. Please try again shortly.",
+            "confidence": 0,
+            "response_time": response_time
+        }
+    elif status_code == 503:
+        return get_loading_response(parse_estimated_time(body), response_time)
+    elif status_code != 200:
+        return {
+            "response": f"API Error: {status_code}. {body}",
+            "confidence": 0,
+            "response_time": response_time
+        }
+    return None
+
+
+def parse_huggingface_text(result, question):
+    """Extract the generated text from a Hugging Face inference result"""
+    # Handle different response formats
+    if isinstance(result, list) and len(result) > 0:
+        if isinstance(result[0], dict) and "generated_text" in result[0]:
+            text = result[0]["generated_text"]
+        else:
+            text = result[0]
+    else:
+        text = str(result)
+
+    # Clean up the response
+    text = text.replace(question, "", 1).strip()  # Remove the input question if it's repeated
+    if len(text) == 0:
+        text = "I apologize, but I couldn't generate a meaningful response. Please try rephrasing your question."
+    return text
+
+
+class ProviderContext:
+    """Runtime dependencies shared by every adapter.
+
+    ``get_api_key(provider)`` is looked up on each call so that a rotated key
+    is picked up without rebuilding the adapters. With ``hf_batcher`` (a
+    ``microbatch.MicroBatcher``) concurrent Hugging Face calls to the same
+    model are sent together as one request. With ``hf_loading`` (a
+    ``loading.LoadingScheduler``) calls to a Hugging Face model that is
+    loading wait for one shared warm-up and are then retried. With a
+    ``cassette.Cassette`` and ``cassette_mode`` ``"record"`` every provider
+    response is recorded; with ``"replay"`` responses come from the
+    recordings and no provider is called. ``acquire_rate_limit(name)`` is
+    called before every request sent upstream, so a batch of questions takes
+    one token and a retry or a hedged copy takes its own; it raises
+    ``rate_limit.RateLimited`` when no token can be had in time.
+    """
+
+    def __init__(self, get_api_key, hf_session, hf_api_base, clients, timeout, max_tokens, temperature,
+                 hf_batcher=None, hf_loading=None, cassette=None, cassette_mode="off", acquire_rate_limit=None):
+        self.get_api_key = get_api_key
+        self.hf_session = hf_session
+        self.hf_api_base = hf_api_base
+        self.clients = clients
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.hf_batcher = hf_batcher
+        self.hf_loading = hf_loading
+        self.cassette = cassette if cassette_mode != "off" else None
+        self.cassette_mode = cassette_mode
+        self.acquire_rate_limit = acquire_rate_limit
+
+
+class ModelAdapter:
+    provider = None
+    streams_tokens = False
+
+    def __init__(self, name, spec, context):
+        self.name = name
+        self.model_id = spec["model_id"]
+        self.confidence = spec["confidence"]
+        self.context = context
+
+    def __call__(self, question, on_token=None):
+        cassette = self.context.cassette
+        if cassette is not None and self.context.cassette_mode == "replay":
+            return self.replay(cassette, question, on_token)
+        api_key = self.context.get_api_key(self.provider)
+        if not api_key:
+            return get_missing_key_response(self.provider)
+        if deadline.expired():
+            # Nobody is waiting for this answer any more
+            return get_fallback_response(self.name, "Request timed out")
+        start_time = time.perf_counter()
+        if on_token is not None:
+            on_token = self._time_first_token(on_token, start_time)
+        outcome = "error"
+        try:
+            with metrics.UPSTREAM_REQUESTS_IN_FLIGHT.labels(provider=self.provider).track_inprogress():
+                response_data = self.call(api_key, question, on_token)
+            if response_data.get("confidence", 0) > 0:
+                outcome = "success"
+        except RateLimited as e:
+            outcome = "rate_limited"
+            response_data = get_rate_limited_response(self.name, e.retry_after)
+        except Exception as e:
+            outcome = "exception"
+            response_data = get_fallback_response(self.name, str(e))
+        finally:
+            elapsed = time.perf_counter() - start_time
+            metrics.UPSTREAM_REQUEST_SECONDS.labels(model=self.name, provider=self.provider, outcome=outcome).observe(elapsed)
+        if cassette is not None and self.context.cassette_mode == "record":
+            cassette.record(self.name, question, response_data, elapsed)
+        return response_data
+
+    def replay(self, cassette, question, on_token):
+        """Answer from the cassette, within the current deadline"""
+        response_data = cassette.replay(self.name, question, sleep=lambda seconds: time.sleep(deadline.bounded(seconds, 0)))
+        if response_data is None:
+            return get_fallback_response(self.name, f"No recorded response from {self.name} for this question.")
+        if on_token is not None and response_data.get("response"):
+            on_token(response_data["response"])
+        return response_data
+
+    def _time_first_token(self, on_token, start_time):
+        first = [True]
+
+        def timed(text):
+            if first[0]:
+                first[0] = False
+                metrics.UPSTREAM_FIRST_TOKEN_SECONDS.labels(model=self.name, provider=self.provider).observe(
+                    time.perf_counter() - start_time
+                )
+            on_token(text)
+        return timed
+
+    def take_rate_limit_token(self):
+        """Charge one upstream request to this model's rate limits"""
+        if self.context.acquire_rate_limit is not None:
+            self.context.acquire_rate_limit(self.name)
+
+    def call(self, api_key, question, on_token):
+        raise NotImplementedError
+
+
+class HuggingFaceAdapter(ModelAdapter):
+    provider = "huggingface"
+
+    def __init__(self, name, spec, context):
+        super().__init__(name, spec, context)
+        self.url = f"{context.hf_api_base}/models/{self.model_id}"
+        self.parameters = dict(
+            HF_DEFAULT_PARAMETERS,
+            max_length=context.max_tokens,
+            temperature=context.temperature,
+            **spec.get("parameters", {})
+        )
+        self.parse = spec.get("parser", parse_huggingface_text)
+        # Everything after the question is fixed, so encode it once
+        self._body_suffix = (',"parameters":' + json.dumps(self.parameters, separators=(",", ":")) + "}").encode("utf-8")
+        self._headers = {}
+
+    def headers(self, api_key):
+        headers = self._headers.get(api_key)
+        if headers is None:
+            headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+            self._headers = {api_key: headers}
+        return headers
+
+    def build_body(self, question):
+        """Request body for one question, or for a list of them sent as one batch"""
+        return b'{"inputs":' + json.dumps(question).encode("utf-8") + self._body_suffix
+
+    def parse_response(self, status_code, body, result_loader, question, response_time):
+        """Turn an HTTP status, body text and a JSON loader into a response payload"""
+        status_error = get_huggingface_status_error(status_code, body, response_time)
+        if status_error:
+            return status_error
+        with metrics.UPSTREAM_PHASE_SECONDS.labels(provider=self.provider, phase="parse").time():
+            text = self.parse(result_loader(), question)
+        return {
+            "response": text,
+            "confidence": self.confidence,
+            "response_time": response_time
+        }
+
+    def call(self, api_key, question, on_token):
+        loading = self.context.hf_loading
+        if loading is not None and loading.is_loading(self.model_id):
+            # Someone already found the model cold; wait for its warm-up rather than sending another call.
+            # The wait and the call after it are held to the enclosing deadline, not the one sized for a loaded model
+            with deadline.enclosing():
+                if not loading.wait_until_warm(self.model_id, deadline.bounded(loading.max_wait, 0)):
+                    return get_loading_response(loading.ready_in(self.model_id) or None, 0)
+                return self.send(api_key, question)
+        return self.send(api_key, question)
+
+    def send(self, api_key, question):
+        if self.context.hf_batcher is not None:
+            return self.context.hf_batcher.submit(self.model_id, question, lambda questions: self.call_many(api_key, questions))
+        return self.call_one(api_key, question)
+
+    def warm_up(self, api_key):
+        """Block until the model is loaded; return ``(loaded, estimated_time)``"""
+        try:
+            response = self.context.hf_session.post(
+                self.url,
+                headers=self.headers(api_key),
+                data=b'{"inputs":"Hello","parameters":{"max_new_tokens":1},"options":{"wait_for_model":true}}',
+                timeout=self.context.hf_loading.warm_timeout if self.context.hf_loading is not None else self.context.timeout
+            )
+        except requests.exceptions.RequestException:
+            return False, None
+        return response.status_code == 200, parse_estimated_time(response.text) if response.status_code == 503 else None
+
+    def is_loaded(self, api_key):
+        """Whether Hugging Face reports the model as loaded, from its status endpoint"""
+        response = self.context.hf_session.get().get(
+            f"{self.context.hf_api_base}/status/{self.model_id}",
+            headers=self.headers(api_key),
+            timeout=self.context.timeout
+        )
+        return response.status_code == 200 and bool(response.json().get("loaded"))
+
+    def retry_when_warm(self, api_key, response, inputs):
+        """After a 503, share the model's warm-up and send ``inputs`` again once it is loaded.
+
+        Returns the new ``(response, response_time)``, or None when there is no retry. Like the
+        wait in ``call``, this runs under the enclosing deadline rather than the innermost one.
+        """
+        loading = self.context.hf_loading
+        if loading is None or response.status_code != 503:
+            return None
+        loading.note_loading(self.model_id, parse_estimated_time(response.text), lambda: self.warm_up(api_key))
+        with deadline.enclosing():
+            if loading.wait_until_warm(self.model_id, deadline.bounded(loading.max_wait, 0)) and not deadline.expired():
+                return self._post(api_key, inputs)
+        return None
+
+    def _post(self, api_key, inputs):
+        self.take_rate_limit_token()
+        start_time = time.time()
+        response = self.context.hf_session.post(
+            self.url,
+            headers=self.headers(api_key),
+            data=self.build_body(inputs),
+            timeout=deadline.bounded(self.context.timeout)
+        )
+        response_time = time.time() - start_time
+        # Sending the request, waiting for the model and downloading the body; parsing is timed separately
+        metrics.UPSTREAM_PHASE_SECONDS.labels(provider=self.provider, phase="request").observe(response_time)
+        return response, response_time
+
+    def call_one(self, api_key, question):
+        try:
+            response, response_time = self._post(api_key, question)
+            retried = self.retry_when_warm(api_key, response, question)
+            if retried is not None:
+                response, response_time = retried
+        except requests.exceptions.Timeout:
+            return get_fallback_response(self.name, "Request timed out")
+        return self.parse_response(response.status_code, response.text, response.json, question, response_time)
+
+    def call_many(self, api_key, questions):
+        """Send several questions as one request and return one payload per question"""
+        if len(questions) == 1:
+            return [self.call_one(api_key, questions[0])]
+        try:
+            response, response_time = self._post(api_key, questions)
+            retried = self.retry_when_warm(api_key, response, questions)
+            if retried is not None:
+                response, response_time = retried
+        except requests.exceptions.Timeout:
+            return [get_fallback_response(self.name, "Request timed out") for _ in questions]
+        status_error = get_huggingface_status_error(response.status_code, response.text, response_time)
+        if status_error:
+            return [dict(status_error) for _ in questions]
+        result = response.json()
+        if not isinstance(result, list) or len(result) != len(questions):
+            # This model does not answer batches one result per input; ask one at a time instead
+            return [self.call_one(api_key, question) for question in questions]
+        return [
+            self.parse_response(200, None, lambda item=item: item if isinstance(item, list) else [item], question, response_time)
+            for item, question in zip(result, questions)
+        ]
+
+
+class AnthropicAdapter(ModelAdapter):
+    provider = "anthropic"
+    streams_tokens = True
+
+    def call(self, api_key, question, on_token):
+        self.take_rate_limit_token()
+        start_time = time.time()
+
+        # Reuse this worker's Anthropic client and its connection pool
+        client = self.context.clients.get("anthropic", api_key)
+        request_args = {
+            "model": self.model_id,
+            "max_tokens": self.context.max_tokens,
+            "messages": [{"role": "user", "content": question}],
+            "timeout": deadline.bounded(self.context.timeout)
+        }
+
+        if on_token is not None:
+            with client.messages.stream(**request_args) as stream:
+                for text in stream.text_stream:
+                    on_token(text)
+                message = stream.get_final_message()
+        else:
+            message = client.messages.create(**request_args)
+
+        response_time = time.time() - start_time
+
+        # Extract the response text from the message
+        response_text = message.content[0].text if message.content else "No response generated"
+        return {
+            "response": response_text,
+            "confidence": self.confidence,
+            "response_time": response_time
+        }
+
+
+class CohereAdapter(ModelAdapter):
+    provider = "cohere"
+    streams_tokens = True
+
+    def call(self, api_key, question, on_token):
+        self.take_rate_limit_token()
+        start_time = time.time()
+
+        co = self.context.clients.get("cohere", api_key)
+        response = co.generate(
+            model=self.model_id,
+            prompt=question,
+            max_tokens=self.context.max_tokens,
+            temperature=self.context.temperature,
+            k=0,
+            stop_sequences=[],
+            return_likelihoods='NONE',
+            stream=on_token is not None
+        )
+
+        if on_token is not None:
+            for token in response:
+                on_token(token.text)
+            text = response.texts[0] if response.texts else ""
+        else:
+            text = response.generations[0].text
+
+        response_time = time.time() - start_time
+        return {
+            "response": text.strip(),
+            "confidence": self.confidence,
+            "response_time": response_time
+        }
+
+
+ADAPTERS = {
+    "huggingface": HuggingFaceAdapter,
+    "anthropic": AnthropicAdapter,
+    "cohere": CohereAdapter
+}
+
+
+def build_models(registry, context):
+    """Build one adapter per registry entry, in registry order"""
+    return {name: ADAPTERS[spec["provider"]](name, spec, context) for name, spec in registry.items()}
@@ -0,0 +1,111 @@
+"""Token-bucket rate limits shared by the workers on a node, and per-worker admission control"""
+import sqlite3
+import threading
+import time
+
+from sqlite_store import SQLiteStore
+
+
+class RateLimited(Exception):
+    """Raised when a call would have to wait longer than allowed for a token"""
+
+    def __init__(self, bucket, retry_after):
+        super().__init__(f"Rate limit reached for {bucket}; retry in {retry_after:.1f}s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+
+def parse_limits(value):
+    """Parse ``"anthropic=5:10,GPT-2=1:2"`` into ``{name: (rate per second, burst)}``"""
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        name, spec = item.rsplit("=", 1)
+        rate, _, burst = spec.partition(":")
+        rate = float(rate)
+        limits[name.strip()] = (rate, float(burst) if burst else max(1.0, rate))
+    return limits
+
+
+class SQLiteRateLimiter(SQLiteStore):
+    """Token buckets kept in a SQLite file so every worker draws from the same ones.
+
+    A bucket refills at ``rate`` tokens per second up to ``burst``. ``acquire``
+    takes one token from each of several buckets in a single transaction,
+    either from all of them or from none, and waits up to ``max_wait``
+    seconds for them before raising ``RateLimited``.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS token_buckets (
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """,
+    )
+
+    def try_acquire(self, buckets):
+        """Take a token from every ``(name, rate, burst)`` bucket; return 0, or the seconds until that is possible"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = {}
+            wait = 0.0
+            for name, rate, burst in buckets:
+                row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+                levels[name] = tokens
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate if rate > 0 else float("inf"))
+            if wait == 0:
+                for name, tokens in levels.items():
+                    levels[name] = tokens - 1
+            conn.executemany(
+                "INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                [(name, tokens, now) for name, tokens in levels.items()]
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self, buckets, max_wait=0):
+        if not buckets:
+            return
+        deadline = time.monotonic() + max_wait
+        while True:
+            try:
+                wait = self.try_acquire(buckets)
+            except sqlite3.OperationalError:
+                # The file is locked by a busy writer; treat it as a short wait
+                wait = 0.01
+            else:
+                if wait == 0:
+                    return
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                raise RateLimited(", ".join(name for name, _, _ in buckets), wait)
+            time.sleep(wait)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM token_buckets")
+
+
+class AdmissionGate:
+    """Caps the comparisons one worker runs at once; callers over the cap are turned away at once"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def try_enter(self):
+        return self._slots.acquire(blocking=False)
+
+    def leave(self):
+        self._slots.release()
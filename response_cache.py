@@ -0,0 +1,184 @@
+"""Cache of model responses keyed on model, prompt and generation parameters"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question):
+    """Collapse whitespace so trivially different spellings of a question share an entry"""
+    return " ".join(question.split())
+
+
+def make_key(model_name, question, max_tokens, temperature):
+    return (model_name, normalize_question(question), int(max_tokens), float(temperature))
+
+
+def encode_key(key):
+    """Compact text form of a cache key, used wherever keys are stored on disk"""
+    return json.dumps(key, separators=(",", ":"), ensure_ascii=False)
+
+
+class ResponseCache:
+    """Thread-safe in-process cache with a size limit, a TTL and LRU eviction.
+
+    A ``max_entries`` of 0 disables the cache.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def purge_expired(self):
+        """Drop expired entries and return how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteResponseCache(SQLiteStore):
+    """Cache stored in a SQLite file that every worker process on the node shares.
+
+    Values are stored as zlib-compressed compact JSON. Recency is tracked in
+    ``accessed_at``, refreshed at most every ``touch_interval`` seconds per
+    entry to keep reads from turning into writes; ``purge_expired`` drops
+    expired rows and then the least recently used ones above ``max_entries``.
+    ``get`` and ``set`` fail open: when the file is locked or unreadable they
+    log it and act as a miss, so the caller goes upstream instead of failing.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS response_cache (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS response_cache_expires ON response_cache (expires_at)",
+        "CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed_at)"
+    )
+
+    def __init__(self, path, max_entries=1024, ttl=3600, touch_interval=60):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+
+    def get(self, key):
+        try:
+            return self._get(key)
+        except sqlite3.OperationalError as e:
+            logger.warning("Response cache read failed, treating it as a miss: %s", e)
+            return None
+
+    def _get(self, key):
+        conn = self._connect()
+        encoded = encode_key(key)
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM response_cache WHERE key = ?",
+            (encoded,)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        if now - row[2] >= self.touch_interval:
+            conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, encoded))
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (encode_key(key), blob, now + self.ttl, now)
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning("Response cache write failed, the response is not cached: %s", e)
+
+    def purge_expired(self):
+        """Drop expired rows, then trim to ``max_entries`` by recency; return rows removed"""
+        conn = self._connect()
+        removed = conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        removed += conn.execute("""
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (max(self.max_entries, 0),)).rowcount
+        return removed
+
+    def clear(self):
+        self._connect().execute("DELETE FROM response_cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+def start_purger(cache, interval):
+    """Run ``cache.purge_expired`` every ``interval`` seconds on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                cache.purge_expired()
+            except sqlite3.Error:
+                # Another worker may hold the write lock; the next pass catches up
+                pass
+
+    thread = threading.Thread(target=run, name="response-cache-purger", daemon=True)
+    thread.start()
+    return thread
+
+
+def create_cache(backend, path=None, max_entries=1024, ttl=3600):
+    """Build the response cache for ``backend`` ("memory" or "sqlite")"""
+    if backend == "sqlite":
+        return SQLiteResponseCache(path, max_entries=max_entries, ttl=ttl)
+    if backend == "memory":
+        return ResponseCache(max_entries=max_entries, ttl=ttl)
+    raise ValueError(f"Unknown response cache backend: {backend}")
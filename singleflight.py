@@ -0,0 +1,129 @@
+"""Coalescing of identical concurrent model calls into one upstream request"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from response_cache import encode_key
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Run ``func`` once per concurrent ``key`` and return ``(result, shared)``"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result(), True
+
+        try:
+            result = func()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self):
+        return len(self._calls)
+
+
+class SQLiteFlightClaims(SQLiteStore):
+    """Marks which keys some worker on the node is already fetching.
+
+    A worker that wins ``claim`` makes the upstream call and publishes the
+    result through the shared response cache; the others ``wait`` for that
+    result instead of making the same call. Claims expire after ``ttl``
+    seconds so a crashed worker cannot block a key for long. When the file
+    is locked or unreadable the claims fail open: the error is logged and
+    the caller makes the call itself.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS inflight_calls (
+            key TEXT PRIMARY KEY,
+            pid INTEGER NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+    )
+
+    def __init__(self, path, ttl=35, poll_interval=0.05):
+        super().__init__(path)
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+
+    def claim(self, key):
+        """Return True if this worker now owns ``key``, or could not tell and should make the call"""
+        encoded = encode_key(key)
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM inflight_calls WHERE key = ? AND expires_at <= ?", (encoded, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO inflight_calls (key, pid, expires_at) VALUES (?, ?, ?)",
+                (encoded, os.getpid(), now + self.ttl)
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning("Could not claim an in-flight call, making it without a claim: %s", e)
+            return True
+        return cursor.rowcount == 1
+
+    def release(self, key):
+        try:
+            self._connect().execute(
+                "DELETE FROM inflight_calls WHERE key = ? AND pid = ?",
+                (encode_key(key), os.getpid())
+            )
+        except sqlite3.OperationalError as e:
+            # The claim expires after ttl seconds on its own
+            logger.warning("Could not release an in-flight call claim: %s", e)
+
+    def is_claimed(self, key):
+        try:
+            row = self._connect().execute(
+                "SELECT 1 FROM inflight_calls WHERE key = ? AND expires_at > ?",
+                (encode_key(key), time.time())
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            logger.warning("Could not check an in-flight call claim, treating it as released: %s", e)
+            return False
+        return row is not None
+
+    def wait(self, key, lookup, timeout):
+        """Poll ``lookup()`` until it returns a value, the claim goes away or ``timeout`` passes.
+
+        Returns the looked-up value, or None when the caller should make the call itself.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            value = lookup()
+            if value is not None:
+                return value
+            if not self.is_claimed(key):
+                # The owner finished without publishing a result (e.g. a fallback); check once more
+                return lookup()
+            time.sleep(self.poll_interval)
+        return None
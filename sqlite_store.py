@@ -0,0 +1,34 @@
+"""Shared plumbing for the SQLite files the worker processes on a node share"""
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """Base class holding one autocommit connection per thread, reopened after a fork.
+
+    Subclasses list their ``CREATE`` statements in ``SCHEMA``; they run once
+    when the store is built. Every connection uses WAL mode so readers in
+    other workers never block the writer.
+    """
+
+    SCHEMA = ()
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+
+    def _connect(self):
+        """Return this thread's connection, opening a new one after a fork"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
@@ -104,7 +104,7 @@ document.addEventListener('DOMContentLoaded', function() {
             localStorage.setItem('questionHistory', JSON.stringify(history));
         },
         
-        addQuestion: function(question, responses = null) {
+        addQuestion: function(question, responses = null, sessionId = null) {
             const history = this.getHistory();
             const timestamp = new Date().toLocaleString();
             
@@ -112,7 +112,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 question: question,
                 timestamp: timestamp,
                 responses: responses,
-                sessionId: new Date().getTime()
+                // Comparisons carry the id the server saved them under, so they can be reopened
+                sessionId: sessionId || new Date().getTime()
             });
             
             // Keep only last 50 questions
@@ -183,6 +184,74 @@ document.addEventListener('DOMContentLoaded', function() {
 
             // Save to history
             window.historyManager.addQuestion(question);
+
+            // Ask for a streamed results page when the browser can consume it
+            if (window.EventSource && !form.querySelector('input[name="stream"]')) {
+                const streamInput = document.createElement('input');
+                streamInput.type = 'hidden';
+                streamInput.name = 'stream';
+                streamInput.value = '1';
+                form.appendChild(streamInput);
+            }
+        });
+    }
+
+    // Fill in result cards as the comparison streams in
+    const streamUrl = document.body.getAttribute('data-stream-url');
+    if (streamUrl && window.EventSource) {
+        const source = new EventSource(streamUrl);
+        const findCard = model => Array.from(document.querySelectorAll('.ai-response'))
+            .find(card => card.getAttribute('data-model') === model);
+
+        source.addEventListener('token', event => {
+            const data = JSON.parse(event.data);
+            const card = findCard(data.model);
+            if (!card) return;
+            const text = card.querySelector('.response-text');
+            if (card.classList.contains('pending')) {
+                card.classList.remove('pending');
+                text.textContent = '';
+            }
+            text.textContent += data.text;
+        });
+
+        source.addEventListener('result', event => {
+            const data = JSON.parse(event.data);
+            const card = findCard(data.model);
+            if (!card) return;
+            card.classList.remove('pending');
+            card.classList.toggle('timed-out', Boolean(data.timed_out));
+            card.querySelector('.response-text').textContent = data.response;
+            card.querySelector('.confidence .meta-value').textContent = `${(data.confidence * 100).toFixed(1)}%`;
+            card.querySelector('.response-time .meta-value').textContent = `${data.response_time.toFixed(2)}s`;
+            card.querySelector('.cached-badge').hidden = !data.cached;
+            card.querySelector('.timeout-badge').hidden = !data.timed_out;
+            card.querySelector('.unavailable-badge').hidden = !data.circuit_open;
+        });
+
+        source.addEventListener('error', event => {
+            // Server-sent error events carry data; connection errors do not
+            if (event.data) {
+                const data = JSON.parse(event.data);
+                const card = data.model && findCard(data.model);
+                if (card) {
+                    card.classList.remove('pending');
+                    card.querySelector('.response-text').textContent = data.error;
+                }
+                if (window.toastManager) {
+                    toastManager.show(data.error, 'error');
+                }
+                return;
+            }
+            source.close();
+            document.querySelectorAll('.ai-response.pending .response-text').forEach(text => {
+                text.textContent = 'The connection was lost before this model answered.';
+            });
+        });
+
+        source.addEventListener('done', () => {
+            source.close();
+            document.dispatchEvent(new CustomEvent('comparison-complete'));
         });
     }
 
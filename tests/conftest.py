@@ -1,12 +1,64 @@
 import pytest
 import os
+import sys
+import tempfile
 from dotenv import load_dotenv
 
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import MODEL_REGISTRY
+from providers import HuggingFaceAdapter, ProviderContext
+
+# Keep the on-disk stores the app creates at import time out of the working tree
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='ai-model-comparison-'))
+
 @pytest.fixture(autouse=True)
 def load_env():
     """Automatically load environment variables before each test"""
     load_dotenv()
 
+@pytest.fixture(autouse=True)
+def reset_app_state():
+    """Drop per-process state the app keeps between requests after each test"""
+    yield
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.provider_clients.reset()
+        app_module.response_cache.clear()
+        app_module.model_breakers.reset()
+        app_module.model_health.clear()
+        app_module.model_hedger.reset()
+        app_module.model_latency.reset()
+        app_module.history_store.clear()
+        app_module.vote_store.clear()
+        app_module.batch_store.clear()
+        app_module.rate_limiter.clear()
+        app_module.keep_warm.reset()
+        if app_module.hf_loading is not None:
+            app_module.hf_loading.reset()
+
+@pytest.fixture
+def make_hf_adapter():
+    """Factory for a Hugging Face adapter on ``session`` with test settings.
+
+    Other keyword arguments are passed to ``ProviderContext``, e.g. ``hf_batcher``
+    or ``hf_loading``, and override the defaults.
+    """
+    def make(session, name="GPT-2", api_key="hf_test_key", **context):
+        settings = dict(
+            get_api_key=lambda provider: api_key,
+            hf_session=session,
+            hf_api_base="https://api-inference.huggingface.co",
+            clients=None,
+            timeout=30,
+            max_tokens=512,
+            temperature=0.7
+        )
+        settings.update(context)
+        return HuggingFaceAdapter(name, MODEL_REGISTRY[name], ProviderContext(**settings))
+    return make
+
 @pytest.fixture
 def mock_env_vars(monkeypatch):
     """Fixture to set mock environment variables"""
@@ -49,7 +49,7 @@ def test_huggingface_api_key_length():
     assert len(api_key) >= 8, "HUGGINGFACE_API_KEY seems too short"
     assert len(api_key) <= 100, "HUGGINGFACE_API_KEY seems too long"
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_huggingface_api_authentication(mock_post, client):
     """Test that the Hugging Face API key authenticates successfully"""
     # Mock successful API response
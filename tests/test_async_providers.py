@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import async_providers
+from asgi import application
+
+
+@pytest.fixture(autouse=True)
+def hf_key(monkeypatch):
+    monkeypatch.setattr(app_module, 'HUGGINGFACE_API_KEY', 'hf_test_key')
+
+
+def answer_after(delay, text):
+    async def model(question):
+        await asyncio.sleep(delay)
+        return {"response": text, "confidence": 0.85, "response_time": delay}
+    return model
+
+
+async def call_asgi(method, path, body=b""):
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80)
+    }
+    await application(scope, receive, send)
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    return status, b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+
+
+def test_compare_runs_models_concurrently(monkeypatch):
+    """Test that async calls overlap instead of adding up"""
+    monkeypatch.setitem(async_providers.async_models, 'GPT-2', answer_after(0.2, "gpt2"))
+    monkeypatch.setitem(async_providers.async_models, 'BLOOM', answer_after(0.2, "bloom"))
+
+    start = time.monotonic()
+    responses, errors = asyncio.run(async_providers.compare("Async both", ['GPT-2', 'BLOOM'], fresh=True))
+
+    assert time.monotonic() - start < 0.35
+    assert errors == []
+    assert {name: data["response"] for name, data in responses.items()} == {"GPT-2": "gpt2", "BLOOM": "bloom"}
+
+
+def test_compare_cancels_calls_past_the_deadline(monkeypatch):
+    """Test that a call still open at the deadline is cancelled and reported as timed out"""
+    monkeypatch.setattr(app_module, 'COMPARISON_TIMEOUT', 0.2)
+    monkeypatch.setitem(async_providers.async_models, 'BLOOM', answer_after(5, "late"))
+
+    start = time.monotonic()
+    responses, _ = asyncio.run(async_providers.compare("Async slow", ['BLOOM'], fresh=True))
+
+    assert time.monotonic() - start < 1
+    assert responses['BLOOM']['timed_out'] is True
+
+
+def test_follower_makes_the_call_when_the_leader_is_cancelled(monkeypatch):
+    """Test that a coalesced caller still gets an answer after the first caller is cancelled"""
+    monkeypatch.setitem(async_providers.async_models, 'BLOOM', answer_after(0.2, "bloom"))
+
+    async def scenario():
+        leader = asyncio.ensure_future(async_providers.call_model('BLOOM', 'Async shared', fresh=True))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(async_providers.call_model('BLOOM', 'Async shared', fresh=True))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await follower
+
+    result = asyncio.run(scenario())
+
+    assert result["response"] == "bloom"
+    assert result["coalesced"] is False
+
+
+def test_compare_reports_a_cancelled_call_as_timed_out(monkeypatch):
+    """Test that a model call that ends cancelled is a timed-out response, not an error"""
+    async def cancelled(model_name, question, fresh=False):
+        raise asyncio.CancelledError()
+    monkeypatch.setattr(async_providers, 'call_model', cancelled)
+
+    responses, errors = asyncio.run(async_providers.compare("Async cancelled", ['GPT-2'], fresh=True))
+
+    assert errors == []
+    assert responses['GPT-2']['timed_out'] is True
+
+
+def test_asgi_compare_endpoint_returns_json(monkeypatch):
+    """Test that POST /api/compare is served by the async layer"""
+    monkeypatch.setitem(async_providers.async_models, 'GPT-2', answer_after(0, "gpt2"))
+    body = json.dumps({"question": "Async endpoint", "models": ["GPT-2"]}).encode()
+
+    status, payload = asyncio.run(call_asgi("POST", "/api/compare", body))
+
+    assert status == 200
+    assert json.loads(payload)["responses"]["GPT-2"]["response"] == "gpt2"
+
+
+def test_asgi_delegates_other_routes_to_flask():
+    """Test that the ASGI entry point still serves the Flask pages"""
+    status, payload = asyncio.run(call_asgi("GET", "/"))
+
+    assert status == 200
+    assert b"AI Model Comparison Tool" in payload
+
+
+class FakeHFSession:
+    """Stands in for the aiohttp session, answering with ``replies`` of ``(status, body)`` in turn"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+
+    def post(self, url, **kwargs):
+        status, body = self.replies.pop(0)
+
+        class Response:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc_info):
+                return False
+
+            async def text(self):
+                return body
+
+        response = Response()
+        response.status = status
+        return response
+
+
+def test_retry_after_loading_takes_its_own_rate_limit_token(monkeypatch):
+    """Test that the retry sent once a loading model is warm is charged like the first request"""
+    session = FakeHFSession([
+        (503, json.dumps({"estimated_time": 1})),
+        (200, json.dumps([{"generated_text": "warm now"}]))
+    ])
+    monkeypatch.setattr(async_providers, "get_hf_session", lambda: session)
+    loading = MagicMock(max_wait=1)
+    loading.is_loading.return_value = False
+
+    async def warm(model_id, timeout):
+        return True
+    loading.wait_until_warm_async = warm
+    monkeypatch.setattr(app_module, "hf_loading", loading)
+    limiter = MagicMock()
+    monkeypatch.setattr(app_module, "rate_limiter", limiter)
+
+    result = asyncio.run(async_providers.get_huggingface_response("GPT-2", "Warm retry"))
+
+    assert result["response"] == "warm now"
+    assert limiter.acquire.call_count == 2
@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from batch import iter_cells, parse_provider_limits
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+def test_parse_provider_limits():
+    """Test that provider limits parse with a default for other providers"""
+    assert parse_provider_limits("huggingface=4, anthropic=1", 2) == {"huggingface": 4, "anthropic": 1, "default": 2}
+    assert parse_provider_limits("", 3) == {"default": 3}
+
+
+def test_iter_cells_respects_provider_limits():
+    """Test that no provider runs more cells at once than its limit"""
+    lock = threading.Lock()
+    active = {"slow": 0, "fast": 0}
+    peak = {"slow": 0, "fast": 0}
+
+    def run(cell):
+        provider = cell[0]
+        with lock:
+            active[provider] += 1
+            peak[provider] = max(peak[provider], active[provider])
+        time.sleep(0.05)
+        with lock:
+            active[provider] -= 1
+        return cell
+
+    cells = [("slow", i) for i in range(6)] + [("fast", i) for i in range(6)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        finished = [cell for cell, future in iter_cells(cells, run, lambda cell: cell[0],
+                                                         {"slow": 1, "default": 3}, 8, executor)]
+    assert sorted(finished) == sorted(cells)
+    assert peak["slow"] == 1
+    assert peak["fast"] <= 3
+
+
+def test_batch_streams_ndjson_and_resumes(monkeypatch):
+    """Test that a batch streams every cell and a resumed batch only reruns failed cells"""
+    monkeypatch.setattr(app_module, 'HUGGINGFACE_API_KEY', 'hf_test_key')
+    answers = {"Batch one": 0.85, "Batch two": 0}
+    model = MagicMock(side_effect=lambda question: {"response": f"Answer to {question}", "confidence": answers[question], "response_time": 0.1})
+    monkeypatch.setitem(app_module.ai_models, "GPT-2", model)
+    monkeypatch.setitem(app_module.ai_models, "BLOOM", model)
+    app_module.app.config['TESTING'] = True
+    body = {"prompts": ["Batch one", "Batch two"], "models": ["GPT-2", "BLOOM"], "batch_id": "suite-1"}
+    with app_module.app.test_client() as client:
+        response = client.post('/api/batch', json=body)
+        assert response.mimetype == "application/x-ndjson"
+        lines = read_ndjson(response)
+        assert lines[0] == {"type": "batch", "batch_id": "suite-1", "prompts": 2, "models": ["GPT-2", "BLOOM"]}
+        cells = [line for line in lines if line["type"] == "cell"]
+        assert len(cells) == 4
+        assert lines[-1]["type"] == "done"
+        assert lines[-1]["failed"] == 2
+        calls = model.call_count
+        assert calls == 4
+
+        answers["Batch two"] = 0.85
+        lines = read_ndjson(client.post('/api/batch', json=dict(body, fresh=True)))
+    cells = [line for line in lines if line["type"] == "cell"]
+    assert sorted((cell["prompt_index"], cell["resumed"]) for cell in cells) == [(0, True), (0, True), (1, False), (1, False)]
+    assert model.call_count == calls + 2
+    assert lines[-1]["resumed"] == 2
+    assert lines[-1]["failed"] == 0
+
+
+def test_batch_rejects_bad_requests():
+    """Test that malformed batches are rejected before anything runs"""
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        assert client.post('/api/batch', json={"prompts": [], "models": ["GPT-2"]}).status_code == 400
+        assert client.post('/api/batch', json={"prompts": ["Q"], "models": ["Nope"]}).status_code == 400
+        assert client.post('/api/batch', json={"prompts": ["Q"], "models": [["GPT-2"]]}).status_code == 400
+        assert client.post('/api/batch', json={"prompts": ["Q"], "models": ["GPT-2"], "batch_id": "../x"}).status_code == 400
@@ -0,0 +1,97 @@
+import os
+import sys
+
+import anthropic
+import cohere
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_providers import DEFAULT_PROFILES, FakeProviders, parse_profile
+from benchmarks.run import compare_with_baseline, percentile
+from http_pool import PooledSession
+
+FAST = {provider: dict(profile, median=0.001, sigma=0) for provider, profile in DEFAULT_PROFILES.items()}
+
+
+@pytest.fixture
+def fake():
+    server = FakeProviders(FAST, seed=1).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fake_adapter(fake, make_hf_adapter):
+    """Hugging Face adapter pointed at the fake server through a real pooled session"""
+    return make_hf_adapter(PooledSession(fake.url), hf_api_base=fake.url, timeout=5)
+
+
+def test_parse_profile_overrides_one_provider():
+    """Test that a profile string changes only the named provider's settings"""
+    profiles = parse_profile("huggingface:median=0.2,loading_rate=0.05")
+    assert profiles["huggingface"]["median"] == 0.2
+    assert profiles["huggingface"]["loading_rate"] == 0.05
+    assert profiles["anthropic"] == DEFAULT_PROFILES["anthropic"]
+    with pytest.raises(ValueError):
+        parse_profile("openai:median=1")
+
+
+def test_fake_huggingface_answers_the_adapter(fake, fake_adapter):
+    """Test that the Hugging Face adapter parses the fake server's answers"""
+    result = fake_adapter("Hello?")
+    assert result["confidence"] > 0
+    assert "Fake answer from gpt2" in result["response"]
+    assert fake.requests["huggingface"] == 1
+
+
+def test_fake_huggingface_reports_cold_models(fake, fake_adapter):
+    """Test that a cold model answers 503 with an estimate until it has loaded"""
+    fake.profiles = parse_profile("huggingface:cold_seconds=30", FAST)
+    result = fake_adapter("Hello?")
+    assert result["loading"] is True
+    assert 0 < result["estimated_time"] <= 30
+
+
+def test_fake_anthropic_and_cohere_answer_the_sdks(fake):
+    """Test that the real SDK clients accept the fake server's responses"""
+    message = anthropic.Anthropic(api_key="sk-ant-test", base_url=fake.url).messages.create(
+        model="claude-3-opus-20240229", max_tokens=16, messages=[{"role": "user", "content": "Hi"}]
+    )
+    assert "Fake Anthropic answer to: Hi" == message.content[0].text
+    generations = cohere.Client("co-test", api_url=fake.url).generate(model="command", prompt="Hi", max_tokens=16)
+    assert "Fake Cohere answer to: Hi" in generations[0].text
+
+
+def test_errors_are_injected_at_the_configured_rate(fake, fake_adapter):
+    """Test that an error rate of 1 fails every call"""
+    fake.profiles = parse_profile("huggingface:error_rate=1", FAST)
+    result = fake_adapter("Hello?")
+    assert result["confidence"] == 0
+
+
+def test_percentile_uses_nearest_rank():
+    """Test the benchmark's percentile on a small sorted sample"""
+    values = [0.1 * i for i in range(1, 101)]
+    assert percentile(values, 50) == pytest.approx(5.0)
+    assert percentile(values, 99) == pytest.approx(9.9)
+    assert percentile([], 99) == 0.0
+
+
+def test_regressions_are_reported_against_the_baseline():
+    """Test that slower, less productive or hungrier runs are flagged and steady ones are not"""
+    baseline = {
+        "scenarios": {"vote": {"requests": 100, "errors": 0, "throughput": 400.0, "p99": 0.03}},
+        "memory": {"1": {"rss_mb": 110.0, "peak_rss_mb": 110.0}}
+    }
+    steady = {
+        "scenarios": {"vote": {"requests": 100, "errors": 0, "throughput": 390.0, "p99": 0.032}},
+        "memory": {"2": {"rss_mb": 112.0, "peak_rss_mb": 112.0}}
+    }
+    worse = {
+        "scenarios": {"vote": {"requests": 100, "errors": 5, "throughput": 200.0, "p99": 0.09}},
+        "memory": {"2": {"rss_mb": 200.0, "peak_rss_mb": 200.0}}
+    }
+    assert compare_with_baseline(steady, baseline, 0.2) == []
+    assert len(compare_with_baseline(worse, baseline, 0.2)) == 4
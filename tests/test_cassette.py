@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cassette import Cassette
+
+
+def answer(text):
+    return {"response": text, "confidence": 0.85, "response_time": 1.5}
+
+
+def test_recordings_survive_reopening(tmp_path):
+    """Test that recorded responses are read back, one compact line each, from a new cassette"""
+    path = str(tmp_path / "cassette.jsonl")
+    recorder = Cassette(path)
+    recorder.record("GPT-2", "What is AI?", answer("First"), 1.5)
+    recorder.record("Claude-2", "What is AI?", answer("Other model"), 0.7)
+    recorder.close()
+
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert [line["model"] for line in lines] == ["GPT-2", "Claude-2"]
+
+    player = Cassette(path)
+    assert len(player) == 2
+    assert player.lookup("GPT-2", "What is AI?") == (answer("First"), 1.5)
+    assert player.lookup("GPT-2", "Unknown question") is None
+    assert player.prompts() == ["What is AI?"]
+
+
+def test_repeated_recordings_are_replayed_in_turn(tmp_path):
+    """Test that several recordings for one prompt are served round-robin"""
+    path = str(tmp_path / "cassette.jsonl")
+    recorder = Cassette(path)
+    recorder.record("GPT-2", "Hi", answer("one"), 1.0)
+    recorder.record("GPT-2", "Hi", answer("two"), 2.0)
+    assert len(recorder) == 0
+    cassette = Cassette(path)
+    replies = [cassette.lookup("GPT-2", "Hi")[0]["response"] for _ in range(3)]
+    assert replies == ["one", "two", "one"]
+
+
+def test_truncated_line_is_skipped(tmp_path):
+    """Test that a line cut short while recording does not stop the rest from loading"""
+    path = tmp_path / "cassette.jsonl"
+    path.write_text(
+        json.dumps({"model": "GPT-2", "prompt": "Hi", "elapsed": 0.5, "response": answer("kept")}) + "\n"
+        + '{"model": "GPT-2", "prompt": "Cut'
+    )
+    assert len(Cassette(str(path))) == 1
+
+
+def test_original_timing_waits_for_the_recorded_time(tmp_path):
+    """Test that original timing sleeps for the recorded duration and fast timing does not"""
+    path = str(tmp_path / "cassette.jsonl")
+    Cassette(path).record("GPT-2", "Hi", answer("slow"), 2.5)
+    sleep = MagicMock()
+    Cassette(path, timing="original").replay("GPT-2", "Hi", sleep=sleep)
+    sleep.assert_called_once_with(2.5)
+    sleep.reset_mock()
+    Cassette(path, timing="fast").replay("GPT-2", "Hi", sleep=sleep)
+    sleep.assert_not_called()
+
+
+def test_adapter_records_then_replays_without_upstream(tmp_path, make_hf_adapter):
+    """Test that record mode stores the real answer and replay mode serves it with no key or call"""
+    path = str(tmp_path / "cassette.jsonl")
+    session = MagicMock()
+    session.post.return_value.status_code = 200
+    session.post.return_value.json.return_value = [{"generated_text": "Recorded answer"}]
+    recorded = make_hf_adapter(session, cassette=Cassette(path), cassette_mode="record")("Hi")
+
+    offline = MagicMock()
+    replayed = make_hf_adapter(offline, api_key=None, cassette=Cassette(path), cassette_mode="replay")("Hi")
+    missing = make_hf_adapter(offline, api_key=None, cassette=Cassette(path), cassette_mode="replay")("Never asked")
+
+    assert replayed["response"] == recorded["response"] == "Recorded answer"
+    assert missing["confidence"] == 0
+    offline.post.assert_not_called()
@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import deadline
+from circuit_breaker import CircuitBreaker, BreakerBoard, CLOSED, OPEN, HALF_OPEN
+
+
+def test_breaker_opens_after_failure_threshold():
+    """Test that enough failures in the window open the breaker"""
+    breaker = CircuitBreaker("m", failure_threshold=3, window=60, reset_timeout=30)
+    for _ in range(2):
+        breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert 0 < breaker.retry_in() <= 30
+
+
+def test_breaker_stays_closed_when_most_calls_succeed():
+    """Test that failures below half of the recent calls do not open the breaker"""
+    breaker = CircuitBreaker("m", failure_threshold=3, window=60)
+    for _ in range(4):
+        breaker.record(True, 0.1)
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_count_as_failures():
+    """Test that calls slower than the threshold count as failures"""
+    breaker = CircuitBreaker("m", failure_threshold=2, slow_call_threshold=1)
+    breaker.record(True, 5)
+    breaker.record(True, 5)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_or_reopens():
+    """Test that the half-open probe's outcome decides the next state"""
+    probes = []
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_timeout=0, on_half_open=probes.append)
+    breaker.record(False, 0.1)
+    assert not breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert probes == ["m"]
+
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    breaker.allow_request()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+
+def test_board_probes_in_background():
+    """Test that the board runs the probe on a background thread and closes a recovered breaker"""
+    probed = threading.Event()
+    release = threading.Event()
+
+    def probe(name):
+        probed.set()
+        release.wait(2)
+        return True, 0.05
+
+    board = BreakerBoard(["m"], probe, failure_threshold=1, reset_timeout=0)
+    board["m"].record(False, 0.1)
+    assert board.snapshot()["m"]["state"] == HALF_OPEN
+    assert probed.wait(2)
+    release.set()
+    deadline = time.time() + 2
+    while board["m"].state != CLOSED and time.time() < deadline:
+        time.sleep(0.01)
+    assert board["m"].state == CLOSED
+
+
+def test_open_breaker_skips_upstream_call(monkeypatch):
+    """Test that call_model fails fast without calling a model whose breaker is open"""
+    model = MagicMock(return_value={"response": "down", "confidence": 0, "response_time": 0.1})
+    monkeypatch.setitem(app_module.ai_models, "GPT-2", model)
+    breaker = app_module.model_breakers["GPT-2"]
+    for i in range(breaker.failure_threshold):
+        app_module.call_model("GPT-2", f"Breaker question {i}")
+    assert breaker.state == OPEN
+    assert model.call_count == breaker.failure_threshold
+
+    response = app_module.call_model("GPT-2", "Breaker question final")
+    assert response["circuit_open"] is True
+    assert response["confidence"] == 0
+    assert model.call_count == breaker.failure_threshold
+
+
+def test_calls_cut_off_by_the_comparison_deadline_are_not_failures(monkeypatch):
+    """Test that a model that ran out of the comparison's time does not count against its breaker"""
+    model = MagicMock(return_value={"response": "Request timed out", "confidence": 0, "response_time": 0})
+    monkeypatch.setitem(app_module.ai_models, "GPT-2", model)
+    breaker = app_module.model_breakers["GPT-2"]
+    with deadline.deadline_after(0):
+        for i in range(breaker.failure_threshold):
+            response = app_module.call_model("GPT-2", f"Late question {i}")
+    assert response["deadline_exceeded"] is True
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["recent_failures"] == 0
+
+
+def test_index_marks_unavailable_models():
+    """Test that the model list shows models whose breaker is open"""
+    breaker = app_module.model_breakers["BART"]
+    for _ in range(breaker.failure_threshold):
+        breaker.record(False, 0.1)
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        page = client.get('/').get_data(as_text=True)
+    assert "(Temporarily Unavailable)" in page
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import deadline
+
+
+def test_nested_deadline_keeps_the_sooner_one():
+    """Test that an inner deadline never extends the enclosing one"""
+    assert deadline.remaining() is None
+    with deadline.deadline_after(1):
+        with deadline.deadline_after(60):
+            assert deadline.remaining() <= 1
+        with deadline.deadline_after(0.5):
+            assert deadline.remaining() <= 0.5
+    assert deadline.remaining() is None
+
+
+def test_enclosing_lifts_only_the_innermost_deadline():
+    """Test that enclosing() runs under the outer deadline and restores the inner one afterwards"""
+    with deadline.enclosing():
+        assert deadline.remaining() is None
+    with deadline.deadline_after(5):
+        with deadline.deadline_after(0.5):
+            with deadline.enclosing():
+                assert 0.5 < deadline.remaining() <= 5
+            assert deadline.remaining() <= 0.5
+
+
+def test_bounded_cuts_timeouts_to_the_time_left():
+    """Test that a timeout is shortened to the deadline but kept above the minimum"""
+    assert deadline.bounded(30) == 30
+    with deadline.deadline_after(2):
+        assert 1 < deadline.bounded(30) <= 2
+    with deadline.deadline_after(0):
+        assert deadline.expired()
+        assert deadline.bounded(30) == 0.1
+
+
+def test_propagate_carries_the_deadline_into_pool_threads():
+    """Test that a wrapped function sees the caller's deadline on another thread"""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with deadline.deadline_after(5):
+            plain = executor.submit(deadline.remaining).result()
+            carried = executor.submit(deadline.propagate(deadline.remaining)).result()
+    assert plain is None
+    assert 0 < carried <= 5
+
+
+def test_adapter_skips_calls_past_the_deadline(make_hf_adapter):
+    """Test that no upstream request is made once the deadline has passed"""
+    session = MagicMock()
+    adapter = make_hf_adapter(session)
+    with deadline.deadline_after(0):
+        result = adapter("Too late?")
+    assert result["confidence"] == 0
+    assert "timed out" in result["response"]
+    session.post.assert_not_called()
+
+
+def test_adapter_request_timeout_follows_the_deadline(make_hf_adapter):
+    """Test that the HTTP timeout is the time left rather than the full request timeout"""
+    session = MagicMock()
+    session.post.return_value.status_code = 200
+    session.post.return_value.json.return_value = [{"generated_text": "Hi"}]
+    adapter = make_hf_adapter(session)
+    with deadline.deadline_after(3):
+        adapter("Quick?")
+    assert session.post.call_args.kwargs["timeout"] <= 3
+
+
+def test_model_timeout_adapts_to_observed_latency():
+    """Test that a model's timeout follows its p99 latency once there are enough samples"""
+    assert app_module.model_timeout("Cohere-Command") == app_module.REQUEST_TIMEOUT
+    for _ in range(app_module.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+        app_module.model_latency.record("Cohere-Command", 4.0)
+    timeout = app_module.model_timeout("Cohere-Command")
+    assert 4.0 * app_module.ADAPTIVE_TIMEOUT_MULTIPLIER * 0.9 <= timeout < app_module.REQUEST_TIMEOUT
+    for _ in range(app_module.ADAPTIVE_TIMEOUT_MIN_SAMPLES):
+        app_module.model_latency.record("GPT-2", 0.2)
+    assert app_module.model_timeout("GPT-2") == app_module.ADAPTIVE_TIMEOUT_MIN
+
+
+def test_slow_call_is_cut_off_at_the_page_deadline(monkeypatch):
+    """Test that a provider call started by the page sees the comparison deadline"""
+    monkeypatch.setattr(app_module, 'HUGGINGFACE_API_KEY', 'hf_test_key')
+    seen = []
+    monkeypatch.setattr(app_module, 'COMPARISON_TIMEOUT', 0.5)
+    monkeypatch.setitem(app_module.ai_models, 'GPT-2', lambda question: seen.append(deadline.remaining()) or {
+        "response": "ok", "confidence": 0.9, "response_time": 0.1
+    })
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        client.post('/', data={'question': f'Deadline check {time.time()}', 'ai_models': ['GPT-2']})
+    assert seen and 0 < seen[0] <= 0.5
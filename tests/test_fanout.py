@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from fanout import fan_out
+
+
+def slow(value, delay):
+    def call():
+        time.sleep(delay)
+        return value
+    return call
+
+
+@pytest.fixture
+def client():
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        yield client
+
+
+def test_fan_out_runs_tasks_concurrently():
+    """Test that the total time tracks the slowest task, not the sum"""
+    tasks = {f"model-{i}": slow(i, 0.2) for i in range(5)}
+
+    start = time.monotonic()
+    results, timed_out = fan_out(tasks, timeout=5, max_concurrency=5)
+    elapsed = time.monotonic() - start
+
+    assert timed_out == []
+    assert {name: future.result() for name, future in results.items()} == {f"model-{i}": i for i in range(5)}
+    assert elapsed < 0.6
+
+
+def test_fan_out_marks_tasks_past_the_deadline():
+    """Test that a slow task is reported as timed out without holding up the others"""
+    tasks = {"fast": slow("ok", 0), "slow": slow("late", 2)}
+
+    start = time.monotonic()
+    results, timed_out = fan_out(tasks, timeout=0.3, max_concurrency=2)
+
+    assert time.monotonic() - start < 1
+    assert list(results) == ["fast"]
+    assert timed_out == ["slow"]
+
+
+def test_fan_out_respects_concurrency_limit():
+    """Test that no more than max_concurrency tasks run at the same time"""
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def task():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+
+    fan_out({f"t{i}": task for i in range(8)}, timeout=5, max_concurrency=2)
+
+    assert state["peak"] <= 2
+
+
+def test_index_returns_timeout_card(client, monkeypatch):
+    """Test that a model missing the comparison deadline is rendered as a timeout"""
+    monkeypatch.setattr(app_module, 'HUGGINGFACE_API_KEY', 'hf_test_key')
+    monkeypatch.setattr(app_module, 'COMPARISON_TIMEOUT', 0.3)
+    monkeypatch.setitem(app_module.ai_models, 'GPT-2',
+                        lambda q: {"response": "fast answer", "confidence": 0.8, "response_time": 0})
+    monkeypatch.setitem(app_module.ai_models, 'BLOOM', lambda q: time.sleep(2))
+
+    response = client.post('/', data={'question': 'Hi', 'ai_models': ['GPT-2', 'BLOOM']})
+
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert "fast answer" in body
+    assert "BLOOM did not respond within 0.3 seconds." in body
@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import deadline
+from health import HealthMonitor, HealthStore
+
+
+def test_checks_run_in_parallel():
+    """Test that a refresh checks all models at the same time"""
+    def check(name):
+        time.sleep(0.3)
+        return "Connected successfully"
+
+    monitor = HealthMonitor(["a", "b", "c", "d"], check, probe_timeout=5, max_concurrency=4, max_workers=32)
+    start = time.monotonic()
+    snapshot = monitor.refresh()
+    assert time.monotonic() - start < 1
+    assert snapshot["results"] == {name: "Connected successfully" for name in "abcd"}
+
+
+def test_slow_check_times_out():
+    """Test that a model slower than the probe timeout is reported without holding up the rest"""
+    release = threading.Event()
+
+    def check(name):
+        if name == "slow":
+            release.wait(5)
+        return "Connected successfully"
+
+    monitor = HealthMonitor(["fast", "slow"], check, probe_timeout=0.2, max_concurrency=2, max_workers=32)
+    results = monitor.refresh()["results"]
+    release.set()
+    assert results["fast"] == "Connected successfully"
+    assert "timed out" in results["slow"]
+
+
+def test_snapshot_is_cached_until_refresh():
+    """Test that snapshots are reused until a refresh is requested"""
+    check = MagicMock(return_value="Connection failed")
+    monitor = HealthMonitor(["a"], check, probe_timeout=5, max_workers=32)
+    first = monitor.snapshot()
+    assert monitor.snapshot() is first
+    assert check.call_count == 1
+    assert monitor.snapshot(refresh=True) is not first
+    assert check.call_count == 2
+
+
+def test_check_exception_is_reported():
+    """Test that a check raising an exception is reported as an error"""
+    monitor = HealthMonitor(["a"], MagicMock(side_effect=RuntimeError("boom")), probe_timeout=5, max_workers=32)
+    assert monitor.refresh()["results"]["a"] == "Error: boom"
+
+
+def test_checks_run_on_their_own_pool_under_a_deadline():
+    """Test that each check runs on a health thread with the probe timeout as its deadline"""
+    seen = []
+
+    def check(name):
+        seen.append((threading.current_thread().name, deadline.remaining()))
+        return "Connected successfully"
+
+    HealthMonitor(["a", "b"], check, probe_timeout=2, max_concurrency=2).refresh()
+    assert all(thread.startswith("health") and 0 < left <= 2 for thread, left in seen)
+
+
+def test_workers_share_one_refresh(tmp_path):
+    """Test that a second worker waits for the first one's checks and reads them instead of repeating them"""
+    path = str(tmp_path / "health.sqlite3")
+    release = threading.Event()
+    first_check = MagicMock(side_effect=lambda name: release.wait(5) and "Connected successfully")
+    second_check = MagicMock(return_value="Connection failed")
+    first = HealthMonitor(["a"], first_check, probe_timeout=5, store=HealthStore(path), poll_interval=0.01)
+    second = HealthMonitor(["a"], second_check, probe_timeout=5, store=HealthStore(path), poll_interval=0.01)
+
+    worker = threading.Thread(target=first.refresh)
+    worker.start()
+    time.sleep(0.1)
+    threading.Timer(0.1, release.set).start()
+    shared = second.refresh()
+    worker.join()
+
+    assert shared["results"] == {"a": "Connected successfully"}
+    assert second.snapshot() == shared
+    second_check.assert_not_called()
+    assert first.refresh_if_older_than(60)["checked_at"] == shared["checked_at"]
+    assert first_check.call_count == 1
+
+
+def test_test_connections_serves_cached_snapshot(monkeypatch):
+    """Test that /test-connections serves the cached results and refreshes on request"""
+    check = MagicMock(return_value="Connected successfully")
+    monkeypatch.setattr(app_module.model_health, "check", check)
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        first = client.get('/test-connections')
+        assert first.status_code == 200
+        assert set(first.get_json()) == set(app_module.ai_models)
+        assert "X-Checked-At" in first.headers
+        calls = check.call_count
+        assert calls == len(app_module.ai_models)
+
+        client.get('/test-connections')
+        assert check.call_count == calls
+
+        client.get('/test-connections?refresh=1')
+        assert check.call_count == 2 * calls
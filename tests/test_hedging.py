@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from hedging import Hedger, HedgeBudget
+from latency_stats import LatencyRecorder
+
+
+def make_hedger(**settings):
+    return Hedger(LatencyRecorder(["m"]), min_samples=20, **settings)
+
+
+def warm(hedger, name, latency=0.01, count=20):
+    for _ in range(count):
+        hedger.latencies.record(name, latency)
+
+
+def test_budget_never_exceeds_ratio():
+    """Test that the budget allows at most one hedge per primary call"""
+    budget = HedgeBudget(ratio=5)
+    assert budget.ratio == 1.0
+    spent = 0
+    for _ in range(100):
+        budget.deposit()
+        spent += budget.try_spend()
+    assert spent <= 100
+
+    budget = HedgeBudget(ratio=0.1)
+    spent = 0
+    for _ in range(100):
+        budget.deposit()
+        spent += budget.try_spend()
+    assert spent <= 10
+
+
+def test_no_hedging_without_enough_samples():
+    """Test that models without a latency history are called once"""
+    hedger = make_hedger(budget_ratio=1.0)
+    func = MagicMock(return_value={"confidence": 1})
+    hedger.budget.tokens = 5
+    assert hedger.call("m", func) == {"confidence": 1}
+    assert func.call_count == 1
+    assert hedger.hedges_sent == 0
+
+
+def test_slow_call_is_hedged_and_hedge_wins():
+    """Test that a call slower than the model's p95 gets a backup that can answer first"""
+    hedger = make_hedger(budget_ratio=1.0)
+    warm(hedger, "m", latency=0.05)
+    hedger.budget.tokens = 5
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            return {"response": "slow", "confidence": 1}
+        return {"response": "fast", "confidence": 1}
+
+    start = time.monotonic()
+    result = hedger.call("m", func)
+    release.set()
+    assert result["response"] == "fast"
+    assert time.monotonic() - start < 1
+    assert hedger.hedges_sent == 1
+    assert hedger.hedges_won == 1
+
+
+def test_failed_hedge_waits_for_primary():
+    """Test that a failing backup does not replace a primary that later succeeds"""
+    hedger = make_hedger(budget_ratio=1.0, is_success=lambda result: result["confidence"] > 0)
+    warm(hedger, "m", latency=0.05)
+    hedger.budget.tokens = 5
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.3)
+            return {"response": "primary", "confidence": 1}
+        return {"response": "error", "confidence": 0}
+
+    assert hedger.call("m", func)["response"] == "primary"
+    assert hedger.hedges_won == 0
+
+
+def test_no_hedge_without_budget():
+    """Test that a slow call is not hedged once the budget is spent"""
+    hedger = make_hedger(budget_ratio=0.0)
+    warm(hedger, "m", latency=0.01)
+    func = MagicMock(side_effect=lambda: time.sleep(0.1) or {"confidence": 1})
+    hedger.call("m", func)
+    assert func.call_count == 1
+    assert hedger.hedges_sent == 0
+
+
+def test_huggingface_models_are_hedged(monkeypatch):
+    """Test that call_model routes Hugging Face models through the hedger"""
+    model = MagicMock(return_value={"response": "ok", "confidence": 0.85, "response_time": 0.1})
+    monkeypatch.setitem(app_module.ai_models, "OPT", model)
+    hedged = MagicMock(side_effect=lambda name, func: func())
+    monkeypatch.setattr(app_module.model_hedger, "call", hedged)
+    app_module.call_model("OPT", "Hedge routing question")
+    assert hedged.call_args[0][0] == "OPT"
+    assert "OPT" in app_module.hedged_models
+    assert "Claude-2" not in app_module.hedged_models
@@ -0,0 +1,175 @@
+import os
+import re
+import sys
+import tempfile
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from history_store import HistoryStore
+
+
+def make_store(**settings):
+    return HistoryStore(os.path.join(tempfile.mkdtemp(), "history.sqlite3"), **settings)
+
+
+def test_save_and_get_by_session_id():
+    """Test that entries are found by owner and session id only"""
+    store = make_store()
+    store.save("owner-a", "s1", "What is AI?", {"GPT-2": {"response": "AI is...", "confidence": 0.85}})
+    entry = store.get("owner-a", "s1")
+    assert entry["question"] == "What is AI?"
+    assert entry["responses"]["GPT-2"]["response"] == "AI is..."
+    assert store.get("owner-b", "s1") is None
+    assert store.get("owner-a", "missing") is None
+
+
+def test_saving_same_session_id_replaces_entry():
+    """Test that saving a session id again replaces the earlier entry"""
+    store = make_store()
+    store.save("owner", "s1", "First", {})
+    store.save("owner", "s1", "Second", {})
+    assert len(store) == 1
+    assert store.get("owner", "s1")["question"] == "Second"
+
+
+def test_pending_comparison_is_taken_once_with_its_token():
+    """Test that a pending comparison is handed over once, only for its token and before it expires"""
+    store = make_store()
+    token = store.save_pending("owner-a", "s1", "What is AI?", ["GPT-2"], fresh=True)
+    assert store.take_pending("owner-a", "s1", "wrong") is None
+    assert store.take_pending("owner-b", "s1", token) is None
+    assert store.take_pending("owner-a", "s1", token) == {"question": "What is AI?", "models": ["GPT-2"], "fresh": True}
+    assert store.take_pending("owner-a", "s1", token) is None
+
+    expired = store.save_pending("owner-a", "s2", "Too late", ["GPT-2"], fresh=False, ttl=0)
+    assert store.take_pending("owner-a", "s2", expired) is None
+
+
+def test_pages_are_newest_first_with_cursor():
+    """Test that pages list entries newest first and the cursor walks through all of them"""
+    store = make_store()
+    for i in range(5):
+        store.save("owner", f"s{i}", f"Question {i}", {})
+    first, cursor = store.page("owner", limit=2)
+    assert [entry["session_id"] for entry in first] == ["s4", "s3"]
+    second, cursor = store.page("owner", limit=2, before=cursor)
+    assert [entry["session_id"] for entry in second] == ["s2", "s1"]
+    last, cursor = store.page("owner", limit=2, before=cursor)
+    assert [entry["session_id"] for entry in last] == ["s0"]
+    assert cursor is None
+
+
+def test_each_owner_keeps_max_entries():
+    """Test that old entries beyond the per-owner limit are dropped"""
+    store = make_store(max_entries=3)
+    for i in range(5):
+        store.save("owner", f"s{i}", "Q", {})
+    store.save("other", "s0", "Q", {})
+    entries, _ = store.page("owner", limit=10)
+    assert [entry["session_id"] for entry in entries] == ["s4", "s3", "s2"]
+    assert store.get("other", "s0") is not None
+
+
+def test_history_api_keeps_cookie_small():
+    """Test that history goes to the server store and the cookie only holds the owner id"""
+    app_module.app.config['TESTING'] = True
+    long_response = "x" * 20000
+    with app_module.app.test_client() as client:
+        for i in range(3):
+            response = client.post('/api/save-history', json={
+                "session_id": f"hist{i}",
+                "question": f"History question {i}",
+                "responses": {"GPT-2": {"response": long_response, "confidence": 0.85, "response_time": 1}}
+            })
+            assert response.status_code == 200
+            cookie = response.headers.get("Set-Cookie", "")
+            assert len(cookie) < 512
+
+        with client.session_transaction() as session:
+            assert set(session.keys()) == {"owner_id"}
+
+        page = client.get('/api/get-history?limit=2').get_json()
+        assert [item["session_id"] for item in page["history"]] == ["hist2", "hist1"]
+        rest = client.get(f'/api/get-history?limit=2&before={page["next_before"]}').get_json()
+        assert [item["session_id"] for item in rest["history"]] == ["hist0"]
+
+        found = client.get('/api/get-response-data/hist1').get_json()
+        assert found["data"]["question"] == "History question 1"
+        assert client.get('/api/get-response-data/nope').status_code == 404
+
+    with app_module.app.test_client() as other_client:
+        assert other_client.get('/api/get-response-data/hist1').status_code == 404
+
+
+def test_comparison_is_saved_to_history(monkeypatch):
+    """Test that a comparison is stored server-side instead of in the session cookie"""
+    monkeypatch.setattr(app_module, 'HUGGINGFACE_API_KEY', 'hf_test_key')
+    monkeypatch.setitem(app_module.ai_models, "MPT", MagicMock(
+        return_value={"response": "ok", "confidence": 0.85, "response_time": 0.1}
+    ))
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        client.post('/', data={"question": "History comparison", "ai_models": ["MPT"]})
+        history = client.get('/api/get-history').get_json()["history"]
+        with client.session_transaction() as session:
+            assert "last_responses" not in session
+    assert history[0]["question"] == "History comparison"
+    assert history[0]["responses"]["MPT"]["response"] == "ok"
+
+
+def test_comparisons_in_the_same_second_are_both_kept(monkeypatch):
+    """Test that two comparisons posted back to back get their own history entries and pages"""
+    monkeypatch.setattr(app_module, 'HUGGINGFACE_API_KEY', 'hf_test_key')
+    monkeypatch.setitem(app_module.ai_models, "MPT", lambda question: {
+        "response": f"answer to {question}", "confidence": 0.85, "response_time": 0.1
+    })
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        pages = [client.post('/', data={"question": question, "ai_models": ["MPT"]}).get_data(as_text=True)
+                 for question in ("first question", "second question")]
+        history = client.get('/api/get-history').get_json()["history"]
+        session_ids = [re.search(r'data-session-id="([^"]+)"', page).group(1) for page in pages]
+        assert session_ids[0] != session_ids[1]
+        assert "answer to first question" in client.get(f'/view-responses/{session_ids[0]}').get_data(as_text=True)
+    assert [item["question"] for item in history] == ["second question", "first question"]
+
+
+def test_pages_filter_by_time_range(monkeypatch):
+    """Test that since and until keep only entries saved in that range"""
+    store = make_store()
+    clock = iter([100.0, 200.0, 300.0])
+    monkeypatch.setattr("history_store.time.time", lambda: next(clock))
+    for i in range(3):
+        store.save("owner", f"s{i}", "Q", {})
+    entries, _ = store.page("owner", since=150, until=300)
+    assert [entry["session_id"] for entry in entries] == ["s1"]
+    plan = store._connect().execute(
+        "EXPLAIN QUERY PLAN SELECT question FROM history WHERE owner_id = ? AND session_id = ?", ("owner", "s1")
+    ).fetchall()
+    assert "sqlite_autoindex_history" in str(plan)
+
+
+def test_view_responses_renders_saved_entry():
+    """Test that /view-responses loads the saved entry on the server"""
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        client.post('/api/save-history', json={
+            "session_id": "view1",
+            "question": "View this question",
+            "responses": {"GPT-2": {"response": "Saved answer", "confidence": 0.85, "response_time": 1.5}}
+        })
+        page = client.get('/view-responses/view1')
+        assert page.status_code == 200
+        text = page.get_data(as_text=True)
+        assert "View this question" in text
+        assert "Saved answer" in text
+        assert "data-from-history" in text
+
+        assert client.get('/view-responses/unknown').status_code == 404
+
+        assert client.get('/api/get-history?since=not-a-date').status_code == 400
+        recent = client.get('/api/get-history?since=2000-01-01T00:00:00').get_json()
+        assert [item["session_id"] for item in recent["history"]] == ["view1"]
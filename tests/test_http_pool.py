@@ -0,0 +1,35 @@
+import os
+import sys
+from unittest.mock import patch
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_pool import PooledSession
+
+
+def test_session_is_reused_across_calls():
+    """Test that every call in a process shares one session"""
+    pool = PooledSession("https://api-inference.huggingface.co")
+
+    assert pool.get() is pool.get()
+
+
+def test_session_is_rebuilt_after_fork():
+    """Test that a forked worker does not reuse its parent's sockets"""
+    pool = PooledSession("https://api-inference.huggingface.co")
+    parent_session = pool.get()
+
+    with patch("http_pool.os.getpid", return_value=os.getpid() + 1):
+        assert pool.get() is not parent_session
+
+
+def test_provider_host_gets_sized_pool_with_retries():
+    """Test that the provider host is mounted with its own pool size and retry policy"""
+    pool = PooledSession("https://api-inference.huggingface.co", pool_maxsize=24, max_retries=3)
+    adapter = pool.get().get_adapter("https://api-inference.huggingface.co/models/gpt2")
+
+    assert adapter._pool_maxsize == 24
+    assert adapter.max_retries.total == 3
+    assert adapter.max_retries.read == 0
+    assert 503 not in adapter.max_retries.status_forcelist
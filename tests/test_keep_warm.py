@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keep_warm import KeepWarmScheduler
+from rate_limit import SQLiteRateLimiter
+
+# 10:00 local time, so a few minutes either way stay in the same hour of day
+TEN_AM = time.mktime((2024, 5, 1, 10, 0, 0, 0, 0, -1))
+
+
+def make_scheduler(**settings):
+    return KeepWarmScheduler(**dict(dict(idle_timeout=900, interval=300, min_demand=2, top_n=2), **settings))
+
+
+def test_demand_is_learned_per_hour_of_day():
+    """Test that calls count toward the hour they were made in and fade with the half-life"""
+    scheduler = make_scheduler(half_life=3600)
+    for _ in range(4):
+        scheduler.record_use("T0pp", now=TEN_AM)
+    assert scheduler.demand("T0pp", now=TEN_AM) == 4
+    assert scheduler.demand("T0pp", now=TEN_AM + 3 * 3600) == 0
+    assert scheduler.demand("T0pp", now=TEN_AM + 24 * 3600) == 4 * 0.5 ** 24
+
+
+def test_only_busy_quiet_models_are_due():
+    """Test that keep-alives go to the busiest models that no recent call keeps loaded"""
+    scheduler = make_scheduler()
+    for name, calls in (("T0pp", 5), ("GPT-Neo", 3), ("BLOOM", 1)):
+        for _ in range(calls):
+            scheduler.record_use(name, now=TEN_AM)
+    assert scheduler.due(now=TEN_AM + 60) == []
+    assert scheduler.due(now=TEN_AM + 700) == ["T0pp", "GPT-Neo"]
+    scheduler.record_use("GPT-Neo", now=TEN_AM + 650)
+    assert scheduler.due(now=TEN_AM + 700) == ["T0pp"]
+
+
+def test_keep_alives_stop_when_the_budget_is_spent():
+    """Test that no keep-alive is sent once ``spend`` refuses"""
+    spend = MagicMock(side_effect=[True, False])
+    scheduler = make_scheduler(spend=spend)
+    for name in ("T0pp", "GPT-Neo"):
+        for _ in range(3):
+            scheduler.record_use(name, now=TEN_AM)
+    keep_alive = MagicMock(return_value=True)
+
+    kept = scheduler.run_once(keep_alive, now=TEN_AM + 700)
+
+    assert keep_alive.call_count == 1
+    assert len(kept) == 1
+    assert scheduler.stats(now=TEN_AM + 700)["over_budget"] == 1
+
+
+def test_workers_send_one_keep_alive_per_model(tmp_path):
+    """Test that schedulers in several workers sharing a claim send each keep-alive once and spend once"""
+    limiter = SQLiteRateLimiter(str(tmp_path / "rate_limits.sqlite3"))
+    spend = MagicMock(return_value=True)
+    claim = lambda name: limiter.try_acquire([(f"keep-alive:{name}", 1 / 600, 1.0)]) == 0
+    workers = [make_scheduler(spend=spend, claim=claim) for _ in range(3)]
+    keep_alive = MagicMock(return_value=True)
+    for scheduler in workers:
+        for _ in range(3):
+            scheduler.record_use("T0pp", now=TEN_AM)
+
+    kept = [scheduler.run_once(keep_alive, now=TEN_AM + 700) for scheduler in workers]
+
+    assert kept == [["T0pp"], [], []]
+    assert keep_alive.call_count == spend.call_count == 1
+    assert all(scheduler.due(now=TEN_AM + 700) == [] for scheduler in workers)
+
+
+def test_saved_cold_start_is_counted_when_a_keep_alive_held_the_model():
+    """Test that a call after a long gap counts the learned cold-start time as saved"""
+    scheduler = make_scheduler()
+    scheduler.record_cold_start("T0pp", 40)
+    for _ in range(3):
+        scheduler.record_use("T0pp", now=TEN_AM)
+    scheduler.run_once(MagicMock(return_value=True), now=TEN_AM + 700)
+    scheduler.run_once(MagicMock(return_value=True), now=TEN_AM + 1400)
+
+    scheduler.record_use("T0pp", now=TEN_AM + 1500)
+
+    stats = scheduler.stats(now=TEN_AM + 1500)
+    assert stats["warm_hits"] == 1
+    assert stats["cold_start_seconds_saved"] == 40
+    assert stats["keep_alives"] == 2
+
+
+def test_no_saving_without_a_keep_alive():
+    """Test that a call after a long gap with no keep-alive saves nothing"""
+    scheduler = make_scheduler()
+    scheduler.record_use("T0pp", now=TEN_AM)
+    scheduler.record_use("T0pp", now=TEN_AM + 2000)
+    assert scheduler.stats(now=TEN_AM + 2000)["warm_hits"] == 0
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from latency_stats import LatencyHistogram, LatencyRecorder
+
+
+def test_histogram_percentiles_within_bucket_error():
+    """Test that histogram percentiles stay within the bucket growth of the exact values"""
+    histogram = LatencyHistogram()
+    values = [i / 100 for i in range(1, 1001)]
+    for value in values:
+        histogram.record(value)
+    for q, exact in ((50, 5.0), (95, 9.5), (99, 9.9)):
+        assert abs(histogram.percentile(q) - exact) / exact <= 0.05
+    assert histogram.percentile(100) == 10.0
+    assert histogram.total == 1000
+
+
+def test_histogram_memory_is_fixed():
+    """Test that recording more values does not grow the histogram"""
+    histogram = LatencyHistogram()
+    buckets = len(histogram.counts)
+    for i in range(10000):
+        histogram.record(i * 0.37)
+    assert len(histogram.counts) == buckets
+
+
+def test_empty_histogram_has_no_percentiles():
+    """Test that an empty histogram reports no percentiles"""
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_recorder_forgets_old_windows():
+    """Test that latencies older than two windows drop out of the stats"""
+    recorder = LatencyRecorder(["m"], window=0.1)
+    recorder.record("m", 5)
+    assert recorder.stats("m")["count"] == 1
+    time.sleep(0.25)
+    recorder.record("m", 1)
+    stats = recorder.stats("m")
+    assert stats["count"] == 1
+    assert stats["p50"] == 1
+
+
+def test_successful_calls_feed_model_cards_and_stats(monkeypatch):
+    """Test that measured latencies reach the model cards and /api/stats"""
+    model = MagicMock(return_value={"response": "ok", "confidence": 0.85, "response_time": 0.1})
+    failing = MagicMock(return_value={"response": "down", "confidence": 0, "response_time": 0.1})
+    monkeypatch.setitem(app_module.ai_models, "Dolly", model)
+    monkeypatch.setitem(app_module.ai_models, "Pythia", failing)
+    app_module.call_model("Dolly", "Latency question")
+    app_module.call_model("Pythia", "Latency question")
+
+    info = app_module.get_model_info()
+    assert info["Dolly"]["latency"]["count"] == 1
+    assert info["Dolly"]["avg_response_time"].startswith("p50 ")
+    assert "latency" not in info["Pythia"]
+
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        stats = client.get('/api/stats').get_json()
+        page = client.get('/').get_data(as_text=True)
+    assert stats["models"]["Dolly"]["count"] == 1
+    assert stats["models"]["Pythia"]["count"] == 0
+    assert "hedging" in stats
+    assert "(1 calls)" in page
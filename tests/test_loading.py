@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import deadline
+from loading import LoadingScheduler, parse_estimated_time
+
+
+def http_response(status_code, body):
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = json.dumps(body)
+    response.json.return_value = body
+    return response
+
+
+def test_parse_estimated_time():
+    """Test that the estimate is read from a loading body and ignored in anything else"""
+    assert parse_estimated_time('{"error": "Model gpt2 is currently loading", "estimated_time": 20.5}') == 20.5
+    assert parse_estimated_time('{"error": "Model gpt2 is currently loading"}') is None
+    assert parse_estimated_time("Service Unavailable") is None
+    assert parse_estimated_time(None) is None
+
+
+def test_waiters_share_one_warm_up():
+    """Test that every caller waiting on a loading model shares a single warm-up"""
+    release = threading.Event()
+    warm = MagicMock(side_effect=lambda: (release.wait(5), None))
+    loading = LoadingScheduler(max_wait=5)
+    results = []
+
+    def wait():
+        results.append(loading.wait_until_warm("gpt2", 5))
+
+    loading.note_loading("gpt2", 10, warm)
+    loading.note_loading("gpt2", 10, warm)
+    threads = [threading.Thread(target=wait) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert loading.is_loading("gpt2")
+    assert 0 < loading.ready_in("gpt2") <= 10
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [True] * 4
+    assert warm.call_count == 1
+    assert not loading.is_loading("gpt2")
+
+
+def test_failed_warm_up_reports_not_ready():
+    """Test that waiters are told the model is not ready when every warm-up attempt fails"""
+    warm = MagicMock(return_value=(False, 0.01))
+    loading = LoadingScheduler(max_wait=5, max_attempts=2)
+    loading.note_loading("gpt2", None, warm)
+    assert loading.wait_until_warm("gpt2", 5) is False
+    assert warm.call_count == 2
+
+
+def test_async_wait_parks_without_a_thread():
+    """Test that the async wait returns once the shared warm-up finishes"""
+    release = threading.Event()
+    loading = LoadingScheduler(max_wait=5)
+    loading.note_loading("gpt2", 1, lambda: (release.wait(5), None))
+
+    async def run():
+        waiter = asyncio.ensure_future(loading.wait_until_warm_async("gpt2", 5, poll_interval=0.01))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        release.set()
+        return await waiter
+
+    assert asyncio.run(run()) is True
+
+
+def test_adapter_retries_once_the_model_is_warm(make_hf_adapter):
+    """Test that a 503 while loading triggers a wait_for_model warm-up and then a retry"""
+    session = MagicMock()
+    session.post.side_effect = [
+        http_response(503, {"error": "Model gpt2 is currently loading", "estimated_time": 20.0}),
+        http_response(200, [{"generated_text": "warm-up"}]),
+        http_response(200, [{"generated_text": "Hello!"}])
+    ]
+    adapter = make_hf_adapter(session, hf_loading=LoadingScheduler(max_wait=5))
+
+    result = adapter("Hi")
+
+    assert result["response"] == "Hello!"
+    assert session.post.call_count == 3
+    warm_body = json.loads(session.post.call_args_list[1].kwargs["data"])
+    assert warm_body["options"]["wait_for_model"] is True
+
+
+def test_loading_wait_is_held_to_the_enclosing_deadline(make_hf_adapter):
+    """Test that a warm-up longer than the per-model deadline is still waited for within the page deadline"""
+    responses = iter([
+        http_response(503, {"error": "Model gpt2 is currently loading", "estimated_time": 1.0}),
+        http_response(200, [{"generated_text": "warm-up"}]),
+        http_response(200, [{"generated_text": "Hello!"}])
+    ])
+
+    def post(url, headers, data, timeout):
+        if b"wait_for_model" in data:
+            time.sleep(0.3)
+        return next(responses)
+    session = MagicMock()
+    session.post.side_effect = post
+    adapter = make_hf_adapter(session, hf_loading=LoadingScheduler(max_wait=5))
+
+    with deadline.deadline_after(5):
+        with deadline.deadline_after(0.1):
+            result = adapter("Hi")
+
+    assert result["response"] == "Hello!"
+
+
+def test_adapter_reports_estimate_when_still_loading(make_hf_adapter):
+    """Test that a model that stays cold past the wait is reported as loading with its estimate"""
+    session = MagicMock()
+    session.post.return_value = http_response(503, {"error": "loading", "estimated_time": 42.0})
+    adapter = make_hf_adapter(session, hf_loading=LoadingScheduler(max_wait=0.05, default_estimate=60))
+
+    result = adapter("Hi")
+
+    assert result["confidence"] == 0
+    assert result["loading"] is True
+    assert result["estimated_time"] == 42.0
+    assert "42 seconds" in result["response"]
+
+
+def test_prewarm_warms_only_cold_models():
+    """Test that pre-warming starts a warm-up for a cold model and leaves a loaded one alone"""
+    loading = LoadingScheduler()
+    warm = MagicMock(return_value=(True, None))
+    assert loading.prewarm("gpt2", lambda: True, warm) is False
+    assert loading.prewarm("bloom", lambda: False, warm) is True
+    assert loading.wait_until_warm("bloom", 5) is True
+    assert warm.call_count == 1
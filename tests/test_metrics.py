@@ -0,0 +1,101 @@
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test that histograms render cumulative buckets, count and sum"""
+    registry = metrics.Registry()
+    histogram = metrics.Histogram("test_seconds", "Test histogram", ("model",), registry=registry, buckets=(0.1, 1))
+    child = histogram.labels(model="A")
+    child.observe(0.05)
+    child.observe(0.5)
+    child.observe(5)
+    text = registry.render()
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{model="A",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{model="A",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{model="A",le="+Inf"} 3' in text
+    assert 'test_seconds_count{model="A"} 3' in text
+    assert 'test_seconds_sum{model="A"} 5.55' in text
+
+
+def test_counter_gauge_and_label_escaping():
+    """Test that counters, gauges and escaped label values render correctly"""
+    registry = metrics.Registry()
+    counter = metrics.Counter("test_calls", "Test counter", ("model",), registry=registry)
+    counter.labels(model='Say "hi"').inc(2)
+    gauge = metrics.Gauge("test_open", "Test gauge", registry=registry)
+    with gauge.labels().track_inprogress():
+        assert 'test_open 1' in registry.render()
+    text = registry.render()
+    assert 'test_calls_total{model="Say \\"hi\\""} 2' in text
+    assert 'test_open 0' in text
+
+
+def make_worker_registry(calls, open_now):
+    registry = metrics.Registry()
+    metrics.Counter("test_calls", "Test counter", ("model",), registry=registry).labels(model="A").inc(calls)
+    metrics.Gauge("test_open", "Test gauge", registry=registry).labels().set(open_now)
+    histogram = metrics.Histogram("test_seconds", "Test histogram", registry=registry, buckets=(1,))
+    histogram.labels().observe(0.5)
+    return registry
+
+
+def test_scrape_sums_every_worker(tmp_path):
+    """Test that a scrape of one worker reports the sum over all workers, keeping counters of gone ones"""
+    path = str(tmp_path / "metrics.sqlite3")
+    first, second = metrics.SQLiteMetricsStore(path, stale_after=60), metrics.SQLiteMetricsStore(path, stale_after=60)
+    first_registry, second_registry = make_worker_registry(2, 1), make_worker_registry(3, 4)
+
+    with patch("metrics.time.time", return_value=1000):
+        second.publish(second_registry)
+        text = first.render(first_registry)
+    assert 'test_calls_total{model="A"} 5' in text
+    assert 'test_open 5' in text
+    assert 'test_seconds_bucket{le="1.0"} 2' in text
+    assert text.index('test_seconds_bucket{le="1.0"}') < text.index('test_seconds_bucket{le="+Inf"}') < text.index('test_seconds_count')
+
+    # The second worker stops publishing; its counts stay in the totals but its gauge goes
+    with patch("metrics.time.time", return_value=1100):
+        text = first.render(first_registry)
+    assert 'test_calls_total{model="A"} 5' in text
+    assert 'test_open 1' in text
+
+
+def test_comparison_is_instrumented(monkeypatch):
+    """Test that a comparison records request, queue, upstream and render metrics"""
+    monkeypatch.setattr(app_module, 'HUGGINGFACE_API_KEY', 'hf_test_key')
+    monkeypatch.setitem(app_module.ai_models, "Falcon", MagicMock(
+        return_value={"response": "ok", "confidence": 0.85, "response_time": 0.1}
+    ))
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        response = client.post('/', data={"question": "Metrics question", "ai_models": ["Falcon"]})
+        assert response.status_code == 200
+        scrape = client.get('/metrics')
+    text = scrape.get_data(as_text=True)
+    assert scrape.mimetype == "text/plain"
+    assert 'http_request_duration_seconds_count{endpoint="index",method="POST",status="200"}' in text
+    assert 'model_call_queue_seconds_count{model="Falcon"}' in text
+    assert 'template_render_seconds_count{template="results.html"}' in text
+    assert 'response_cache_lookups_total{result="miss"}' in text
+    assert 'session_save_seconds_count' in text
+    assert 'huggingface_connections_opened' in text
+
+
+def test_provider_calls_are_instrumented(monkeypatch):
+    """Test that adapters record upstream duration by outcome"""
+    monkeypatch.setattr(app_module, 'ANTHROPIC_API_KEY', 'sk-ant-test')
+    adapter = app_module.ai_models["Claude-2"]
+    monkeypatch.setattr(adapter, "call", MagicMock(side_effect=RuntimeError("down")))
+    adapter("Provider metrics question")
+    text = metrics.REGISTRY.render()
+    assert 'upstream_request_duration_seconds_count{model="Claude-2",provider="anthropic",outcome="exception"}' in text
+    assert 'upstream_requests_in_flight{provider="anthropic"} 0' in text
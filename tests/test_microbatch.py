@@ -0,0 +1,99 @@
+import json
+import os
+import sys
+import threading
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from microbatch import MicroBatcher
+from model_registry import MODEL_REGISTRY
+
+
+def submit_concurrently(batcher, key, items, run):
+    results = [None] * len(items)
+
+    def worker(index):
+        try:
+            results[index] = batcher.submit(key, items[index], run)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_items_share_one_run():
+    """Test that items submitted within the window run as one batch and each caller gets its own result"""
+    run = MagicMock(side_effect=lambda items: [item.upper() for item in items])
+    batcher = MicroBatcher(window=0.2, max_size=4)
+    results = submit_concurrently(batcher, "gpt2", ["a", "b", "c", "d"], run)
+    assert results == ["A", "B", "C", "D"]
+    assert run.call_count == 1
+
+
+def test_max_size_splits_batches():
+    """Test that a full batch runs at once and later items start a new one"""
+    run = MagicMock(side_effect=lambda items: list(items))
+    batcher = MicroBatcher(window=0.2, max_size=2)
+    results = submit_concurrently(batcher, "gpt2", ["a", "b", "c", "d"], run)
+    assert sorted(results) == ["a", "b", "c", "d"]
+    assert all(len(call.args[0]) <= 2 for call in run.call_args_list)
+
+
+def test_keys_are_batched_separately():
+    """Test that items for different keys never share a batch"""
+    run = MagicMock(side_effect=lambda items: list(items))
+    batcher = MicroBatcher(window=0.05, max_size=8)
+    submit_concurrently(batcher, "gpt2", ["a"], run)
+    submit_concurrently(batcher, "bloom", ["b"], run)
+    assert run.call_count == 2
+
+
+def test_errors_reach_every_caller():
+    """Test that a failed batch raises for every caller in it"""
+    batcher = MicroBatcher(window=0.1, max_size=2)
+    results = submit_concurrently(batcher, "gpt2", ["a", "b"], MagicMock(side_effect=RuntimeError("down")))
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_huggingface_adapter_sends_batched_inputs(make_hf_adapter):
+    """Test that concurrent questions go out as one request with a list of inputs"""
+    session = MagicMock()
+    session.post.return_value.status_code = 200
+    session.post.return_value.json.return_value = [
+        [{"generated_text": "First answer"}],
+        [{"generated_text": "Second answer"}]
+    ]
+    adapter = make_hf_adapter(session, hf_batcher=MicroBatcher(window=0.2, max_size=2))
+    results = [None, None]
+
+    def ask(index, question):
+        results[index] = adapter(question)
+
+    threads = [threading.Thread(target=ask, args=(0, "First?")), threading.Thread(target=ask, args=(1, "Second?"))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert session.post.call_count == 1
+    body = json.loads(session.post.call_args.kwargs["data"])
+    answers = dict(zip(body["inputs"], ["First answer", "Second answer"]))
+    assert {result["response"] for result in results} == set(answers.values())
+    assert all(result["confidence"] == MODEL_REGISTRY["GPT-2"]["confidence"] for result in results)
+
+
+def test_huggingface_batch_status_error_reaches_every_caller(make_hf_adapter):
+    """Test that a failed batched request is reported to each caller"""
+    session = MagicMock()
+    session.post.return_value.status_code = 503
+    adapter = make_hf_adapter(session)
+    results = adapter.call_many("hf_test_key", ["One?", "Two?"])
+    assert [result["confidence"] for result in results] == [0, 0]
+    assert "loading" in results[0]["response"]
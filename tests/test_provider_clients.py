@@ -0,0 +1,62 @@
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from provider_clients import ClientRegistry
+
+
+def make_registry():
+    factory = MagicMock(side_effect=lambda api_key: MagicMock(api_key=api_key))
+    close = MagicMock()
+    registry = ClientRegistry()
+    registry.register('anthropic', factory, close=close)
+    return registry, factory, close
+
+
+def test_client_is_built_once_and_reused():
+    """Test that repeated requests share one client"""
+    registry, factory, _ = make_registry()
+
+    first = registry.get('anthropic', 'key-1')
+    second = registry.get('anthropic', 'key-1')
+
+    assert first is second
+    factory.assert_called_once_with('key-1')
+
+
+def test_client_is_rebuilt_when_key_rotates():
+    """Test that a new key builds a new client and closes the old one"""
+    registry, factory, close = make_registry()
+    old = registry.get('anthropic', 'key-1')
+
+    new = registry.get('anthropic', 'key-2')
+
+    assert new is not old
+    assert new.api_key == 'key-2'
+    close.assert_called_once_with(old)
+
+
+def test_client_is_rebuilt_in_forked_worker():
+    """Test that a worker does not reuse a client built by its parent process"""
+    registry, factory, close = make_registry()
+    parent = registry.get('anthropic', 'key-1')
+
+    with patch('provider_clients.os.getpid', return_value=os.getpid() + 1):
+        child = registry.get('anthropic', 'key-1')
+
+    assert child is not parent
+    close.assert_not_called()
+
+
+def test_warm_up_reports_errors_without_raising():
+    """Test that a failing warm-up is reported per provider"""
+    registry = ClientRegistry()
+    registry.register('anthropic', lambda api_key: MagicMock(), warm=MagicMock(side_effect=RuntimeError("boom")))
+    registry.register('cohere', lambda api_key: MagicMock())
+
+    results = registry.warm_up({'anthropic': 'key-1', 'cohere': 'key-2'})
+
+    assert results == {'anthropic': 'boom', 'cohere': None}
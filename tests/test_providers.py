@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from model_registry import MODEL_REGISTRY
+
+
+def test_registry_drives_models_and_cards():
+    """Test that every registry entry becomes a model and a card, in order"""
+    assert list(app_module.ai_models) == list(MODEL_REGISTRY)
+    assert list(app_module.ai_model_info) == list(MODEL_REGISTRY)
+    assert app_module.ai_model_info["Claude-2"]["provider"] == "anthropic"
+    assert app_module.token_streaming_models == {"Claude-2", "Cohere-Command"}
+
+
+def test_huggingface_body_matches_original_payload(make_hf_adapter):
+    """Test that the pre-encoded request body is the payload the inference API expects"""
+    adapter = make_hf_adapter(MagicMock())
+
+    assert json.loads(adapter.build_body('Say "hi"')) == {
+        "inputs": 'Say "hi"',
+        "parameters": {
+            "max_length": 512,
+            "temperature": 0.7,
+            "num_return_sequences": 1,
+            "do_sample": True,
+            "top_p": 0.9,
+            "top_k": 50
+        }
+    }
+
+
+def test_huggingface_adapter_parses_generated_text(make_hf_adapter):
+    """Test that a successful call returns the cleaned text with the model's confidence"""
+    session = MagicMock()
+    session.post.return_value.status_code = 200
+    session.post.return_value.json.return_value = [{"generated_text": "Hi there. Hello!"}]
+    adapter = make_hf_adapter(session, name="Qwen3")
+
+    result = adapter("Hi there.")
+
+    assert result["response"] == "Hello!"
+    assert result["confidence"] == 0.9
+    assert session.post.call_args.args[0] == "https://api-inference.huggingface.co/models/Qwen/Qwen1.5-7B-Chat"
+
+
+def test_huggingface_adapter_reports_loading_model(make_hf_adapter):
+    """Test that a 503 from any Hugging Face model is reported as loading"""
+    session = MagicMock()
+    session.post.return_value.status_code = 503
+    adapter = make_hf_adapter(session, name="DeepSeek R1")
+
+    result = adapter("Hi")
+
+    assert result["confidence"] == 0
+    assert "currently loading" in result["response"]
+
+
+def test_adapter_without_key_skips_upstream(make_hf_adapter):
+    """Test that a missing API key is reported without calling the provider"""
+    session = MagicMock()
+    adapter = make_hf_adapter(session, api_key=None)
+
+    result = adapter("Hi")
+
+    assert "API key is not configured" in result["response"]
+    session.post.assert_not_called()
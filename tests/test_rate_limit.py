@@ -0,0 +1,138 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from rate_limit import AdmissionGate, RateLimited, SQLiteRateLimiter, parse_limits
+
+
+def make_limiter():
+    return SQLiteRateLimiter(os.path.join(tempfile.mkdtemp(), "rate_limits.sqlite3"))
+
+
+def test_parse_limits():
+    """Test that limits parse as rate and burst, with the burst defaulting to the rate"""
+    assert parse_limits("anthropic=5:10, GPT-2=0.5") == {"anthropic": (5.0, 10.0), "GPT-2": (0.5, 1.0)}
+    assert parse_limits("") == {}
+
+
+def test_burst_then_rejection():
+    """Test that a bucket allows its burst and then turns calls away"""
+    limiter = make_limiter()
+    buckets = [("provider:test", 0.1, 3)]
+    for _ in range(3):
+        limiter.acquire(buckets)
+    with pytest.raises(RateLimited) as error:
+        limiter.acquire(buckets)
+    assert error.value.retry_after > 1
+
+
+def test_short_wait_is_queued():
+    """Test that a call waits for a token when it arrives within the allowed wait"""
+    limiter = make_limiter()
+    buckets = [("provider:test", 20, 1)]
+    limiter.acquire(buckets)
+    start = time.monotonic()
+    limiter.acquire(buckets, max_wait=1)
+    assert 0.02 <= time.monotonic() - start < 0.5
+
+
+def test_tokens_taken_from_all_buckets_or_none():
+    """Test that a rejected call does not spend tokens from its other buckets"""
+    limiter = make_limiter()
+    limiter.acquire([("model:slow", 0.01, 1)])
+    with pytest.raises(RateLimited):
+        limiter.acquire([("provider:hf", 0.01, 1), ("model:slow", 0.01, 1)])
+    limiter.acquire([("provider:hf", 0.01, 1)])
+
+
+def test_buckets_are_shared_between_workers():
+    """Test that limiters on the same file draw from the same buckets under concurrency"""
+    path = os.path.join(tempfile.mkdtemp(), "rate_limits.sqlite3")
+    limiters = [SQLiteRateLimiter(path) for _ in range(4)]
+    granted = []
+
+    def worker(limiter):
+        for _ in range(10):
+            try:
+                limiter.acquire([("provider:shared", 0.001, 10)])
+                granted.append(1)
+            except RateLimited:
+                pass
+
+    threads = [threading.Thread(target=worker, args=(limiter,)) for limiter in limiters]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(granted) == 10
+
+
+def test_admission_gate():
+    """Test that the gate turns callers away once it is full"""
+    gate = AdmissionGate(1)
+    assert gate.try_enter()
+    assert not gate.try_enter()
+    gate.leave()
+    assert gate.try_enter()
+
+
+def mock_hf_session(monkeypatch, result):
+    session = MagicMock()
+    session.post.return_value.status_code = 200
+    session.post.return_value.json.return_value = result
+    monkeypatch.setattr(app_module.provider_context, "hf_session", session)
+    monkeypatch.setattr(app_module, 'HUGGINGFACE_API_KEY', 'hf_test_key')
+    return session
+
+
+def test_rate_limited_model_is_not_called(monkeypatch):
+    """Test that a model over its limit returns a rate-limited response without an upstream call"""
+    session = mock_hf_session(monkeypatch, [{"generated_text": "ok"}])
+    monkeypatch.setitem(app_module.MODEL_RATE_LIMITS, "T0pp", (0.01, 1))
+    monkeypatch.setattr(app_module, "RATE_LIMIT_MAX_WAIT", 0)
+    assert app_module.call_model("T0pp", "Rate question 1")["confidence"] > 0
+    limited = app_module.call_model("T0pp", "Rate question 2")
+    assert limited["rate_limited"] is True
+    assert session.post.call_count == 1
+    assert app_module.model_breakers["T0pp"].snapshot()["recent_failures"] == 0
+
+
+def test_batch_takes_one_token_per_upstream_request(monkeypatch):
+    """Test that a batch of questions sent as one request is charged one token"""
+    session = mock_hf_session(monkeypatch, [[{"generated_text": "one"}], [{"generated_text": "two"}]])
+    monkeypatch.setitem(app_module.MODEL_RATE_LIMITS, "T0pp", (0.01, 1))
+    monkeypatch.setattr(app_module, "RATE_LIMIT_MAX_WAIT", 0)
+    adapter = app_module.ai_models["T0pp"]
+    results = adapter.call_many("hf_test_key", ["Batched 1", "Batched 2"])
+    assert [result["confidence"] > 0 for result in results] == [True, True]
+    with pytest.raises(RateLimited):
+        adapter.call_many("hf_test_key", ["Batched 3", "Batched 4"])
+    assert session.post.call_count == 1
+
+
+def test_index_returns_503_when_overloaded(monkeypatch):
+    """Test that the comparison page answers 503 when the worker is full or every model is limited"""
+    mock_hf_session(monkeypatch, [{"generated_text": "ok"}])
+    monkeypatch.setitem(app_module.MODEL_RATE_LIMITS, "GPT-Neo", (0.01, 1))
+    monkeypatch.setattr(app_module, "RATE_LIMIT_MAX_WAIT", 0)
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        assert client.post('/', data={"question": "Overload 1", "ai_models": ["GPT-Neo"]}).status_code == 200
+        limited = client.post('/', data={"question": "Overload 2", "ai_models": ["GPT-Neo"]})
+        assert limited.status_code == 503
+        assert "Retry-After" in limited.headers
+
+        monkeypatch.setattr(app_module, "comparison_gate", AdmissionGate(1))
+        app_module.comparison_gate.try_enter()
+        busy = client.post('/', data={"question": "Overload 3", "ai_models": ["Falcon"]})
+        assert busy.status_code == 503
+        assert "busy" in busy.get_data(as_text=True)
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from response_cache import ResponseCache, SQLiteResponseCache, make_key
+
+
+def test_key_ignores_whitespace_differences():
+    """Test that reformatted copies of a question share a cache key"""
+    assert make_key("GPT-2", "  What is  AI?\n", 512, 0.7) == make_key("GPT-2", "What is AI?", "512", "0.7")
+    assert make_key("GPT-2", "What is AI?", 512, 0.7) != make_key("GPT-2", "What is AI?", 256, 0.7)
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Test that the cache drops the least recently used entry when full"""
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_entries_expire_after_ttl():
+    """Test that entries older than the TTL are not served"""
+    cache = ResponseCache(max_entries=10, ttl=5)
+    with patch("response_cache.time.monotonic", return_value=100):
+        cache.set("a", 1)
+    with patch("response_cache.time.monotonic", return_value=106):
+        assert cache.get("a") is None
+
+
+def test_call_model_serves_repeat_from_cache(monkeypatch):
+    """Test that a repeated question is answered from cache and flagged as a hit"""
+    model = MagicMock(return_value={"response": "Paris", "confidence": 0.9, "response_time": 1.2})
+    monkeypatch.setitem(app_module.ai_models, "GPT-2", model)
+
+    first = app_module.call_model("GPT-2", "Capital of France?")
+    second = app_module.call_model("GPT-2", "Capital of  France?")
+
+    assert model.call_count == 1
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["response"] == "Paris"
+
+
+def test_call_model_never_caches_fallbacks(monkeypatch):
+    """Test that error payloads are always fetched again"""
+    model = MagicMock(return_value=app_module.get_fallback_response("GPT-2", "Request timed out"))
+    monkeypatch.setitem(app_module.ai_models, "GPT-2", model)
+
+    app_module.call_model("GPT-2", "Hi")
+    app_module.call_model("GPT-2", "Hi")
+
+    assert model.call_count == 2
+
+
+def test_call_model_fresh_bypasses_cache(monkeypatch):
+    """Test that a forced fresh call goes upstream even on a cache hit"""
+    model = MagicMock(return_value={"response": "Paris", "confidence": 0.9, "response_time": 1.2})
+    monkeypatch.setitem(app_module.ai_models, "GPT-2", model)
+
+    app_module.call_model("GPT-2", "Capital of France?")
+    result = app_module.call_model("GPT-2", "Capital of France?", fresh=True)
+
+    assert model.call_count == 2
+    assert result["cached"] is False
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    """Test that an entry written by one worker is served to another"""
+    path = str(tmp_path / "cache.sqlite3")
+    writer = SQLiteResponseCache(path, ttl=60)
+    reader = SQLiteResponseCache(path, ttl=60)
+
+    writer.set(make_key("GPT-2", "Hi", 512, 0.7), {"response": "Hello", "confidence": 0.85})
+
+    assert reader.get(make_key("GPT-2", "Hi", 512, 0.7)) == {"response": "Hello", "confidence": 0.85}
+
+
+def test_sqlite_purge_drops_expired_then_least_recent(tmp_path):
+    """Test that the purge job removes expired rows and trims to the size limit"""
+    cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2, ttl=60)
+    with patch("response_cache.time.time", return_value=1000):
+        cache.set("expired", 0)
+    with patch("response_cache.time.time", return_value=1100):
+        cache.set("old", 1)
+    with patch("response_cache.time.time", return_value=1101):
+        cache.set("middle", 2)
+    with patch("response_cache.time.time", return_value=1102):
+        cache.set("new", 3)
+
+    with patch("response_cache.time.time", return_value=1103):
+        assert cache.purge_expired() == 2
+        assert cache.get("old") is None
+        assert cache.get("middle") == 2
+        assert cache.get("new") == 3
+
+
+def test_sqlite_cache_fails_open_when_locked(tmp_path):
+    """Test that a locked cache file reads as a miss and a skipped write instead of an error"""
+    cache = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    locked = MagicMock()
+    locked.execute.side_effect = sqlite3.OperationalError("database is locked")
+    with patch.object(cache, "_connect", return_value=locked):
+        cache.set("key", {"response": "Hello"})
+        assert cache.get("key") is None
+    assert cache.get("key") is None
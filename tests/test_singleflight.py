@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from singleflight import SingleFlight, SQLiteFlightClaims
+
+
+def run_in_threads(count, target):
+    results = [None] * count
+
+    def worker(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_share_one_execution():
+    """Test that identical concurrent calls run the function once"""
+    flights = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    results = run_in_threads(5, lambda: flights.do("key", fetch))
+
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["answer"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert flights.in_flight() == 0
+
+
+def test_followers_receive_the_leader_exception():
+    """Test that a failing call is reported to every waiting caller"""
+    flights = SingleFlight()
+
+    def fetch():
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    def call():
+        with pytest.raises(RuntimeError):
+            flights.do("key", fetch)
+        return True
+
+    assert run_in_threads(3, call) == [True] * 3
+
+
+def test_claims_hand_result_to_other_workers(tmp_path):
+    """Test that a worker losing the claim picks up the owner's published result"""
+    path = str(tmp_path / "flights.sqlite3")
+    owner = SQLiteFlightClaims(path, ttl=5)
+    other = SQLiteFlightClaims(path, ttl=5, poll_interval=0.01)
+    published = {}
+
+    assert owner.claim("key")
+    assert not other.claim("key")
+
+    def publish():
+        time.sleep(0.05)
+        published["key"] = "answer"
+        owner.release("key")
+
+    threading.Thread(target=publish).start()
+
+    assert other.wait("key", lambda: published.get("key"), timeout=2) == "answer"
+
+
+def test_call_model_coalesces_identical_requests(monkeypatch):
+    """Test that concurrent identical comparisons make a single upstream call"""
+    def slow_model(question):
+        time.sleep(0.1)
+        return {"response": "Paris", "confidence": 0.9, "response_time": 0.1}
+
+    model = MagicMock(side_effect=slow_model)
+    monkeypatch.setitem(app_module.ai_models, "GPT-2", model)
+
+    results = run_in_threads(4, lambda: app_module.call_model("GPT-2", "Capital of France?", fresh=True))
+
+    assert model.call_count == 1
+    assert all(result["response"] == "Paris" for result in results)
+    assert sum(result["coalesced"] for result in results) == 3
+
+
+def test_claims_fail_open_when_locked(tmp_path):
+    """Test that a locked claims file lets the caller make the call instead of raising"""
+    claims = SQLiteFlightClaims(str(tmp_path / "claims.sqlite3"), poll_interval=0.01)
+    locked = MagicMock()
+    locked.execute.side_effect = sqlite3.OperationalError("database is locked")
+    claims._connect = MagicMock(return_value=locked)
+
+    assert claims.claim("key") is True
+    claims.release("key")
+    assert claims.wait("key", lambda: None, timeout=1) is None
@@ -0,0 +1,107 @@
+import html
+import json
+import os
+import re
+import sys
+
+import pytest
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, 'HUGGINGFACE_API_KEY', 'hf_test_key')
+    monkeypatch.setattr(app_module, 'ANTHROPIC_API_KEY', 'sk-ant-test')
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        yield client
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def start_stream(client, question, models):
+    """Post a streamed comparison and return the stream URL its results page points at"""
+    page = client.post('/', data={'question': question, 'ai_models': models, 'stream': '1'}).get_data(as_text=True)
+    return html.unescape(re.search(r'data-stream-url="([^"]+)"', page).group(1))
+
+
+def test_stream_pushes_one_result_per_model(client, monkeypatch):
+    """Test that the stream emits a result event for every model and then finishes"""
+    monkeypatch.setitem(app_module.ai_models, 'GPT-2',
+                        lambda q: {"response": "gpt2 answer", "confidence": 0.85, "response_time": 0.1})
+    monkeypatch.setitem(app_module.ai_models, 'BLOOM',
+                        lambda q: {"response": "bloom answer", "confidence": 0.85, "response_time": 0.2})
+
+    response = client.get(start_stream(client, 'Stream both', ['GPT-2', 'BLOOM']))
+
+    assert response.mimetype == 'text/event-stream'
+    events = parse_events(response.get_data(as_text=True))
+    results = {data["model"]: data["response"] for event, data in events if event == "result"}
+    assert results == {"GPT-2": "gpt2 answer", "BLOOM": "bloom answer"}
+    assert events[-1] == ("done", {})
+
+
+def test_stream_forwards_partial_tokens(client, monkeypatch):
+    """Test that models with token streaming push partial text before their result"""
+    def claude(question, on_token=None):
+        for token in ["Hel", "lo"]:
+            on_token(token)
+        return {"response": "Hello", "confidence": 0.95, "response_time": 0.1}
+
+    monkeypatch.setitem(app_module.ai_models, 'Claude-2', claude)
+
+    response = client.get(start_stream(client, 'Hi', ['Claude-2']))
+
+    events = parse_events(response.get_data(as_text=True))
+    assert [event for event, _ in events] == ["token", "token", "result", "done"]
+    assert "".join(data["text"] for event, data in events if event == "token") == "Hello"
+
+
+def test_streamed_form_post_renders_pending_cards(client):
+    """Test that a streamed comparison renders placeholder cards pointing at the stream"""
+    response = client.post('/', data={'question': 'Hi', 'ai_models': ['GPT-2'], 'stream': '1'})
+
+    body = response.get_data(as_text=True)
+    assert 'data-stream-url="/api/stream?' in body
+    assert 'ai-response pending' in body
+
+
+def test_stream_url_is_short_and_starts_once(client, monkeypatch):
+    """Test that a long question stays on the server and the stream token cannot be reused"""
+    monkeypatch.setitem(app_module.ai_models, 'GPT-2',
+                        lambda q: {"response": f"{len(q)} characters", "confidence": 0.85, "response_time": 0.1})
+    question = "Why? " * 4000
+
+    url = start_stream(client, question, ['GPT-2'])
+
+    assert len(url) < 200
+    events = parse_events(client.get(url).get_data(as_text=True))
+    assert ("result", "20000 characters") in [(event, data.get("response")) for event, data in events]
+    assert client.get(url).status_code == 404
+    with app_module.app.test_client() as stranger:
+        assert stranger.get(start_stream(client, 'Mine', ['GPT-2'])).status_code == 404
+
+
+def test_streams_started_in_the_same_second_both_run(client, monkeypatch):
+    """Test that a second streamed comparison does not replace the one started just before it"""
+    monkeypatch.setitem(app_module.ai_models, 'GPT-2',
+                        lambda q: {"response": f"answer to {q}", "confidence": 0.85, "response_time": 0.1})
+
+    urls = [start_stream(client, question, ['GPT-2']) for question in ('First tab', 'Second tab')]
+
+    for url, question in zip(urls, ('First tab', 'Second tab')):
+        response = client.get(url)
+        assert response.status_code == 200
+        events = parse_events(response.get_data(as_text=True))
+        assert ("result", f"answer to {question}") in [(event, data.get("response")) for event, data in events]
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from vote_store import VoteStore, wilson_lower_bound
+
+
+def make_store(**settings):
+    return VoteStore(os.path.join(tempfile.mkdtemp(), "votes.sqlite3"), **settings)
+
+
+def test_votes_are_buffered_until_flush():
+    """Test that recording a vote does not write until the buffer is flushed"""
+    store = make_store()
+    store.record("GPT-2", "up")
+    store.record("GPT-2", "up")
+    assert store._connect().execute("SELECT COUNT(*) FROM model_votes").fetchone()[0] == 0
+    assert store.totals("GPT-2") == {"GPT-2": {"up": 2, "down": 0}}
+    assert store.flush() == 2
+    assert store.flush() == 0
+    assert store.totals("GPT-2") == {"GPT-2": {"up": 2, "down": 0}}
+
+
+def test_full_batch_flushes_early():
+    """Test that reaching the batch size flushes without waiting for the timer"""
+    store = make_store(batch_size=3)
+    for _ in range(3):
+        store.record("BART", "down")
+    assert store._connect().execute("SELECT count FROM model_votes").fetchone()[0] == 3
+
+
+def test_workers_merge_into_shared_totals():
+    """Test that stores on the same file add up concurrent increments without losing any"""
+    path = os.path.join(tempfile.mkdtemp(), "votes.sqlite3")
+    workers = [VoteStore(path, batch_size=10) for _ in range(4)]
+
+    def vote(store):
+        for _ in range(250):
+            store.record("OPT", "up")
+        store.flush()
+
+    threads = [threading.Thread(target=vote, args=(store,)) for store in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert VoteStore(path).totals("OPT")["OPT"]["up"] == 1000
+
+
+def test_batch_being_flushed_still_counts():
+    """Test that votes stay in the totals while their flush waits for another worker's write lock"""
+    store = make_store()
+    store.record("T5", "up")
+    blocker = sqlite3.connect(store.path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    flusher = threading.Thread(target=store.flush)
+    flusher.start()
+    try:
+        while not store._flushing:
+            time.sleep(0.01)
+        assert store.totals("T5") == {"T5": {"up": 1, "down": 0}}
+    finally:
+        blocker.execute("COMMIT")
+        flusher.join()
+    assert store.totals("T5") == {"T5": {"up": 1, "down": 0}}
+    assert store._connect().execute("SELECT count FROM model_votes").fetchone()[0] == 1
+
+
+def test_leaderboard_is_a_snapshot():
+    """Test that the leaderboard ranks models and is only recomputed when stale"""
+    store = make_store()
+    for _ in range(10):
+        store.record("A", "up")
+    store.record("B", "up")
+    store.record("B", "down")
+    board = store.leaderboard()
+    assert [entry["model"] for entry in board["models"]] == ["A", "B"]
+
+    store.record("C", "up")
+    assert store.leaderboard(max_age=60) is board
+    assert "C" in [entry["model"] for entry in store.leaderboard(max_age=0)["models"]]
+
+
+def test_wilson_lower_bound_prefers_more_evidence():
+    """Test that many positive votes outrank a single one"""
+    assert wilson_lower_bound(0, 0) == 0
+    assert wilson_lower_bound(50, 5) > wilson_lower_bound(1, 0)
+
+
+def test_vote_endpoint():
+    """Test that /vote records votes and rejects unknown models and vote types"""
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        assert client.post('/vote', json={"model": "GPT-2", "vote": "up"}).get_json() == {"up": 1, "down": 0}
+        assert client.post('/vote', json={"model": "GPT-2", "vote": "down"}).get_json() == {"up": 1, "down": 1}
+        assert client.post('/vote', json={"model": "GPT-2", "vote": "sideways"}).status_code == 400
+        assert client.post('/vote', json={"model": "Nope", "vote": "up"}).status_code == 400
+        board = client.get('/api/leaderboard').get_json()
+    assert board["models"][0]["model"] == "GPT-2"
@@ -0,0 +1,150 @@
+"""Vote counts buffered in each worker and flushed in batches to a shared SQLite file"""
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from sqlite_store import SQLiteStore
+
+VOTE_TYPES = ("up", "down")
+
+
+def wilson_lower_bound(up, down, z=1.96):
+    """Lower bound of the 95% confidence interval for the share of up votes"""
+    total = up + down
+    if not total:
+        return 0.0
+    share = up / total
+    return (share + z * z / (2 * total) - z * math.sqrt((share * (1 - share) + z * z / (4 * total)) / total)) / (1 + z * z / total)
+
+
+class VoteStore(SQLiteStore):
+    """Vote totals shared by every worker on the node.
+
+    ``record`` only bumps an in-memory counter; ``flush`` adds the buffered
+    counts to the ``model_votes`` table in one transaction of upserts, so
+    concurrent workers never lose increments. ``totals`` reads the flushed
+    counts, which include every worker, plus this worker's unflushed ones,
+    including a batch whose flush has not committed yet.
+    The leaderboard is computed by ``refresh_leaderboard`` and served from
+    that snapshot until the next refresh.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS model_votes (
+            model TEXT NOT NULL,
+            vote TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (model, vote)
+        )
+        """,
+    )
+
+    def __init__(self, path, batch_size=100):
+        super().__init__(path)
+        self.batch_size = batch_size
+        self._pending = Counter()
+        self._flushing = Counter()
+        self._pending_lock = threading.Lock()
+        self._leaderboard = None
+
+    def record(self, model, vote):
+        with self._pending_lock:
+            self._pending[(model, vote)] += 1
+            full = sum(self._pending.values()) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered counts; return how many votes were written"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, Counter()
+            # Still counted by totals() while the transaction waits for the write lock
+            self._flushing.update(pending)
+        if not pending:
+            return 0
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("""
+                INSERT INTO model_votes (model, vote, count) VALUES (?, ?, ?)
+                ON CONFLICT (model, vote) DO UPDATE SET count = count + excluded.count
+            """, [(model, vote, count) for (model, vote), count in pending.items()])
+            # Commit and stop counting the batch as one step, so totals() sees it exactly once
+            with self._pending_lock:
+                conn.execute("COMMIT")
+                self._flushing -= pending
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Keep the votes for the next flush rather than dropping them
+            with self._pending_lock:
+                self._flushing -= pending
+                self._pending.update(pending)
+            return 0
+        return sum(pending.values())
+
+    def totals(self, model=None):
+        """``{model: {"up": n, "down": n}}`` from every worker, for one model or all of them"""
+        with self._pending_lock:
+            if model is None:
+                rows = self._connect().execute("SELECT model, vote, count FROM model_votes").fetchall()
+            else:
+                rows = self._connect().execute(
+                    "SELECT model, vote, count FROM model_votes WHERE model = ?", (model,)
+                ).fetchall()
+            pending = [(name, vote, count) for (name, vote), count in (self._pending + self._flushing).items()
+                       if model is None or name == model]
+        totals = {}
+        for name, vote, count in rows + pending:
+            votes = totals.setdefault(name, dict.fromkeys(VOTE_TYPES, 0))
+            votes[vote] += count
+        return totals
+
+    def refresh_leaderboard(self):
+        """Recompute the leaderboard from the current totals and return it"""
+        entries = []
+        for name, votes in self.totals().items():
+            entries.append({
+                "model": name,
+                "up": votes["up"],
+                "down": votes["down"],
+                "score": round(wilson_lower_bound(votes["up"], votes["down"]), 4)
+            })
+        entries.sort(key=lambda entry: (-entry["score"], -entry["up"], entry["model"]))
+        self._leaderboard = {"updated_at": time.time(), "models": entries}
+        return self._leaderboard
+
+    def leaderboard(self, max_age=None):
+        """Latest leaderboard snapshot, recomputed when missing or older than ``max_age`` seconds"""
+        snapshot = self._leaderboard
+        if snapshot is None or (max_age is not None and time.time() - snapshot["updated_at"] >= max_age):
+            return self.refresh_leaderboard()
+        return snapshot
+
+    def start(self, flush_interval, leaderboard_interval):
+        """Flush and refresh the leaderboard on a daemon thread"""
+        def run():
+            last_refresh = 0
+            while True:
+                time.sleep(flush_interval)
+                self.flush()
+                if time.monotonic() - last_refresh >= leaderboard_interval:
+                    try:
+                        self.refresh_leaderboard()
+                    except sqlite3.Error:
+                        pass
+                    last_refresh = time.monotonic()
+
+        thread = threading.Thread(target=run, name="vote-flusher", daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        with self._pending_lock:
+            self._pending.clear()
+            self._flushing.clear()
+        self._leaderboard = None
+        self._connect().execute("DELETE FROM model_votes")
@@ -1,4 +1,7 @@
-from app import app
+from app import app, start_background_tasks
+
+# gunicorn imports this module in each worker after forking, so every worker gets its own threads
+start_background_tasks()
 
 if __name__ == "__main__":
     app.run() 
\ No newline at end of file